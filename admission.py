@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+from cache import TTLCache
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import instrumentation
+
+# Global token buckets: requests per second the app sends to Supabase Auth (sign-up, sign-in,
+# password checks) and to the responses write path, with the burst each may absorb
+AUTH_RATE = float(os.getenv("ADMISSION_AUTH_RATE", "10"))
+AUTH_BURST = float(os.getenv("ADMISSION_AUTH_BURST", "20"))
+SUBMIT_RATE = float(os.getenv("ADMISSION_SUBMIT_RATE", "50"))
+SUBMIT_BURST = float(os.getenv("ADMISSION_SUBMIT_BURST", "100"))
+
+# Per client address and per account (email, phone or user id); these reject straight away rather than queue
+CLIENT_PER_MINUTE = float(os.getenv("ADMISSION_CLIENT_PER_MINUTE", "20"))
+CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "10"))
+ACCOUNT_PER_MINUTE = float(os.getenv("ADMISSION_ACCOUNT_PER_MINUTE", "6"))
+ACCOUNT_BURST = float(os.getenv("ADMISSION_ACCOUNT_BURST", "5"))
+
+# Requests past the global burst wait in a FIFO queue of at most QUEUE_SIZE, and only
+# when their expected wait is within QUEUE_BUDGET seconds; otherwise they are turned away
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "200"))
+QUEUE_BUDGET = float(os.getenv("ADMISSION_QUEUE_BUDGET", "5"))
+
+# Trusted proxies in front of Streamlit that append to X-Forwarded-For; 0 keys clients by the socket peer.
+# Only set it when such a proxy is there: without one, a client can forge the header for a fresh bucket.
+FORWARDED_HOPS = int(os.getenv("ADMISSION_FORWARDED_HOPS", "0"))
+
+# Client and account buckets tracked at once; an evicted bucket comes back full
+MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "100000"))
+
+# Longest a queued request sleeps before it re-reports its position
+WAIT_STEP = 0.5
+
+admission_total = instrumentation.registry.counter(
+    "wellness_admission_total", "Admission decisions by controller and outcome")
+admission_wait_seconds = instrumentation.registry.histogram(
+    "wellness_admission_wait_seconds", "Time admitted requests spent in the admission queue")
+forwarded_ignored = instrumentation.registry.counter(
+    "wellness_admission_forwarded_ignored_total", "Requests that carried X-Forwarded-For but were keyed by the peer (hops 0)")
+
+
+class Throttled(Exception):
+    """Raised instead of admitting a request; retry_after is when trying again can succeed"""
+
+    def __init__(self, reason: str, retry_after: float):
+        if reason in ("client", "account"):
+            message = f"Too many attempts. Please try again in {max(1, round(retry_after))} seconds."
+        else:
+            message = f"We're busy right now. Please try again in {max(1, round(retry_after))} seconds."
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_address(peer: Optional[str], forwarded_for: Optional[str] = None) -> Optional[str]:
+    """The address client limits are kept per: the entry FORWARDED_HOPS from the right of X-Forwarded-For, else the peer"""
+    if FORWARDED_HOPS > 0 and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        # Entries left of the ones our own proxies appended can be forged by the client
+        if hops:
+            return hops[-min(FORWARDED_HOPS, len(hops))]
+    elif forwarded_for:
+        # Behind a proxy this puts every user in the proxy's bucket; the admin page warns about it
+        forwarded_ignored.inc()
+    return peer
+
+
+def forwarding_misconfigured() -> bool:
+    """Whether requests arrived through a proxy while ADMISSION_FORWARDED_HOPS is 0"""
+    return FORWARDED_HOPS == 0 and sum(forwarded_ignored.values.values()) > 0
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst; a rate of 0 or less never limits"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float, count: float = 1.0) -> float:
+        """Seconds until count tokens are available, 0 if they are now"""
+        if self.rate <= 0:
+            return 0.0
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        return max(0.0, (count - self.tokens) / self.rate)
+
+    def take(self) -> None:
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+class AdmissionController:
+    """Token-bucket admission for one kind of request: per client, per account and global limits.
+
+    A client or account over its limit is rejected at once. Past the global
+    limit, requests wait their turn in a bounded FIFO queue; one that would
+    wait longer than queue_budget is rejected up front rather than left to
+    hold a script run.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, client_rate: float = CLIENT_PER_MINUTE / 60,
+                 client_burst: float = CLIENT_BURST, account_rate: float = ACCOUNT_PER_MINUTE / 60,
+                 account_burst: float = ACCOUNT_BURST, queue_size: int = QUEUE_SIZE,
+                 queue_budget: float = QUEUE_BUDGET):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.queue_size = queue_size
+        self.queue_budget = queue_budget
+        # A bucket left alone for burst / rate seconds is full again, so it can expire
+        self.clients = TTLCache(MAX_KEYS, ttl=client_burst / client_rate if client_rate > 0 else 0)
+        self.accounts = TTLCache(MAX_KEYS, ttl=account_burst / account_rate if account_rate > 0 else 0)
+        self._cond = threading.Condition()
+        self._queue: "deque[object]" = deque()
+        self._stats = {"admitted": 0, "queued": 0, "throttled_client": 0, "throttled_account": 0,
+                       "rejected_queue_full": 0, "rejected_budget": 0, "wait_seconds_max": 0.0}
+
+    def _key_bucket(self, cache: TTLCache, key: str, rate: float, burst: float) -> TokenBucket:
+        bucket = cache.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst)
+        return bucket
+
+    def _reject(self, reason: str, retry_after: float) -> Throttled:
+        self._stats[f"throttled_{reason}" if reason in ("client", "account") else f"rejected_{reason}"] += 1
+        admission_total.inc(controller=self.name, outcome=reason)
+        return Throttled(reason, retry_after)
+
+    def admit(self, client: Optional[str] = None, account: Optional[str] = None,
+              on_wait: Optional[Callable[[int, float], None]] = None) -> float:
+        """Block until the request may go out and return the seconds it queued, or raise Throttled.
+
+        on_wait(position, seconds_left) is called while the request is queued,
+        outside the lock, so it may update the UI.
+        """
+        with self._cond:
+            # Read inside the lock: a time from before another thread's refill would run the buckets backwards
+            start = time.monotonic()
+            keyed = []
+            for reason, cache, key, rate, burst in (
+                    ("account", self.accounts, account, self.account_rate, self.account_burst),
+                    ("client", self.clients, client, self.client_rate, self.client_burst)):
+                if key is None or rate <= 0:
+                    continue
+                bucket = self._key_bucket(cache, key, rate, burst)
+                wait = bucket.wait_time(start)
+                if wait > 0:
+                    raise self._reject(reason, wait)
+                keyed.append((cache, key, bucket))
+
+            if not self._queue and self.bucket.wait_time(start) == 0:
+                ticket = None
+            else:
+                ahead = len(self._queue)
+                if ahead >= self.queue_size:
+                    raise self._reject("queue_full", self.bucket.wait_time(start, ahead + 1))
+                expected = self.bucket.wait_time(start, ahead + 1)
+                if expected > self.queue_budget:
+                    raise self._reject("budget", expected)
+                ticket = object()
+                self._queue.append(ticket)
+                self._stats["queued"] += 1
+
+            # Client and account tokens are spent only once the request is admitted or queued
+            for cache, key, bucket in keyed:
+                bucket.take()
+                cache.set(key, bucket)
+            if ticket is None:
+                self.bucket.take()
+
+        try:
+            while ticket is not None:
+                with self._cond:
+                    now = time.monotonic()
+                    position = self._queue.index(ticket)
+                    left = self.bucket.wait_time(now, position + 1)
+                    if position == 0 and left == 0:
+                        self.bucket.take()
+                        self._queue.popleft()
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(timeout=min(left, WAIT_STEP) if left > 0 else WAIT_STEP)
+                if on_wait is not None:
+                    on_wait(position + 1, left)
+        except BaseException:
+            # The script run was stopped or rerun while queued; give up the place in line
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats["admitted"] += 1
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        admission_total.inc(controller=self.name, outcome="admitted" if ticket is None else "queued")
+        admission_wait_seconds.observe(waited, controller=self.name)
+        return waited
+
+    def stats(self) -> Dict[str, Any]:
+        """Admitted, queued and rejected counts, the current queue depth and the longest wait"""
+        with self._cond:
+            return {**self._stats, "queue_depth": len(self._queue),
+                    "clients": self.clients.stats()["size"], "accounts": self.accounts.stats()["size"]}
+
+
+auth_admission = AdmissionController("auth", AUTH_RATE, AUTH_BURST)
+submit_admission = AdmissionController("submit", SUBMIT_RATE, SUBMIT_BURST)
+
+
+def queue_depths() -> Dict[str, int]:
+    """Requests waiting in each controller's queue"""
+    return {controller.name: len(controller._queue) for controller in (auth_admission, submit_admission)}
+
+
+instrumentation.registry.gauge(
+    "wellness_admission_queue_depth", "Requests waiting for admission", "controller", queue_depths)
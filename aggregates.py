@@ -0,0 +1,110 @@
+import os
+import resilience
+import threading
+from shared_cache import tiered_cache
+from collections import Counter
+from questions import QUESTION_KEYS, QUESTIONS_BY_KEY
+from typing import Any, Dict, List, Optional
+
+# Row of response_aggregates counting responses rows (migrations/0004_response_aggregates.sql)
+TOTAL_KEY = "__responses__"
+POPULATION_KEY = "population"
+
+
+def answer_text(value: Any) -> str:
+    """An answer as Postgres jsonb_each_text renders it, the key used in response_aggregates"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class PopulationStats:
+    """Per-question answer counts across all users"""
+
+    def __init__(self, counts: Dict[str, Counter], total: int):
+        self.counts = counts
+        self.total = total
+        self._lock = threading.Lock()
+
+    def to_json(self) -> Dict[str, Any]:
+        """Counts and total as plain JSON data, the form kept in the shared cache tier"""
+        with self._lock:
+            return {"counts": {key: dict(counter) for key, counter in self.counts.items()}, "total": self.total}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "PopulationStats":
+        """Rebuild from to_json() output"""
+        return cls({key: Counter(counts) for key, counts in data["counts"].items()}, int(data["total"]))
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "PopulationStats":
+        """Build from get_response_aggregates() rows of question_key, answer, responses"""
+        counts = {key: Counter() for key in QUESTION_KEYS}
+        total = 0
+        for row in rows:
+            if row["question_key"] == TOTAL_KEY:
+                total = int(row["responses"])
+            elif row["question_key"] in counts:
+                counts[row["question_key"]][row["answer"]] += int(row["responses"])
+        return cls(counts, total)
+
+    def apply(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """Move one user's answers from old to new, as the responses trigger does in the database"""
+        with self._lock:
+            for row, delta in ((old, -1), (new, 1)):
+                if not row:
+                    continue
+                self.total += delta
+                for key in QUESTION_KEYS:
+                    if row.get(key) is not None:
+                        self.counts[key][answer_text(row[key])] += delta
+
+    def share(self, key: str, value: Any) -> Optional[int]:
+        """Percentage of users whose answer to key is value, or None before anyone has answered"""
+        with self._lock:
+            answered = sum(self.counts[key].values())
+            if answered <= 0:
+                return None
+            return round(100 * self.counts[key][answer_text(value)] / answered)
+
+    def distribution(self, key: str) -> Dict[Any, Optional[int]]:
+        """Percentage of users per option of a question, in registry order"""
+        return {option: self.share(key, option) for option in QUESTIONS_BY_KEY[key].options}
+
+
+# One process-wide snapshot; readers never touch responses, only this or one small RPC
+population_cache = tiered_cache("population", max_entries=1, ttl=float(os.getenv("POPULATION_CACHE_TTL", "300")),
+                                keep_stale=True, encode=PopulationStats.to_json, decode=PopulationStats.from_json)
+_refresh_lock = threading.Lock()
+
+
+def load_population(client) -> Dict[str, Any]:
+    """Cached population stats, fetched with get_response_aggregates when the snapshot expires"""
+    stats = population_cache.get(POPULATION_KEY)
+    if stats is not None:
+        return {"success": True, "data": stats}
+    with _refresh_lock:
+        stats = population_cache.get(POPULATION_KEY)
+        if stats is not None:
+            return {"success": True, "data": stats}
+        version = population_cache.version(POPULATION_KEY)
+        result = client.get_response_aggregates()
+        if not result["success"]:
+            # Keep showing the last snapshot while the aggregates RPC is failing
+            stats = population_cache.get_stale(POPULATION_KEY, max_stale=resilience.MAX_STALENESS)
+            if stats is not None:
+                resilience.note_stale()
+                return {"success": True, "data": stats, "stale": True}
+            return result
+        stats = PopulationStats.from_rows(result["data"])
+        population_cache.set(POPULATION_KEY, stats, if_version=version)
+        return {"success": True, "data": stats}
+
+
+def record_change(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+    """Apply a save or update made by this process to the cached snapshot, if there is one"""
+    stats = population_cache.get(POPULATION_KEY)
+    if stats is not None:
+        stats.apply(old, new)
+        # Publish to the other workers; a change one of them makes at the same moment is lost until the next refresh
+        population_cache.replace(POPULATION_KEY, stats)
@@ -0,0 +1,156 @@
+import asyncio
+import httpx
+import instrumentation
+import threading
+from contextvars import ContextVar
+from supabase import acreate_client, AsyncClientOptions
+from typing import Dict, Any, Optional
+
+
+class RegistrationStepError(Exception):
+    """A registration pipeline step failed or timed out"""
+
+    def __init__(self, step: str, message: str):
+        super().__init__(f"{step}: {message}")
+        self.step = step
+        self.message = message
+
+
+async def _step(name: str, awaitable, timeout: float):
+    """Await one pipeline step, tagging any failure with the step name"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        raise RegistrationStepError(name, f"timed out after {timeout:.0f}s")
+    except Exception as e:
+        raise RegistrationStepError(name, str(e))
+
+
+class _Pipeline:
+    """One event loop on a daemon thread plus the AsyncClient it keeps connections warm in, shared by every registration"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.http_client: Optional[httpx.AsyncClient] = None
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="registration-loop", daemon=True).start()
+            return self._loop
+
+    def run(self, coro) -> Any:
+        """Run a coroutine on the shared loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop()).result()
+
+
+_pipeline = _Pipeline()
+
+# Requests made by the registration running in the current task, handed back to the script run that waits on it
+_requests: ContextVar[Optional[list]] = ContextVar("registration_requests", default=None)
+
+
+async def _count_request(request) -> None:
+    counter = _requests.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+async def _counted(coro, counter: list):
+    _requests.set(counter)
+    return await coro
+
+
+def _http_client() -> httpx.AsyncClient:
+    """The pipeline's keep-alive AsyncClient, created on the loop's thread on first use"""
+    if _pipeline.http_client is None:
+        _pipeline.http_client = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            event_hooks={"request": [instrumentation.async_httpx_request_hook, _count_request]},
+        )
+    return _pipeline.http_client
+
+
+async def register_and_submit(url: str, key: str, email: str, phone: str, password: str,
+                              responses: Optional[Dict[str, Any]], step_timeout: float = 10.0,
+                              create=acreate_client) -> Dict[str, Any]:
+    """Register a user, then create the profile and save responses concurrently"""
+    # A fresh Supabase client per registration (auth state is per user), over warm pooled connections
+    http_client = _http_client()
+    client = await create(url, key, options=AsyncClientOptions(
+        httpx_client=http_client,
+        # The session is handed to the caller's sync client; nothing should refresh it here
+        auto_refresh_token=False,
+    ))
+
+    try:
+        auth_response = await _step("sign_up", client.auth.sign_up({
+            "email": email,
+            "password": password,
+            "options": {
+                "data": {
+                    "phone_number": phone
+                }
+            }
+        }), step_timeout)
+
+        # Sign in immediately after registration (since email confirmation is disabled)
+        if auth_response.user and not auth_response.session:
+            auth_response = await _step("sign_in", client.auth.sign_in_with_password({
+                "email": email,
+                "password": password
+            }), step_timeout)
+    except RegistrationStepError as e:
+        return {"success": False, "step": e.step, "error": e.message}
+
+    user = auth_response.user
+    if not user:
+        return {"success": False, "step": "sign_up", "error": "No user returned from sign up"}
+
+    # Both inserts only need the user id, so run them side by side
+    steps = [_step("create_user_profile", client.table("user_profiles").insert({
+        "id": user.id,
+        "phone_number": phone,
+        "email": email
+    }).execute(), step_timeout)]
+    # responses=None leaves the responses insert to the caller (write-behind mode)
+    if responses is not None:
+        steps.append(_step("save_responses", client.table("responses").insert({
+            "user_id": user.id,
+            **responses
+        }).execute(), step_timeout))
+    results = await asyncio.gather(*steps, return_exceptions=True)
+    responses_result = results[1] if responses is not None else None
+
+    errors = {
+        result.step: result.message
+        for result in results
+        if isinstance(result, RegistrationStepError)
+    }
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, RegistrationStepError):
+            raise result
+
+    return {
+        "success": "save_responses" not in errors,
+        "user": user,
+        "session": auth_response.session,
+        "responses": None if "save_responses" in errors or responses_result is None else responses_result.data,
+        "errors": errors,
+        "step": "save_responses" if "save_responses" in errors else None,
+        "error": errors.get("save_responses"),
+    }
+
+
+def register_and_submit_sync(*args, **kwargs) -> Dict[str, Any]:
+    """Run the registration pipeline from a synchronous Streamlit script thread"""
+    counter = [0]
+    try:
+        return _pipeline.run(_counted(register_and_submit(*args, **kwargs), counter))
+    except Exception as e:
+        return {"success": False, "step": None, "error": str(e)}
+    finally:
+        instrumentation.add_round_trips(counter[0])
@@ -0,0 +1,173 @@
+import base64
+import json
+import os
+import secrets
+import time
+from cache import TTLCache
+from session_model import SessionTokens, SessionUser
+from typing import Any, Dict, MutableMapping, Optional
+
+# Refresh the access token this many seconds before it expires
+REFRESH_MARGIN = float(os.getenv("AUTH_REFRESH_MARGIN", "60"))
+
+# resume id -> tokens, so a browser reload (a new Streamlit session) can pick the login back up.
+# The id is random and reaches the browser only as an HttpOnly cookie, never in the URL.
+# Open sessions keep only the id too, so size it above the number of signed-in sessions.
+resume_store = TTLCache(
+    max_entries=int(os.getenv("AUTH_RESUME_MAX_ENTRIES", "50000")),
+    ttl=float(os.getenv("AUTH_RESUME_TTL", "604800")),
+)
+
+# Session state holds only this handle; the tokens themselves live in resume_store
+SESSION_KEY = "auth_resume_id"
+
+# The script cannot set cookies, so a new resume id is handed to the page as a one-time code
+# that the page trades for the cookie at RESUME_ROUTE (server.py); END_ROUTE drops a dead cookie
+RESUME_COOKIE = os.getenv("AUTH_RESUME_COOKIE", "wellness_resume")
+RESUME_COOKIE_SECURE = os.getenv("AUTH_RESUME_COOKIE_SECURE", "1") != "0"
+RESUME_ROUTE = "/api/session/resume"
+END_ROUTE = "/api/session/end"
+HANDOFF_KEY = "auth_resume_handoff"
+END_KEY = "auth_resume_end"
+handoffs = TTLCache(max_entries=10000, ttl=float(os.getenv("AUTH_HANDOFF_TTL", "60")))
+
+
+def jwt_claims(token: str) -> Dict[str, Any]:
+    """Decode a JWT's payload without verifying it; only for local expiry checks, the server still verifies"""
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return {}
+
+
+def token_expires_at(token: str) -> float:
+    """exp claim of an access token, or 0 when it cannot be read"""
+    return float(jwt_claims(token).get("exp") or 0)
+
+
+def claim_handoff(code: str) -> Optional[str]:
+    """Trade a one-time handoff code for the resume id it was issued for, or None"""
+    resume_id = handoffs.get(code)
+    handoffs.invalidate(code)
+    return resume_id if resume_id and resume_id in resume_store else None
+
+
+def is_live(resume_id: Optional[str]) -> bool:
+    """Whether resume_id still restores a login"""
+    return bool(resume_id) and resume_id in resume_store
+
+
+class TokenManager:
+    """Access and refresh tokens for one browser session, referenced from st.session_state by resume id"""
+
+    def __init__(self, state: MutableMapping[str, Any]):
+        self.state = state
+
+    @property
+    def resume_id(self) -> Optional[str]:
+        return self.state.get(SESSION_KEY)
+
+    @property
+    def tokens(self) -> Optional[SessionTokens]:
+        resume_id = self.resume_id
+        return resume_store.get(resume_id) if resume_id else None
+
+    def store(self, session, rotate: bool = False) -> str:
+        """Remember a signed-in session's tokens; returns the id that resumes it after a reload.
+
+        rotate (on login and password change) puts them under a new id, so the
+        old one stops restoring anything, and queues a handoff for its cookie.
+        """
+        previous = self.resume_id
+        resume_id = previous if previous and not rotate else secrets.token_urlsafe(24)
+        tokens = SessionTokens(
+            access_token=session.access_token,
+            refresh_token=session.refresh_token,
+            expires_at=token_expires_at(session.access_token) or float(session.expires_at or 0),
+            resume_id=resume_id,
+            user=SessionUser.from_user(session.user),
+        )
+        self.state[SESSION_KEY] = resume_id
+        resume_store.set(resume_id, tokens)
+        if resume_id != previous:
+            if previous:
+                resume_store.invalidate(previous)
+            code = secrets.token_urlsafe(24)
+            handoffs.set(code, resume_id)
+            self.state[HANDOFF_KEY] = code
+            self.state.pop(END_KEY, None)
+        return resume_id
+
+    def clear(self) -> None:
+        """Forget the tokens and the resume id, e.g. on logout; every tab resumed from it is signed out"""
+        resume_id = self.state.pop(SESSION_KEY, None)
+        self.state.pop(HANDOFF_KEY, None)
+        if resume_id:
+            resume_store.invalidate(resume_id)
+            self.state[END_KEY] = True
+
+    def pending_handoff(self) -> Optional[str]:
+        """The one-time code the page still has to trade for the resume cookie, if any"""
+        code = self.state.get(HANDOFF_KEY)
+        if code and code not in handoffs:
+            self.state.pop(HANDOFF_KEY, None)
+            return None
+        return code
+
+    def expires_in(self) -> float:
+        """Seconds until the access token expires, checked locally from its exp claim"""
+        tokens = self.tokens
+        return tokens.expires_at - time.time() if tokens else 0.0
+
+    def session(self):
+        """Rebuild an auth Session from the stored tokens"""
+        from supabase_auth.types import Session
+
+        tokens = self.tokens
+        return Session(
+            access_token=tokens.access_token,
+            refresh_token=tokens.refresh_token,
+            expires_in=max(0, int(self.expires_in())),
+            expires_at=int(tokens.expires_at),
+            token_type="bearer",
+            user=tokens.user.to_user(),
+        )
+
+    def ensure(self, client) -> bool:
+        """Make client hold a valid session: refresh ahead of expiry, or re-install the stored one.
+
+        Only a refresh costs a round trip; a client that lost its session (evicted
+        from the pool) gets the stored tokens back locally. Tabs resumed from the
+        same id share one entry, so a refresh in one is seen by all. False means
+        the user has to sign in again.
+        """
+        tokens = self.tokens
+        if not tokens:
+            if self.state.pop(SESSION_KEY, None):
+                self.state[END_KEY] = True
+            return False
+        held = client.held_session()
+        if (held is not None and held.refresh_token != tokens.refresh_token and held.user is not None
+                and str(held.user.id) == tokens.user.id and token_expires_at(held.access_token) > tokens.expires_at):
+            # The client was handed newer tokens than the stored ones; refreshing the stored refresh token would be a reuse
+            self.store(held)
+            tokens = self.tokens
+        if self.expires_in() <= REFRESH_MARGIN:
+            result = client.refresh_session(tokens.refresh_token)
+            if not result["success"]:
+                self.clear()
+                return False
+            self.store(result["session"])
+            return True
+        if client.access_token() != tokens.access_token:
+            client.adopt_session(self.session())
+        return True
+
+    def restore(self, resume_id: str, client) -> bool:
+        """Pick up the session a previous page load stored under resume_id; a dead id gets its cookie dropped"""
+        if resume_store.get(resume_id) is None:
+            self.state[END_KEY] = True
+            return False
+        self.state[SESSION_KEY] = resume_id
+        return self.ensure(client)
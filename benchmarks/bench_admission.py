@@ -0,0 +1,127 @@
+"""Latency of legitimate sign-ins during a credential-stuffing wave, with and without admission control.
+
+Supabase Auth is modelled as --capacity concurrent slots that each take
+--latency-ms per request; requests past that wait for a slot, like an
+overloaded auth server. For --seconds, --attackers threads spread over
+--attack-ips addresses try random accounts back to back, while --users
+legitimate users, each from their own address, sign in once at evenly spaced
+times. The admission controller (admission.py) uses the default per-client
+and per-account limits and a global rate of the backend's throughput.
+
+Usage:
+    python benchmarks/bench_admission.py --attackers 50 --users 200 --capacity 10 --latency-ms 100
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from admission import AdmissionController, Throttled  # noqa: E402
+
+
+class Backend:
+    """Fixed number of concurrent slots, each busy for latency seconds per request"""
+
+    def __init__(self, capacity, latency):
+        self.slots = threading.Semaphore(capacity)
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def sign_in(self):
+        with self.slots:
+            with self._lock:
+                self.calls += 1
+            time.sleep(self.latency)
+
+
+def run(args, controller):
+    backend = Backend(args.capacity, args.latency_ms / 1000)
+    stop = time.monotonic() + args.seconds
+    legit = []
+    attempts = {"attacker": 0, "attacker_admitted": 0}
+    lock = threading.Lock()
+
+    def attempt(client, account):
+        if controller is not None:
+            controller.admit(client, account)
+        backend.sign_in()
+
+    def attacker(i):
+        rng = random.Random(i)
+        client = f"10.0.0.{i % args.attack_ips}"
+        while time.monotonic() < stop:
+            with lock:
+                attempts["attacker"] += 1
+            try:
+                attempt(client, f"victim{rng.randrange(100000)}@example.com")
+            except Throttled:
+                time.sleep(0.01)
+                continue
+            with lock:
+                attempts["attacker_admitted"] += 1
+
+    def user(i):
+        time.sleep(args.seconds * i / args.users)
+        start = time.monotonic()
+        try:
+            attempt(f"192.168.{i // 256}.{i % 256}", f"user{i}@example.com")
+            outcome = "ok"
+        except Throttled as e:
+            outcome = e.reason
+        with lock:
+            legit.append((outcome, time.monotonic() - start))
+
+    threads = [threading.Thread(target=attacker, args=(i,)) for i in range(args.attackers)]
+    threads += [threading.Thread(target=user, args=(i,)) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(seconds * 1000 for outcome, seconds in legit if outcome == "ok")
+    rejected = sum(outcome != "ok" for outcome, _ in legit)
+    return {
+        "ok": len(latencies),
+        "rejected": rejected,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+        "max": latencies[-1] if latencies else 0.0,
+        "attacker": attempts["attacker"],
+        "attacker_admitted": attempts["attacker_admitted"],
+        "backend_calls": backend.calls,
+    }
+
+
+def report(label, result):
+    print(f"{label:<20} users ok {result['ok']:>4} rejected {result['rejected']:>3}  "
+          f"p50 {result['p50']:6.0f}ms p95 {result['p95']:6.0f}ms max {result['max']:6.0f}ms  "
+          f"attacker attempts {result['attacker']:>6} reached auth {result['attacker_admitted']:>5}  "
+          f"auth calls {result['backend_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Legitimate sign-in latency under a credential-stuffing wave")
+    parser.add_argument("--attackers", type=int, default=50)
+    parser.add_argument("--attack-ips", type=int, default=5)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--capacity", type=int, default=10, help="concurrent requests the auth backend serves")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    throughput = args.capacity / (args.latency_ms / 1000)
+    print(f"{args.attackers} attackers on {args.attack_ips} addresses, {args.users} users over {args.seconds:g}s, "
+          f"auth backend {throughput:.0f} requests/s")
+    report("no admission", run(args, None))
+    report("admission control", run(args, AdmissionController("auth", rate=throughput, burst=args.capacity)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Compare a full-script rerun with a fragment-scoped rerun when answering one question.
+
+Before the questionnaire sections became fragments, every radio click reran the
+whole script (title, all 11 radios, progress bar, buttons and, in edit mode, the
+prefill lookup). Now a click reruns only its own section and the prefill runs
+once per visit. This benchmark drives the edit page of wellness_app.py with
+AppTest against the in-memory backend and times both kinds of rerun, along with
+the get_user_responses lookups and backend requests each one makes. The
+"before" row clears the once-per-visit prefill flag ahead of every click, so
+each full rerun repeats the lookup as the old edit page did. The lookup is
+usually answered by the response cache, so it costs script time rather than
+backend requests.
+
+Usage:
+    python benchmarks/bench_questionnaire_rerun.py --iterations 200
+"""
+import argparse
+import dataclasses
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "wellness_app.py")
+sys.path.insert(0, ROOT)
+os.environ["SUPABASE_BACKEND"] = "memory"
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import app_test as app_test_module  # noqa: E402
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequests  # noqa: E402
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner  # noqa: E402
+
+import fake_supabase  # noqa: E402
+import instrumentation  # noqa: E402
+
+SCRIPT_CACHE = ScriptCache()
+
+
+@contextmanager
+def timed_runner(timings, fragment_id=None):
+    """Record script execution time of the next AppTest run, optionally scoped to one fragment"""
+
+    class TimingScriptRunner(LocalScriptRunner):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # AppTest recompiles the script on every run; a real server compiles it once
+            self._script_cache = SCRIPT_CACHE
+            if fragment_id is not None:
+                # Drop the queued full-script initial run, it would absorb the fragment request
+                self._requests = ScriptRequests()
+            self.on_event.connect(self._time_event, weak=False)
+
+        def _time_event(self, sender, event, **kwargs):
+            if event == ScriptRunnerEvent.SCRIPT_STARTED:
+                self._started = time.perf_counter()
+            elif event in (ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS, ScriptRunnerEvent.FRAGMENT_STOPPED_WITH_SUCCESS,
+                           ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR, ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN):
+                timings.append((time.perf_counter() - self._started) * 1000)
+
+        def request_rerun(self, rerun_data):
+            if fragment_id is not None:
+                rerun_data = dataclasses.replace(rerun_data, fragment_id_queue=[fragment_id])
+            return super().request_rerun(rerun_data)
+
+    original = app_test_module.LocalScriptRunner
+    app_test_module.LocalScriptRunner = TimingScriptRunner
+    try:
+        yield
+    finally:
+        app_test_module.LocalScriptRunner = original
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def open_edit_page():
+    """Register a user through the app and land on the edit page"""
+    at = AppTest.from_file(APP_PATH, default_timeout=30).run()
+    for radio in at.radio:
+        if radio.key:
+            radio.set_value(True if list(radio.options) == ["Yes", "No"] else radio.options[0])
+    at.run()
+    next(b for b in at.button if b.label == "Continue to Submit").click().run()
+    at.text_input[0].input("bench@example.com")
+    at.text_input[1].input("555-234-5678")
+    at.text_input[2].input("bench-password")
+    next(b for b in at.button if b.label == "Submit Responses").click().run()
+    at.run()
+    next(b for b in at.button if b.label == "Update My Responses").click().run()
+    if at.exception or at.session_state.page != "edit":
+        raise SystemExit(f"Could not reach the edit page: {at.exception}")
+    return at
+
+
+def lookups():
+    """get_user_responses calls so far"""
+    return sum(value for labels, value in instrumentation.client_calls_total.values.items()
+               if ("method", "get_user_responses") in labels)
+
+
+def measure(at, iterations, fragment_id=None, prefill_every_run=False):
+    script_ms = []
+    total_ms = []
+    before = fake_supabase.database.stats()["requests"]
+    lookups_before = lookups()
+    for i in range(iterations):
+        if prefill_every_run:
+            at.session_state["edit_prefilled"] = False
+        at.radio(key="h1_sleep_7hrs").set_value(i % 2 == 0)
+        timings = []
+        start = time.perf_counter()
+        with timed_runner(timings, fragment_id):
+            at.run()
+        total_ms.append((time.perf_counter() - start) * 1000)
+        script_ms.append(sum(timings))
+        if at.exception:
+            raise SystemExit(at.exception[0].value)
+    requests = fake_supabase.database.stats()["requests"] - before
+    return {
+        "lookups_per_click": (lookups() - lookups_before) / iterations,
+        "script_p50_ms": percentile(script_ms, 50),
+        "script_p95_ms": percentile(script_ms, 95),
+        "apptest_mean_ms": statistics.mean(total_ms),
+        "requests_per_click": requests / iterations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs fragment-scoped questionnaire rerun")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="injected backend latency")
+    args = parser.parse_args()
+
+    fake_supabase.database.configure(latency_ms=args.latency_ms)
+    at = open_edit_page()
+
+    # Sections register their fragments in page order; the first one is Health
+    health_fragment = next(iter(at._fragment_storage._fragments))
+
+    results = {
+        "full rerun + prefill (before)": measure(at, args.iterations, prefill_every_run=True),
+        "full script rerun": measure(at, args.iterations),
+        "fragment rerun (after)": measure(at, args.iterations, health_fragment),
+    }
+
+    # "script" is time inside the script runner; "AppTest" adds the harness's fixed per-run overhead
+    print(f"{'rerun':<30} {'script p50':>11} {'script p95':>11} {'AppTest mean':>13} {'lookups/click':>14} "
+          f"{'requests/click':>15}")
+    for name, row in results.items():
+        print(f"{name:<30} {row['script_p50_ms']:>9.2f}ms {row['script_p95_ms']:>9.2f}ms "
+              f"{row['apptest_mean_ms']:>11.2f}ms {row['lookups_per_click']:>14.2f} {row['requests_per_click']:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Exercise call deadlines, read retries and circuit breakers against the injected-latency backend.
+
+Scenarios, each on a fresh in-memory database (SUPABASE_BACKEND=memory):
+
+  deadline  every request takes --slow-ms; calls must give up at SUPABASE_CALL_DEADLINE
+  flaky     --error-rate of requests fail; reads with retries vs the same reads without
+  outage    every request fails; the responses breaker opens, later reads fail fast
+            and the dashboard read is answered from the stale cache
+  recovery  the backend comes back; after SUPABASE_BREAKER_RESET one trial closes the breaker
+
+Usage:
+    python benchmarks/bench_resilience.py --latency-ms 20 --error-rate 0.2
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["SUPABASE_BACKEND"] = "memory"
+
+import fake_supabase  # noqa: E402
+import resilience  # noqa: E402
+from questions import QUESTIONS  # noqa: E402
+from supabase_client import SupabaseClient, response_cache  # noqa: E402
+
+ANSWERS = {question.key: question.options[0] for question in QUESTIONS}
+
+
+def setup():
+    fake_supabase.database.reset()
+    fake_supabase.database.configure(latency_ms=0, jitter_ms=0, error_rate=0)
+    response_cache.clear()
+    resilience._breakers.clear()
+    client = SupabaseClient()
+    registered = client.register_user("bench@example.com", "+15550100", "password123")
+    user_id = registered["user"].id
+    client.save_responses(user_id, ANSWERS)
+    return client, user_id
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def deadline(slow_ms):
+    client, user_id = setup()
+    fake_supabase.database.configure(latency_ms=slow_ms)
+    result, ms = timed(lambda: client.get_user_responses(user_id, use_cache=False))
+    print(f"deadline  request {slow_ms:.0f}ms, deadline {resilience.CALL_DEADLINE * 1000:.0f}ms: "
+          f"success={result['success']} in {ms:.0f}ms")
+
+
+def flaky(latency_ms, error_rate, reads):
+    for retries in (0, resilience.READ_RETRIES):
+        client, user_id = setup()
+        resilience.READ_RETRIES = retries
+        # Keep the breaker out of the way: this scenario is about retries
+        resilience.breaker("responses").failure_threshold = reads + 1
+        fake_supabase.database.configure(latency_ms=latency_ms, jitter_ms=latency_ms / 2, error_rate=error_rate)
+        latencies, ok = [], 0
+        for _ in range(reads):
+            result, ms = timed(lambda: client.get_user_responses(user_id, use_cache=False))
+            ok += result["success"]
+            latencies.append(ms)
+        latencies.sort()
+        print(f"flaky     error rate {error_rate:.0%}, retries={retries}: {ok}/{reads} succeeded, "
+              f"p50 {statistics.median(latencies):.0f}ms p99 {latencies[int(len(latencies) * 0.99) - 1]:.0f}ms")
+
+
+def outage(latency_ms):
+    client, user_id = setup()
+    client.get_user_responses(user_id)  # warm the cache, then let it expire
+    response_cache.set(user_id, response_cache.get(user_id), ttl=0)
+    fake_supabase.database.configure(latency_ms=latency_ms, error_rate=1.0)
+
+    attempts = resilience.BREAKER_FAILURES + 3
+    for i in range(attempts):
+        result, ms = timed(lambda: client.get_user_responses(user_id))
+        state = resilience.breaker("responses").state
+        print(f"outage    read {i + 1}: success={result['success']} stale={result.get('stale', False)} "
+              f"breaker={state} {ms:.1f}ms")
+    return client, user_id
+
+
+def recovery(client, user_id, latency_ms):
+    fake_supabase.database.configure(latency_ms=latency_ms, error_rate=0)
+    time.sleep(resilience.breaker("responses").reset_timeout)
+    result, ms = timed(lambda: client.get_user_responses(user_id, use_cache=False))
+    print(f"recovery  after {resilience.BREAKER_RESET:.1f}s: success={result['success']} "
+          f"breaker={resilience.breaker('responses').state} {ms:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deadlines, retries and circuit breakers under injected faults")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--slow-ms", type=float, default=2000)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--deadline", type=float, default=0.5, help="SUPABASE_CALL_DEADLINE for this run")
+    parser.add_argument("--breaker-reset", type=float, default=1.0, help="SUPABASE_BREAKER_RESET for this run")
+    args = parser.parse_args()
+
+    resilience.CALL_DEADLINE = args.deadline
+    resilience.BREAKER_RESET = args.breaker_reset
+
+    deadline(args.slow_ms)
+    retries = resilience.READ_RETRIES
+    flaky(args.latency_ms, args.error_rate, args.reads)
+    resilience.READ_RETRIES = retries
+    client, user_id = outage(args.latency_ms)
+    recovery(client, user_id, args.latency_ms)
+    print("counters ", resilience.stats())
+
+
+if __name__ == "__main__":
+    main()
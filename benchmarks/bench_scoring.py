@@ -0,0 +1,98 @@
+"""Compare the vectorized scoring engine with a naive per-dict implementation.
+
+Generates random response rows, scores them once with a straightforward Python
+loop over dicts and once with scoring.py (pack into bits and uint8 codes, then
+score every row in one NumPy call), checks that both agree, and reports time
+and memory for each.
+
+Usage:
+    python benchmarks/bench_scoring.py --rows 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+import scoring  # noqa: E402
+from questions import QUESTIONS, SECTIONS  # noqa: E402
+
+
+def random_rows(count, seed=0):
+    rng = random.Random(seed)
+    return [{q.key: rng.choice(q.options) for q in QUESTIONS} for _ in range(count)]
+
+
+def naive_score(row):
+    """Score one dict the obvious way: loop over sections and questions"""
+    dimensions = {}
+    for section in SECTIONS:
+        if not section.focus:
+            continue
+        points = []
+        for question in section.questions:
+            if not question.favourable:
+                continue
+            answer = row.get(question.key)
+            if answer not in question.options:
+                points.append(0.0)
+                continue
+            best = question.options.index(question.favourable[0])
+            span = max(len(question.options) - 1, 1)
+            points.append(1.0 - abs(question.options.index(answer) - best) / span)
+        dimensions[section.focus] = 100.0 * sum(points) / len(points)
+    weights = {name: scoring.FOCUS_WEIGHT if row.get("f_focus_area") == name else 1.0 for name in dimensions}
+    dimensions["Overall"] = sum(dimensions[name] * weights[name] for name in weights) / sum(weights.values())
+    return dimensions
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized vs per-dict wellness scoring")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = random_rows(args.rows)
+
+    naive, naive_ms = timed(lambda: [naive_score(row) for row in rows], repeat=args.repeat)
+    packed, pack_ms = timed(scoring.pack, rows, repeat=args.repeat)
+    scores, score_ms = timed(scoring.score, packed, repeat=args.repeat)
+
+    for name, values in scores.items():
+        expected = np.array([row[name] for row in naive], dtype=np.float32)
+        if not np.allclose(values, expected, atol=1e-3):
+            raise SystemExit(f"Vectorized {name} scores disagree with the naive implementation")
+
+    tracemalloc.start()
+    copied = [dict(row) for row in rows]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del copied
+
+    print(f"rows: {args.rows}")
+    print(f"{'implementation':<28} {'time':>10} {'rows/s':>14}")
+    print(f"{'naive per-dict':<28} {naive_ms:>8.1f}ms {args.rows / naive_ms * 1000:>14,.0f}")
+    print(f"{'vectorized score only':<28} {score_ms:>8.1f}ms {args.rows / score_ms * 1000:>14,.0f}")
+    print(f"{'vectorized pack + score':<28} {pack_ms + score_ms:>8.1f}ms {args.rows / (pack_ms + score_ms) * 1000:>14,.0f}")
+    print(f"speedup (score only): {naive_ms / score_ms:.0f}x")
+    print(f"memory: list of dicts {dict_bytes / 1e6:.1f}MB, packed {packed.nbytes / 1e6:.2f}MB "
+          f"({packed.nbytes / len(packed):.0f} bytes/row)")
+
+
+if __name__ == "__main__":
+    main()
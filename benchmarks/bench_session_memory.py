@@ -0,0 +1,101 @@
+"""Per-session server memory: the old session state layout vs the compact session model.
+
+Signs --users users in against the in-memory backend (SUPABASE_BACKEND=memory)
+and sizes what one signed-in session keeps in st.session_state:
+
+  before  the full supabase_auth User, a {question key: answer} dict and a token
+          dict holding the access/refresh tokens and a second User
+  after   a SessionUser (id, email), the packed answer bytes and the resume id;
+          the tokens live once per login in auth_session.resume_store
+
+Then every user leases a pooled client, and the pool (idle timeout 0) evicts
+them all on its next sweep, as it does for tabs left open overnight.
+
+Usage:
+    python benchmarks/bench_session_memory.py --users 500
+"""
+import argparse
+import os
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["SUPABASE_BACKEND"] = "memory"
+
+import auth_session  # noqa: E402
+from questions import QUESTIONS, pack_answers  # noqa: E402
+from session_model import SessionMonitor, SessionUser, deep_size  # noqa: E402
+from supabase_client import SupabaseClient, get_client_pool  # noqa: E402
+
+ANSWERS = {question.key: question.options[-1] for question in QUESTIONS}
+
+
+class State(dict):
+    """Stands in for a Streamlit SessionState in the monitor's session list"""
+
+    @property
+    def filtered_state(self):
+        return self
+
+
+def sign_in(client, i):
+    email = f"user{i}@example.com"
+    client.register_user(email, f"+1555{i:07d}", "password123")
+    return client.sign_in_user(email, "password123")
+
+
+def before(result):
+    session = result["session"]
+    return State({
+        "user": result["user"],
+        "responses": dict(ANSWERS),
+        "auth_tokens": {
+            "access_token": session.access_token,
+            "refresh_token": session.refresh_token,
+            "expires_at": session.expires_at,
+            "resume_id": "x" * 43,
+            "user": session.user,
+        },
+    })
+
+
+def after(result):
+    state = State({"user": SessionUser.from_user(result["user"]), "responses": pack_answers(ANSWERS)})
+    auth_session.TokenManager(state).store(result["session"])
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session state size before and after the compact session model")
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    client = SupabaseClient()
+    results = [sign_in(client, i) for i in range(args.users)]
+
+    old = [deep_size(before(result)) for result in results]
+    new_states = [after(result) for result in results]
+    new = [deep_size(state) for state in new_states]
+    tokens = [deep_size(auth_session.resume_store.get(state[auth_session.SESSION_KEY])) for state in new_states]
+    print(f"{args.users} signed-in sessions, {len(QUESTIONS)} answered questions")
+    print(f"before  session state {statistics.median(old):>6.0f} B per session")
+    print(f"after   session state {statistics.median(new):>6.0f} B per session, "
+          f"+ {statistics.median(tokens):.0f} B of tokens in resume_store")
+    print(f"        {statistics.median(old) / (statistics.median(new) + statistics.median(tokens)):.1f}x less per session")
+
+    pool = get_client_pool()
+    pool.max_size = max(pool.max_size, args.users)
+    session_ids = [f"session-{i}" for i in range(args.users)]
+    for session_id in session_ids:
+        pool.acquire(session_id)
+    leased = pool.stats()["size"]
+    # Tabs left open overnight: past the idle timeout, the pool's next sweep closes their clients
+    pool.idle_timeout = 0
+    after_sweep = pool.stats()
+    print(f"pool    size {leased}, evicted {after_sweep['evicted']} idle sessions' clients, size now {after_sweep['size']}")
+    monitor = SessionMonitor(sessions=lambda: [(s, state, False) for s, state in zip(session_ids, new_states)])
+    print("stats  ", monitor.stats())
+
+if __name__ == "__main__":
+    main()
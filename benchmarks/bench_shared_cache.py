@@ -0,0 +1,113 @@
+"""Hit rate and staleness of the responses cache across several worker processes.
+
+Simulates --workers Streamlit processes behind a load balancer: every request
+lands on a random worker and reads (or, at --write-rate, saves) a random user's
+row. A miss reads the "database" (a Manager dict behind --latency-ms). It runs
+twice, with process-local caches and with the SQLite tier from shared_cache.py,
+then once more with freshly started workers, as after a deploy or a restart.
+
+A stale read is a cache hit that returns an older revision than the database
+holds, e.g. a worker still serving a row another worker has since updated.
+
+Usage:
+    python benchmarks/bench_shared_cache.py --workers 4 --users 2000 --requests 5000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker(path, db, lock, seed, args, out):
+    if path:
+        os.environ["SHARED_CACHE_PATH"] = path
+    sys.path.insert(0, ROOT)
+    from shared_cache import tiered_cache
+
+    cache = tiered_cache("responses", max_entries=args.users, ttl=300)
+    rng = random.Random(seed)
+    latency = args.latency_ms / 1000
+    hits = misses = stale = 0
+    hit_us = []
+    for _ in range(args.requests):
+        user = f"user-{rng.randrange(args.users)}"
+        if rng.random() < args.write_rate:
+            time.sleep(latency)
+            with lock:
+                db[user] = revision = db.get(user, 0) + 1
+                cache.set(user, {"user_id": user, "rev": revision})
+            continue
+        start = time.perf_counter()
+        row = cache.get(user)
+        if row is not None:
+            hit_us.append((time.perf_counter() - start) * 1e6)
+            hits += 1
+            stale += row["rev"] < db.get(user, 0)
+            continue
+        misses += 1
+        version = cache.version(user)
+        time.sleep(latency)
+        cache.set(user, {"user_id": user, "rev": db.get(user, 0)}, if_version=version)
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    out.put({"hits": hits, "misses": misses, "stale": stale, "hit_us": hit_us, "rss_mb": rss_mb})
+
+
+def run(ctx, path, db, lock, args, seed):
+    out = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(path, db, lock, seed + i, args, out)) for i in range(args.workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    results = [out.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    hits = sum(r["hits"] for r in results)
+    misses = sum(r["misses"] for r in results)
+    stale = sum(r["stale"] for r in results)
+    hit_us = [us for r in results for us in r["hit_us"]]
+    return {
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "db_reads": misses,
+        "stale": stale,
+        "hit_p50_us": statistics.median(hit_us) if hit_us else 0.0,
+        "peak_rss_mb": max(r["rss_mb"] for r in results),
+        "seconds": elapsed,
+    }
+
+
+def report(label, result):
+    print(f"{label:<42} hit rate {result['hit_rate']:6.1%}  db reads {result['db_reads']:>6}  "
+          f"stale reads {result['stale']:>5}  hit p50 {result['hit_p50_us']:6.1f}us  "
+          f"worker rss {result['peak_rss_mb']:5.1f}MB  {result['seconds']:5.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process-local vs shared SQLite cache tier across worker processes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=5000, help="requests per worker")
+    parser.add_argument("--write-rate", type=float, default=0.05)
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="simulated database round trip")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager, tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite")
+        print(f"{args.workers} workers x {args.requests} requests over {args.users} users, "
+              f"{args.write_rate:.0%} writes, {args.latency_ms:g}ms per database call")
+        for label, cache_path in (("process-local TTLCache", ""), ("shared SQLite tier", path)):
+            db, lock = manager.dict(), manager.Lock()
+            report(label, run(ctx, cache_path, db, lock, args, seed=1))
+            report(f"{label}, restarted workers", run(ctx, cache_path, db, lock, args, seed=100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure cold-start cost: module import time and first-render latency of wellness_app.py.
+
+Every Streamlit worker (and every batch job) pays the import cost of
+supabase_client.py once, and the first visitor to a fresh worker pays for the
+first script run on top. Each sample runs in a fresh interpreter so nothing is
+already imported or cached. Reported numbers are medians over --runs samples.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside a fresh interpreter and prints one JSON sample
+PROBE = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+os.environ.setdefault("SUPABASE_BACKEND", "memory")
+
+start = time.perf_counter()
+import supabase_client
+import_ms = (time.perf_counter() - start) * 1000
+
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(os.path.join({root!r}, "wellness_app.py"), default_timeout=60)
+start = time.perf_counter()
+app.run()
+first_render_ms = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+app.run()
+second_render_ms = (time.perf_counter() - start) * 1000
+if app.exception:
+    raise SystemExit(app.exception[0].value)
+
+modules = len(sys.modules)
+print(json.dumps({{"import_ms": import_ms, "first_render_ms": first_render_ms,
+                  "cold_start_ms": import_ms + first_render_ms,
+                  "second_render_ms": second_render_ms, "modules": modules}}))
+"""
+
+BATCH_PROBE = """
+import os, sys, time, json
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import main
+print(json.dumps({{"batch_import_ms": (time.perf_counter() - start) * 1000,
+                  "streamlit_loaded": "streamlit" in sys.modules}}))
+"""
+
+
+def sample(code):
+    output = subprocess.run([sys.executable, "-c", code.format(root=ROOT)], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="supabase_client import time and first-render latency")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [sample(PROBE) for _ in range(args.runs)]
+    batch = [sample(BATCH_PROBE) for _ in range(args.runs)]
+
+    print(f"runs: {args.runs} (median, fresh interpreter each)")
+    for key, label in (("import_ms", "import supabase_client"), ("first_render_ms", "first render (cold worker)"),
+                       ("cold_start_ms", "import + first render"), ("second_render_ms", "second render (warm)")):
+        print(f"{label:<30} {statistics.median(s[key] for s in samples):>9.1f}ms")
+    print(f"{'import main (batch CLI)':<30} {statistics.median(s['batch_import_ms'] for s in batch):>9.1f}ms"
+          f"  streamlit imported: {batch[0]['streamlit_loaded']}")
+    print(f"{'modules loaded after render':<30} {samples[0]['modules']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare round trips and latency of the RPC and Python update_responses paths.
+
+Usage:
+    BENCH_EMAIL=... BENCH_PASSWORD=... python benchmarks/bench_update_responses.py --iterations 50
+
+The account must already exist and have a responses row. Every iteration
+writes one response_history row per path.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase_client import SupabaseClient  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_path(client, user_id, path, iterations, counter):
+    update = client._update_responses_rpc if path == "rpc" else client._update_responses_fallback
+    latencies = []
+    round_trips = []
+    for i in range(iterations):
+        answers = {"h1_sleep_7hrs": i % 2 == 0, "f_focus_area": ["Health", "Wealth", "Happiness"][i % 3]}
+        before = counter["requests"]
+        start = time.perf_counter()
+        result = update(user_id, answers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        round_trips.append(counter["requests"] - before)
+        if not result["success"]:
+            raise SystemExit(f"{path} update failed: {result['error']}")
+    return {
+        "path": path,
+        "round_trips": statistics.mean(round_trips),
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--email", default=os.getenv("BENCH_EMAIL"))
+    parser.add_argument("--password", default=os.getenv("BENCH_PASSWORD"))
+    args = parser.parse_args()
+
+    if not args.email or not args.password:
+        parser.error("set BENCH_EMAIL/BENCH_PASSWORD or pass --email/--password")
+
+    counter = {"requests": 0}
+
+    def count_request(request):
+        counter["requests"] += 1
+
+    http_client = httpx.Client(http2=True, follow_redirects=True, event_hooks={"request": [count_request]})
+    client = SupabaseClient(http_client=http_client)
+    signed_in = client.sign_in_user(args.email, args.password)
+    if not signed_in["success"]:
+        raise SystemExit(f"Sign in failed: {signed_in['error']}")
+    user_id = signed_in["user"].id
+
+    # Warm up the connection so the first path does not pay the TLS handshake
+    client.get_user_responses(user_id, use_cache=False)
+
+    results = [run_path(client, user_id, path, args.iterations, counter) for path in ("python", "rpc")]
+
+    print(f"{'path':<8} {'round trips':>12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for row in results:
+        print(f"{row['path']:<8} {row['round_trips']:>12.1f} {row['mean_ms']:>9.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
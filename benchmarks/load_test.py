@@ -0,0 +1,379 @@
+"""Concurrent-session load test that drives wellness_app.py through Streamlit's AppTest.
+
+Each simulated user answers the questionnaire, registers (or logs in), views the
+dashboard, edits an answer and saves it. The report covers p50/p95/p99 latency
+per page and per SupabaseClient method, reruns per second and peak RSS.
+
+Streamlit's runtime and widget registry are process-global, so AppTest runs
+can't share a process. --concurrency worker processes each drive one user at a
+time; with the in-memory backend each worker has its own database. Peak RSS is
+that of the largest worker.
+
+Usage:
+    python benchmarks/load_test.py --users 50 --concurrency 10 --latency-ms 40
+    python benchmarks/load_test.py --users 50 --save-baseline benchmarks/baselines/local.json
+    python benchmarks/load_test.py --users 50 --compare benchmarks/baselines/local.json
+
+By default the app runs against the in-memory backend (SUPABASE_BACKEND=memory);
+pass --backend supabase to hit the project configured in .env instead, which
+creates real users.
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "wellness_app.py")
+sys.path.insert(0, ROOT)
+
+CLIENT_METHODS = [
+    "register_user",
+    "register_user_with_responses",
+    "sign_in_user",
+    "refresh_session",
+    "sign_out",
+    "update_password",
+    "get_current_user",
+    "create_user_profile",
+    "save_responses",
+    "get_user_responses",
+    "update_responses",
+    "get_response_history_page",
+    "get_response_aggregates",
+]
+
+SEED_RESPONSES = {
+    "h1_sleep_7hrs": True,
+    "h2_fruit_veg_2servings": True,
+    "h3_moved_20mins": False,
+    "h4_low_energy_frequency": "Sometimes",
+    "w1_saved_money": True,
+    "w2_emergency_secure": False,
+    "w3_regretful_spending": False,
+    "p1_personal_time": True,
+    "p2_social_connection": True,
+    "p3_overwhelmed_frequency": "Rarely",
+    "f_focus_area": "Health",
+}
+
+
+class Recorder:
+    """Thread-safe latency samples keyed by (kind, name)"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.reruns = 0
+        self._lock = threading.Lock()
+
+    def drain(self):
+        """Samples, errors and reruns recorded so far, as picklable values; resets the recorder"""
+        with self._lock:
+            result = (dict(self.samples), dict(self.errors), self.reruns)
+            self.samples = defaultdict(list)
+            self.errors = defaultdict(int)
+            self.reruns = 0
+        return result
+
+    def merge(self, samples, errors, reruns):
+        with self._lock:
+            for key, values in samples.items():
+                self.samples[key].extend(values)
+            for key, count in errors.items():
+                self.errors[key] += count
+            self.reruns += reruns
+
+    def record(self, kind, name, seconds, ok=True):
+        with self._lock:
+            self.samples[(kind, name)].append(seconds * 1000)
+            if not ok:
+                self.errors[(kind, name)] += 1
+
+    def count_rerun(self):
+        with self._lock:
+            self.reruns += 1
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def instrument_client(recorder):
+    """Wrap SupabaseClient methods and the per-run client lease with timers"""
+    import supabase_client
+
+    for name in CLIENT_METHODS:
+        original = getattr(supabase_client.SupabaseClient, name, None)
+        if original is None:
+            continue
+
+        def make_wrapper(method_name, method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = method(*args, **kwargs)
+                ok = not (isinstance(result, dict) and result.get("success") is False)
+                recorder.record("method", method_name, time.perf_counter() - start, ok)
+                return result
+            return wrapper
+
+        setattr(supabase_client.SupabaseClient, name, make_wrapper(name, original))
+
+    # wellness_app leases a client once at the top of every script run
+    original_lease = supabase_client.get_session_client
+
+    def counting_lease():
+        recorder.count_rerun()
+        return original_lease()
+
+    supabase_client.get_session_client = counting_lease
+
+    # AppTest reports the same session id for every instance; key leases on the
+    # per-instance session state instead so each simulated user gets its own client
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    def loadtest_session_id():
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return "default"
+        # ctx.session_state is a fresh SafeSessionState wrapper on every run
+        return f"loadtest-{id(getattr(ctx.session_state, '_state', ctx.session_state))}"
+
+    supabase_client.current_session_id = loadtest_session_id
+
+
+def answer_all(at, flip=False):
+    for radio in at.radio:
+        if not radio.key:
+            continue
+        options = list(radio.options)
+        values = [True, False] if options == ["Yes", "No"] else options
+        radio.set_value(values[-1] if flip else values[0])
+
+
+def timed_run(recorder, at, action):
+    page = at.session_state.page if "page" in at.session_state else "questionnaire"
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    ok = not at.exception and not at.error
+    recorder.record("page", page, elapsed, ok)
+    recorder.record("action", action, elapsed, ok)
+    return at
+
+
+def click(at, label):
+    for button in at.button:
+        if button.label == label:
+            button.click()
+            return at
+    raise RuntimeError(f"Button {label!r} not found on page {at.session_state.page!r}")
+
+
+def simulate_user(recorder, index, login, password, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    email = f"loadtest-{index}-{uuid.uuid4().hex[:8]}@example.com"
+    phone = f"555-{200 + index % 700:03d}-{index % 10000:04d}"
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    timed_run(recorder, at, "open")
+    answer_all(at)
+    timed_run(recorder, at, "answer")
+    click(at, "Continue to Submit")
+    timed_run(recorder, at, "continue")
+
+    if login is not None:
+        at.radio[0].set_value("Returning User - Login")
+        timed_run(recorder, at, "switch_to_login")
+        at.text_input[0].input(login)
+        at.text_input[1].input(password)
+        click(at, "Log In")
+        timed_run(recorder, at, "login")
+    else:
+        at.text_input[0].input(email)
+        at.text_input[1].input(phone)
+        at.text_input[2].input(password)
+        click(at, "Submit Responses")
+        timed_run(recorder, at, "register")
+
+    timed_run(recorder, at, "dashboard")
+    click(at, "Update My Responses")
+    timed_run(recorder, at, "open_edit")
+    answer_all(at, flip=True)
+    timed_run(recorder, at, "edit_answer")
+    click(at, "Save Changes")
+    timed_run(recorder, at, "save")
+    timed_run(recorder, at, "dashboard_after_save")
+
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    if at.session_state.page != "dashboard":
+        raise RuntimeError(f"user {index} ended on {at.session_state.page!r}")
+
+
+def seed_login_user(index, password):
+    """Register an account for a login user before its run; with the memory backend it lives in this worker"""
+    from supabase_client import SupabaseClient
+
+    client = SupabaseClient()
+    email = f"seed-{index}-{uuid.uuid4().hex[:8]}@example.com"
+    phone = f"555-300-{index % 10000:04d}"
+    result = client.register_user(email, phone, password)
+    if not result["success"]:
+        raise RuntimeError(f"Could not seed user: {result['error']}")
+    client.create_user_profile(result["user"].id, phone, email)
+    client.save_responses(result["user"].id, SEED_RESPONSES)
+    client.sign_out()
+    return email
+
+
+_worker_recorder = None
+
+
+def init_worker(env):
+    """Set up one worker process: backend settings, then timers around the client"""
+    global _worker_recorder
+    os.environ.update(env)
+    _worker_recorder = Recorder()
+    instrument_client(_worker_recorder)
+
+
+def run_user(index, login, password, timeout):
+    """Simulate one user in this worker; returns its samples and the worker's peak RSS"""
+    email = seed_login_user(index, password) if login else None
+    _worker_recorder.drain()
+    error = None
+    try:
+        simulate_user(_worker_recorder, index, email, password, timeout)
+    except Exception as e:
+        error = str(e)
+    # ru_maxrss is reported in kilobytes on Linux
+    return _worker_recorder.drain(), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, error
+
+
+def summarize(recorder, wall_seconds, users, failures, peak_rss_mb):
+    report = {"users": users, "failures": failures, "wall_seconds": round(wall_seconds, 3)}
+    for kind in ("page", "method", "action"):
+        section = {}
+        for (sample_kind, name), samples in sorted(recorder.samples.items()):
+            if sample_kind != kind:
+                continue
+            section[name] = {
+                "count": len(samples),
+                "errors": recorder.errors[(kind, name)],
+                "mean_ms": round(statistics.mean(samples), 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+            }
+        report[kind] = section
+    report["reruns"] = recorder.reruns
+    report["reruns_per_second"] = round(recorder.reruns / wall_seconds, 2) if wall_seconds else 0.0
+    report["peak_rss_mb"] = round(peak_rss_mb, 1)
+    return report
+
+
+def print_report(report):
+    print(f"users={report['users']} failures={report['failures']} wall={report['wall_seconds']}s "
+          f"reruns/s={report['reruns_per_second']} peak_rss={report['peak_rss_mb']}MB")
+    for kind in ("page", "method"):
+        print(f"\n{kind:<30} {'count':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, row in report[kind].items():
+            print(f"{name:<30} {row['count']:>6} {row['errors']:>4} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+
+
+def compare(report, baseline, tolerance):
+    """Return regressions where p95 grew by more than the tolerance"""
+    regressions = []
+    for kind in ("page", "method"):
+        for name, row in baseline.get(kind, {}).items():
+            current = report[kind].get(name)
+            if current is None:
+                continue
+            limit = row["p95_ms"] * (1 + tolerance)
+            if current["p95_ms"] > limit and current["p95_ms"] - row["p95_ms"] > 1.0:
+                regressions.append(f"{kind} {name}: p95 {current['p95_ms']:.1f}ms > baseline {row['p95_ms']:.1f}ms")
+    if report["reruns_per_second"] < baseline.get("reruns_per_second", 0) * (1 - tolerance):
+        regressions.append(f"reruns/s {report['reruns_per_second']} < baseline {baseline['reruns_per_second']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test wellness_app.py with concurrent AppTest sessions")
+    parser.add_argument("--users", type=int, default=20, help="simulated users in total")
+    parser.add_argument("--concurrency", type=int, default=10, help="users running at the same time, one worker process each")
+    parser.add_argument("--login-ratio", type=float, default=0.5, help="share of users that log in instead of registering")
+    parser.add_argument("--backend", choices=["memory", "supabase"], default="memory")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="injected latency for the memory backend")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="AppTest timeout per script run")
+    parser.add_argument("--json", help="write the full report to this file")
+    parser.add_argument("--save-baseline", help="write the report as a baseline")
+    parser.add_argument("--compare", help="fail if p95 latencies regress against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    env = {}
+    if args.backend == "memory":
+        env = {"SUPABASE_BACKEND": "memory", "SUPABASE_FAKE_LATENCY_MS": str(args.latency_ms),
+               "SUPABASE_FAKE_JITTER_MS": str(args.jitter_ms)}
+
+    password = "loadtest-password"
+    logins = int(args.users * args.login_ratio)
+    recorder = Recorder()
+    failures = 0
+    peak_rss = 0.0
+    # AppTest makes the app script the worker's __main__, so send tasks by this module's import name
+    import load_test as worker
+    # spawn, so every worker starts with a Streamlit runtime of its own
+    with ProcessPoolExecutor(max_workers=args.concurrency, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=worker.init_worker, initargs=(env,)) as pool:
+        # Start the workers before the clock: importing Streamlit is not part of the load
+        list(pool.map(time.sleep, [0.1] * args.concurrency))
+        start = time.perf_counter()
+        futures = [pool.submit(worker.run_user, i, i < logins, password, args.timeout) for i in range(args.users)]
+        for future in futures:
+            samples, rss, error = future.result()
+            recorder.merge(*samples)
+            peak_rss = max(peak_rss, rss)
+            if error:
+                failures += 1
+                print(f"user failed: {error}", file=sys.stderr)
+        wall = time.perf_counter() - start
+
+    report = summarize(recorder, wall, args.users, failures, peak_rss)
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("json", "save_baseline", "compare")}
+    print_report(report)
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0, keep_stale: bool = False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Keep expired entries (until LRU eviction) so get_stale can fall back to them
+        self.keep_stale = keep_stale
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> version of its last write or invalidation; keys not listed are at _floor
+        self._versions: Dict[Hashable, int] = {}
+        self._clock = 0
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh cached value, or default on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None and not self.keep_stale:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, key: Hashable, default: Any = None, max_stale: float = float("inf")) -> Any:
+        """Return a cached value even if expired, as long as it expired less than max_stale seconds ago"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > max_stale:
+                return default
+            return entry[0]
+
+    def _bump(self, key: Hashable) -> None:
+        """Give key a new version (lock held)"""
+        self._clock += 1
+        self._versions[key] = self._clock
+        if len(self._versions) > 2 * self.max_entries:
+            # Forgetting versions moves every key forward, so pending fills are skipped rather than let through
+            self._versions.clear()
+            self._floor = self._clock
+
+    def version(self, key: Hashable) -> int:
+        """Version of a key; pass it to set(if_version=) when filling from a read started now"""
+        with self._lock:
+            return self._versions.get(key, self._floor)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, if_version: Optional[int] = None) -> None:
+        """Store a value, evicting the least recently used entries when full.
+
+        A fill (if_version given) is skipped when the key was written or
+        invalidated since that version was read, so a slow read can't
+        overwrite newer data.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if if_version is None:
+                self._bump(key)
+            elif self._versions.get(key, self._floor) != if_version:
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def replace(self, key: Hashable, value: Any) -> None:
+        """Swap the value of an existing entry without extending its expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (value, entry[1])
+                self._bump(key)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._bump(key)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._clock += 1
+            self._floor = self._clock
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
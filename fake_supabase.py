@@ -0,0 +1,601 @@
+import asyncio
+import base64
+import copy
+import instrumentation
+import json
+import operator
+import os
+import random
+import resilience
+import secrets
+import threading
+import time
+import uuid
+from aggregates import TOTAL_KEY, answer_text
+from collections import Counter
+from datetime import datetime, timezone
+from postgrest.exceptions import APIError
+from questions import QUESTION_KEYS
+from supabase_auth.errors import AuthApiError, AuthSessionMissingError
+from supabase_auth.types import AuthResponse, Session, User, UserResponse
+from typing import Any, Callable, Dict, List, Optional
+
+# In-memory stand-in for the parts of Supabase that SupabaseClient uses, so the
+# app, benchmarks and load tests can run without a live project. Enable it with
+# SUPABASE_BACKEND=memory; SUPABASE_FAKE_LATENCY_MS / SUPABASE_FAKE_JITTER_MS
+# inject a per-request delay to mimic the network, and SUPABASE_FAKE_ERROR_RATE
+# makes that fraction of requests fail with a connection error.
+
+ACCESS_TOKEN_TTL = 3600
+
+# Unique indexes besides the primary key (migration 0007)
+UNIQUE_COLUMNS = {
+    "responses": ("user_id",),
+    "response_history": ("submission_id",),
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+_OPERATORS = {"eq": operator.eq, "neq": operator.ne, "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+def _split_filters(text: str) -> List[str]:
+    """Split a PostgREST logic filter on top-level commas, leaving and(...) groups and quoted values intact"""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _parse_filter(text: str) -> Callable[[Dict[str, Any]], bool]:
+    """Turn "column.op.value", "and(...)" or "or(...)" into a row predicate"""
+    for group, combine in (("and(", all), ("or(", any)):
+        if text.startswith(group) and text.endswith(")"):
+            predicates = [_parse_filter(part) for part in _split_filters(text[len(group):-1])]
+            return lambda row: combine(p(row) for p in predicates)
+    column, op, value = text.split(".", 2)
+    value = value.strip('"')
+
+    def predicate(row: Dict[str, Any]) -> bool:
+        current = row.get(column)
+        if current is None:
+            return False
+        if isinstance(current, bool):
+            return _OPERATORS[op](current, value == "true")
+        if isinstance(current, (int, float)):
+            return _OPERATORS[op](current, type(current)(value))
+        return _OPERATORS[op](str(current), value)
+    return predicate
+
+
+def _b64(data: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+def _make_access_token(user_id: str, email: str, expires_at: int) -> str:
+    """Unsigned JWT with the claims Supabase Auth puts in real access tokens"""
+    claims = {"sub": user_id, "email": email, "exp": expires_at, "role": "authenticated", "jti": secrets.token_hex(8)}
+    return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(claims)}.fake"
+
+
+class FakeResponse:
+    """Mimics postgrest's APIResponse"""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeDatabase:
+    """Process-wide tables, auth users and request counters shared by every fake client"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.lock = threading.RLock()
+        self.tables: Dict[str, List[Dict[str, Any]]] = {
+            "user_profiles": [],
+            "responses": [],
+            "response_history": [],
+            "response_daily_rollups": [],
+            "response_daily_scores": [],
+        }
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.access_tokens: Dict[str, str] = {}
+        self.refresh_tokens: Dict[str, str] = {}
+        self.rpcs: Dict[str, Callable[["FakeDatabase", Dict[str, Any]], List[Dict[str, Any]]]] = {
+            "update_responses_with_history": _rpc_update_responses_with_history,
+            "apply_response_updates": _rpc_apply_response_updates,
+            "get_response_aggregates": _rpc_get_response_aggregates,
+            "refresh_response_aggregates": _rpc_refresh_response_aggregates,
+            "fold_response_aggregates": _rpc_fold_response_aggregates,
+        }
+        self.requests: Counter = Counter()
+        self._next_id = 1
+
+    def configure(self, latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None,
+                  error_rate: Optional[float] = None) -> None:
+        """Change the injected latency and failure rate at runtime"""
+        if latency_ms is not None:
+            self.latency_ms = latency_ms
+        if jitter_ms is not None:
+            self.jitter_ms = jitter_ms
+        if error_rate is not None:
+            self.error_rate = error_rate
+
+    def reset(self) -> None:
+        """Drop all rows, users and counters"""
+        with self.lock:
+            for rows in self.tables.values():
+                rows.clear()
+            self.users.clear()
+            self.access_tokens.clear()
+            self.refresh_tokens.clear()
+            self.requests.clear()
+            self._next_id = 1
+
+    def delay(self) -> float:
+        """Seconds of simulated network latency for one request"""
+        if not self.latency_ms and not self.jitter_ms:
+            return 0.0
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def wait(self) -> None:
+        """Simulate one round trip: sleep the injected latency, cut short by the caller's deadline"""
+        delay = self.delay()
+        left = resilience.remaining()
+        if left is not None and delay > left:
+            time.sleep(max(left, 0.0))
+            raise resilience.DeadlineExceeded("Simulated request timed out")
+        time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            raise ConnectionError("Simulated connection failure")
+
+    def count(self, endpoint: str) -> None:
+        with self.lock:
+            self.requests[endpoint] += 1
+        instrumentation.count_round_trip("auth" if endpoint.startswith("auth:") else "rest")
+
+    def next_id(self) -> int:
+        with self.lock:
+            value = self._next_id
+            self._next_id += 1
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests served per endpoint"""
+        with self.lock:
+            return {"requests": sum(self.requests.values()), "by_endpoint": dict(self.requests)}
+
+    # Auth
+
+    def user_model(self, record: Dict[str, Any]) -> User:
+        return User(
+            id=record["id"],
+            app_metadata={"provider": "email"},
+            user_metadata=record["user_metadata"],
+            aud="authenticated",
+            email=record["email"],
+            role="authenticated",
+            created_at=record["created_at"],
+        )
+
+    def issue_session(self, record: Dict[str, Any]) -> Session:
+        expires_at = int(time.time()) + ACCESS_TOKEN_TTL
+        access_token = _make_access_token(record["id"], record["email"], expires_at)
+        refresh_token = secrets.token_urlsafe(16)
+        with self.lock:
+            self.access_tokens[access_token] = record["email"]
+            self.refresh_tokens[refresh_token] = record["email"]
+        return Session(
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_in=ACCESS_TOKEN_TTL,
+            expires_at=expires_at,
+            token_type="bearer",
+            user=self.user_model(record),
+        )
+
+
+def _rpc_update_responses_with_history(db: FakeDatabase, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Python mirror of update_responses_with_history (migrations 0001 and 0007)"""
+    updates = {k: v for k, v in params["p_responses"].items() if k not in ("id", "user_id")}
+    submission_id = params.get("p_submission_id")
+    with db.lock:
+        current = next((row for row in db.tables["responses"] if row["user_id"] == params["p_user_id"]), None)
+        if current is None:
+            return []
+        if submission_id is not None and any(row.get("submission_id") == submission_id for row in db.tables["response_history"]):
+            return [copy.deepcopy(current)]
+        snapshot = {k: v for k, v in current.items() if k not in ("id", "created_at", "updated_at")}
+        db.tables["response_history"].append({
+            **snapshot,
+            "id": db.next_id(),
+            "response_id": current["id"],
+            "valid_to": _now(),
+            "is_current": False,
+            "submission_id": submission_id,
+        })
+        current.update(updates)
+        current["updated_at"] = _now()
+        return [copy.deepcopy(current)]
+
+
+def _rpc_apply_response_updates(db: FakeDatabase, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Python mirror of apply_response_updates (migrations 0006 and 0007)"""
+    rows = []
+    for item in params["p_updates"]:
+        rows.extend(_rpc_update_responses_with_history(db, {
+            "p_user_id": item["user_id"], "p_responses": item["responses"], "p_submission_id": item.get("submission_id"),
+        }))
+    return rows
+
+
+def _rpc_get_response_aggregates(db: FakeDatabase, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Python mirror of get_response_aggregates (migrations/0004_response_aggregates.sql)
+
+    Counts are computed from responses on each call instead of being kept up to
+    date by a trigger; the result is the same.
+    """
+    with db.lock:
+        rows = list(db.tables["responses"])
+    counts: Counter = Counter()
+    for row in rows:
+        for key in QUESTION_KEYS:
+            if row.get(key) is not None:
+                counts[(key, answer_text(row[key]))] += 1
+    aggregates = [{"question_key": key, "answer": answer, "responses": n} for (key, answer), n in counts.items()]
+    aggregates.append({"question_key": TOTAL_KEY, "answer": "all", "responses": len(rows)})
+    return aggregates
+
+
+def _rpc_refresh_response_aggregates(db: FakeDatabase, params: Dict[str, Any]) -> int:
+    with db.lock:
+        return len(db.tables["responses"])
+
+
+def _rpc_fold_response_aggregates(db: FakeDatabase, params: Dict[str, Any]) -> int:
+    # Counts are computed on read, so there is never anything pending
+    return 0
+
+
+class FakeQuery:
+    """Chainable table query supporting the PostgREST builder calls SupabaseClient makes"""
+
+    def __init__(self, db: FakeDatabase, table: str):
+        if table not in db.tables:
+            raise APIError({"message": f'relation "public.{table}" does not exist', "code": "42P01"})
+        self.db = db
+        self.table = table
+        self.operation = "select"
+        self.columns: Optional[List[str]] = None
+        self.payload: Any = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.ordering: List[tuple] = []
+        self.row_limit: Optional[int] = None
+
+    def select(self, *columns: str, count: Optional[str] = None) -> "FakeQuery":
+        joined = ",".join(columns) if columns else "*"
+        self.columns = None if joined.strip() == "*" else [c.strip() for c in joined.split(",") if c.strip()]
+        return self
+
+    def insert(self, data: Any) -> "FakeQuery":
+        self.operation = "insert"
+        self.payload = data
+        return self
+
+    def upsert(self, data: Any, on_conflict: str = "", ignore_duplicates: bool = False) -> "FakeQuery":
+        self.operation = "upsert"
+        self.payload = data
+        self.ignore_duplicates = ignore_duplicates
+        self.conflict_columns = [c.strip() for c in on_conflict.split(",") if c.strip()] or ["id"]
+        return self
+
+    def update(self, data: Dict[str, Any]) -> "FakeQuery":
+        self.operation = "update"
+        self.payload = data
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def neq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: str(row.get(column)) != str(value))
+        return self
+
+    def in_(self, column: str, values: List[Any]) -> "FakeQuery":
+        wanted = {str(v) for v in values}
+        self.filters.append(lambda row: str(row.get(column)) in wanted)
+        return self
+
+    def gt(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(_parse_filter(f"{column}.gt.{value}"))
+        return self
+
+    def gte(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(_parse_filter(f"{column}.gte.{value}"))
+        return self
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(_parse_filter(f"{column}.lt.{value}"))
+        return self
+
+    def or_(self, filters: str, reference_table: Optional[str] = None) -> "FakeQuery":
+        self.filters.append(_parse_filter(f"or({filters})"))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, size: int) -> "FakeQuery":
+        self.row_limit = size
+        return self
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if self.columns is None:
+            return copy.deepcopy(row)
+        return {c: copy.deepcopy(row.get(c)) for c in self.columns}
+
+    def _stamp(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = {k: (_now() if v == "NOW()" else v) for k, v in row.items()}
+        row.setdefault("id", self.db.next_id() if self.table != "user_profiles" else str(uuid.uuid4()))
+        row.setdefault("created_at", _now())
+        return row
+
+    def _run(self) -> FakeResponse:
+        self.db.count(f"{self.operation}:{self.table}")
+        with self.db.lock:
+            rows = self.db.tables[self.table]
+            if self.operation == "insert":
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = [self._stamp(dict(item)) for item in payload]
+                for column in ("id",) + UNIQUE_COLUMNS.get(self.table, ()):
+                    existing = {row.get(column) for row in rows if row.get(column) is not None}
+                    values = [row.get(column) for row in inserted if row.get(column) is not None]
+                    if len(set(values)) < len(values) or existing.intersection(values):
+                        raise APIError({"message": f'duplicate key value violates unique constraint "{self.table}_{column}_key"', "code": "23505"})
+                rows.extend(inserted)
+                return FakeResponse([copy.deepcopy(row) for row in inserted])
+
+            if self.operation == "upsert":
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                index = {tuple(str(row.get(c)) for c in self.conflict_columns): row for row in rows}
+                written = []
+                for item in payload:
+                    existing = index.get(tuple(str(item.get(c)) for c in self.conflict_columns))
+                    if existing is not None:
+                        if self.ignore_duplicates:
+                            continue
+                        existing.update(item)
+                        written.append(existing)
+                    else:
+                        row = self._stamp(dict(item))
+                        rows.append(row)
+                        index[tuple(str(row.get(c)) for c in self.conflict_columns)] = row
+                        written.append(row)
+                return FakeResponse([copy.deepcopy(row) for row in written])
+
+            matched = [row for row in rows if all(f(row) for f in self.filters)]
+            if self.operation == "update":
+                for row in matched:
+                    row.update(self.payload)
+                    row["updated_at"] = _now()
+                return FakeResponse([copy.deepcopy(row) for row in matched])
+
+            for column, desc in reversed(self.ordering):
+                matched.sort(key=lambda row: (row.get(column) is None, row.get(column) if row.get(column) is not None else 0), reverse=desc)
+            if self.row_limit is not None:
+                matched = matched[:self.row_limit]
+            return FakeResponse([self._project(row) for row in matched], count=len(matched))
+
+    def execute(self) -> FakeResponse:
+        self.db.wait()
+        return self._run()
+
+
+class FakeRPC:
+    def __init__(self, db: FakeDatabase, name: str, params: Dict[str, Any]):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def _run(self) -> FakeResponse:
+        self.db.count(f"rpc:{self.name}")
+        function = self.db.rpcs.get(self.name)
+        if function is None:
+            raise APIError({"message": f"Could not find the function public.{self.name}", "code": "PGRST202"})
+        return FakeResponse(function(self.db, self.params))
+
+    def execute(self) -> FakeResponse:
+        self.db.wait()
+        return self._run()
+
+
+class FakeAuth:
+    """Per-client auth state backed by the shared user table"""
+
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self._in_memory_session: Optional[Session] = None
+
+    def _sign_up(self, credentials: Dict[str, Any]) -> AuthResponse:
+        self.db.count("auth:signup")
+        email = credentials["email"].lower()
+        with self.db.lock:
+            if email in self.db.users:
+                raise AuthApiError("User already registered", 422, "user_already_exists")
+            record = {
+                "id": str(uuid.uuid4()),
+                "email": email,
+                "password": credentials["password"],
+                "user_metadata": credentials.get("options", {}).get("data", {}),
+                "created_at": _now(),
+            }
+            self.db.users[email] = record
+        self._in_memory_session = self.db.issue_session(record)
+        return AuthResponse(user=self._in_memory_session.user, session=self._in_memory_session)
+
+    def _sign_in_with_password(self, credentials: Dict[str, Any]) -> AuthResponse:
+        self.db.count("auth:token")
+        record = self.db.users.get(credentials["email"].lower())
+        if record is None or record["password"] != credentials["password"]:
+            raise AuthApiError("Invalid login credentials", 400, "invalid_credentials")
+        self._in_memory_session = self.db.issue_session(record)
+        return AuthResponse(user=self._in_memory_session.user, session=self._in_memory_session)
+
+    def _refresh_session(self, refresh_token: Optional[str] = None) -> AuthResponse:
+        self.db.count("auth:refresh")
+        refresh_token = refresh_token or (self._in_memory_session.refresh_token if self._in_memory_session else None)
+        with self.db.lock:
+            email = self.db.refresh_tokens.pop(refresh_token, None) if refresh_token else None
+        if email is None:
+            raise AuthApiError("Invalid Refresh Token", 400, "refresh_token_not_found")
+        self._in_memory_session = self.db.issue_session(self.db.users[email])
+        return AuthResponse(user=self._in_memory_session.user, session=self._in_memory_session)
+
+    def _get_user(self, jwt: Optional[str] = None) -> Optional[UserResponse]:
+        self.db.count("auth:user")
+        token = jwt or (self._in_memory_session.access_token if self._in_memory_session else None)
+        if token is None:
+            return None
+        email = self.db.access_tokens.get(token)
+        if email is None:
+            raise AuthApiError("invalid JWT", 401, "bad_jwt")
+        return UserResponse(user=self.db.user_model(self.db.users[email]))
+
+    def _update_user(self, attributes: Dict[str, Any]) -> UserResponse:
+        self.db.count("auth:update_user")
+        if self._in_memory_session is None:
+            raise AuthSessionMissingError()
+        with self.db.lock:
+            record = self.db.users[self._in_memory_session.user.email]
+            if "current_password" in attributes and attributes["current_password"] != record["password"]:
+                raise AuthApiError("Current password is incorrect", 400, "current_password_mismatch")
+            if "password" in attributes:
+                record["password"] = attributes["password"]
+            if "data" in attributes:
+                record["user_metadata"].update(attributes["data"])
+        return UserResponse(user=self.db.user_model(record))
+
+    def _sign_out(self, options: Optional[Dict[str, Any]] = None) -> None:
+        self.db.count("auth:logout")
+        if self._in_memory_session is not None:
+            with self.db.lock:
+                self.db.access_tokens.pop(self._in_memory_session.access_token, None)
+                self.db.refresh_tokens.pop(self._in_memory_session.refresh_token, None)
+        self._in_memory_session = None
+
+    def sign_up(self, credentials: Dict[str, Any]) -> AuthResponse:
+        self.db.wait()
+        return self._sign_up(credentials)
+
+    def sign_in_with_password(self, credentials: Dict[str, Any]) -> AuthResponse:
+        self.db.wait()
+        return self._sign_in_with_password(credentials)
+
+    def refresh_session(self, refresh_token: Optional[str] = None) -> AuthResponse:
+        self.db.wait()
+        return self._refresh_session(refresh_token)
+
+    def get_user(self, jwt: Optional[str] = None) -> Optional[UserResponse]:
+        self.db.wait()
+        return self._get_user(jwt)
+
+    def update_user(self, attributes: Dict[str, Any], options: Optional[Dict[str, Any]] = None) -> UserResponse:
+        self.db.wait()
+        return self._update_user(attributes)
+
+    def sign_out(self, options: Optional[Dict[str, Any]] = None) -> None:
+        self.db.wait()
+        self._sign_out(options)
+
+    def get_session(self) -> Optional[Session]:
+        return self._in_memory_session
+
+    def _save_session(self, session: Session) -> None:
+        self._in_memory_session = session
+
+    def _remove_session(self) -> None:
+        self._in_memory_session = None
+
+    def _notify_all_subscribers(self, event: str, session: Optional[Session]) -> None:
+        pass
+
+
+class FakeClient:
+    """Drop-in for supabase.Client backed by a FakeDatabase"""
+
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self.auth = FakeAuth(db)
+
+    def table(self, table_name: str) -> FakeQuery:
+        return FakeQuery(self.db, table_name)
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None) -> FakeRPC:
+        return FakeRPC(self.db, fn, params or {})
+
+
+class AsyncFakeQuery(FakeQuery):
+    async def execute(self) -> FakeResponse:
+        await asyncio.sleep(self.db.delay())
+        return self._run()
+
+
+class AsyncFakeAuth(FakeAuth):
+    async def sign_up(self, credentials: Dict[str, Any]) -> AuthResponse:
+        await asyncio.sleep(self.db.delay())
+        return self._sign_up(credentials)
+
+    async def sign_in_with_password(self, credentials: Dict[str, Any]) -> AuthResponse:
+        await asyncio.sleep(self.db.delay())
+        return self._sign_in_with_password(credentials)
+
+
+class AsyncFakeClient:
+    """Drop-in for supabase.AsyncClient backed by a FakeDatabase"""
+
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self.auth = AsyncFakeAuth(db)
+
+    def table(self, table_name: str) -> AsyncFakeQuery:
+        return AsyncFakeQuery(self.db, table_name)
+
+
+def create_client(url: Optional[str] = None, key: Optional[str] = None, options: Any = None) -> FakeClient:
+    """Same signature as supabase.create_client; url, key and options are ignored"""
+    return FakeClient(database)
+
+
+async def acreate_client(url: Optional[str] = None, key: Optional[str] = None, options: Any = None) -> AsyncFakeClient:
+    """Same signature as supabase.acreate_client; url, key and options are ignored"""
+    return AsyncFakeClient(database)
+
+
+def is_enabled() -> bool:
+    """Whether SUPABASE_BACKEND selects the in-memory backend"""
+    return os.getenv("SUPABASE_BACKEND", "supabase").lower() == "memory"
+
+
+# Global instance
+database = FakeDatabase(
+    latency_ms=float(os.getenv("SUPABASE_FAKE_LATENCY_MS", "0")),
+    jitter_ms=float(os.getenv("SUPABASE_FAKE_JITTER_MS", "0")),
+    error_rate=float(os.getenv("SUPABASE_FAKE_ERROR_RATE", "0")),
+)
@@ -0,0 +1,127 @@
+import os
+import resilience
+import threading
+from cache import TTLCache
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from questions import QUESTIONS, SECTIONS
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Rows fetched per response_history request
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "500"))
+
+# (valid_to, id) of the last history row consumed
+Cursor = Tuple[str, Any]
+
+
+def keyset_filter(cursor: Cursor) -> str:
+    """PostgREST or= filter selecting the rows ordered after cursor by (valid_to, id)"""
+    valid_to, row_id = cursor
+    return f'valid_to.gt."{valid_to}",and(valid_to.eq."{valid_to}",id.gt.{row_id})'
+
+
+def _month(timestamp: Optional[str]) -> str:
+    return (timestamp or "")[:7] or "unknown"
+
+
+def _tally(month_totals: Dict[str, List[int]], row: Dict[str, Any]) -> None:
+    """Add one response version's favourable and scored answer counts to a month, per section"""
+    for section in SECTIONS:
+        scored = [q for q in section.questions if q.favourable and row.get(q.key) is not None]
+        if scored:
+            totals = month_totals.setdefault(section.title, [0, 0])
+            totals[0] += sum(row[q.key] in q.favourable for q in scored)
+            totals[1] += len(scored)
+
+
+def _count_changes(changes: Counter, previous: Optional[Dict[str, Any]], row: Dict[str, Any]) -> None:
+    if previous is not None:
+        for question in QUESTIONS:
+            if row.get(question.key) != previous.get(question.key):
+                changes[question.key] += 1
+
+
+class TrendAccumulator:
+    """Running trend totals over a user's response versions, extended one page at a time"""
+
+    def __init__(self):
+        self.cursor: Optional[Cursor] = None
+        self.versions = 0
+        self.first_seen: Optional[str] = None
+        # month -> section title -> [favourable, scored]
+        self.months: "OrderedDict[str, Dict[str, List[int]]]" = OrderedDict()
+        self.changes: Counter = Counter()
+        self.previous: Optional[Dict[str, Any]] = None
+        self.stale = True
+        self.lock = threading.Lock()
+
+    def add(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Fold history rows, already ordered by (valid_to, id), into the totals"""
+        for row in rows:
+            _tally(self.months.setdefault(_month(row.get("valid_to")), {}), row)
+            _count_changes(self.changes, self.previous, row)
+            self.previous = row
+            self.cursor = (row["valid_to"], row["id"])
+            self.versions += 1
+            if self.first_seen is None:
+                self.first_seen = row.get("valid_to")
+
+    def summary(self, current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Monthly favourable-answer share per section plus per-question change counts, including the current row"""
+        months = OrderedDict((month, {title: list(t) for title, t in totals.items()}) for month, totals in self.months.items())
+        changes = Counter(self.changes)
+        if current:
+            _tally(months.setdefault(datetime.now(timezone.utc).strftime("%Y-%m"), {}), current)
+            _count_changes(changes, self.previous, current)
+
+        titles = [section.title for section in SECTIONS if any(q.favourable for q in section.questions)]
+        return {
+            "versions": self.versions + (1 if current else 0),
+            "since": self.first_seen,
+            "months": list(months),
+            "sections": {
+                title: [
+                    round(100 * months[m][title][0] / months[m][title][1]) if title in months[m] else None
+                    for m in months
+                ]
+                for title in titles
+            },
+            "changes": dict(changes),
+        }
+
+
+# Per-user trend totals; a hit only has to fetch history rows written since its cursor
+trend_cache = TTLCache(
+    max_entries=int(os.getenv("TREND_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("TREND_CACHE_TTL", "3600")),
+)
+_cache_lock = threading.Lock()
+
+
+def mark_stale(user_id: str) -> None:
+    """Record that user_id has new history rows to fetch on the next trends load"""
+    accumulator = trend_cache.get(user_id)
+    if accumulator is not None:
+        accumulator.stale = True
+
+
+def load_trends(client, user_id: str, current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Bring the cached trend totals for user_id up to date and summarize them"""
+    with _cache_lock:
+        accumulator = trend_cache.get(user_id)
+        if accumulator is None:
+            accumulator = TrendAccumulator()
+            trend_cache.set(user_id, accumulator)
+
+    with accumulator.lock:
+        if accumulator.stale:
+            for page in client.iter_response_history(user_id, after=accumulator.cursor):
+                if not page["success"]:
+                    if accumulator.versions:
+                        # History is unreachable; the totals gathered so far are still worth showing
+                        resilience.note_stale()
+                        return {"success": True, "data": accumulator.summary(current), "stale": True}
+                    return {"success": False, "error": page["error"]}
+                accumulator.add(page["data"])
+            accumulator.stale = False
+        return {"success": True, "data": accumulator.summary(current)}
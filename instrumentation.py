@@ -0,0 +1,280 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., sum, count]
+        self.values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def summary(self) -> Dict[Labels, Dict[str, float]]:
+        """Count, mean and bucket-estimated p50/p95/p99 per label set"""
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self.values.items()}
+        result = {}
+        for labels, series in snapshot.items():
+            count = series[-1]
+            result[labels] = {
+                "count": count,
+                "mean": series[-2] / count if count else 0.0,
+                "p50": self._quantile(series, 0.50),
+                "p95": self._quantile(series, 0.95),
+                "p99": self._quantile(series, 0.99),
+            }
+        return result
+
+    def _quantile(self, series: List[float], q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        target = q * series[-1]
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series[:-2]):
+            seen += count
+            if seen >= target and count:
+                return bound
+        return 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]:g}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics with Prometheus text exposition"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+        self.gauges: Dict[str, Tuple[str, str, Callable[[], Dict[str, float]]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def gauge(self, name: str, help_text: str, label: str, collect: Callable[[], Dict[str, float]]) -> None:
+        """Register a gauge family whose values are read at scrape time, one series per label value"""
+        with self._lock:
+            self.gauges[name] = (help_text, label, collect)
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self.metrics.values())
+            gauges = list(self.gauges.items())
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, (help_text, label, collect) in gauges:
+            try:
+                values = collect()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(((label, key),))} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+registry = MetricsRegistry()
+
+client_call_seconds = registry.histogram(
+    "wellness_supabase_call_seconds", "Latency of SupabaseClient methods")
+client_calls_total = registry.counter(
+    "wellness_supabase_calls_total", "SupabaseClient method calls")
+client_errors_total = registry.counter(
+    "wellness_supabase_errors_total", "SupabaseClient calls that failed or returned success=False")
+page_render_seconds = registry.histogram(
+    "wellness_page_render_seconds", "Time spent in each render_* page function")
+rerun_seconds = registry.histogram(
+    "wellness_rerun_seconds", "Wall-clock time of one Streamlit script run")
+rerun_round_trips = registry.histogram(
+    "wellness_rerun_round_trips", "Network round trips made during one Streamlit script run", ROUND_TRIP_BUCKETS)
+round_trips_total = registry.counter(
+    "wellness_round_trips_total", "Network round trips to Supabase")
+
+_rerun = threading.local()
+
+
+def count_round_trip(endpoint: str = "http") -> None:
+    """Record one network request against the current script run"""
+    round_trips_total.inc(endpoint=endpoint)
+    if getattr(_rerun, "active", False):
+        _rerun.round_trips += 1
+
+
+def httpx_request_hook(request) -> None:
+    """httpx event hook counting every outgoing request"""
+    count_round_trip(request.url.path.split("/")[1] if request.url.path.count("/") > 1 else "http")
+
+
+async def async_httpx_request_hook(request) -> None:
+    httpx_request_hook(request)
+
+
+def add_round_trips(count: int) -> None:
+    """Charge requests made on another thread (the registration event loop) to the current script run"""
+    if getattr(_rerun, "active", False):
+        _rerun.round_trips += count
+
+
+def begin_rerun() -> None:
+    _rerun.active = True
+    _rerun.round_trips = 0
+    _rerun.start = time.perf_counter()
+
+
+def end_rerun() -> int:
+    """Close the current script run's measurement and return its round trips"""
+    if not getattr(_rerun, "active", False):
+        return 0
+    _rerun.active = False
+    rerun_seconds.observe(time.perf_counter() - _rerun.start)
+    rerun_round_trips.observe(_rerun.round_trips)
+    return _rerun.round_trips
+
+
+def instrumented(table: str) -> Callable:
+    """Record latency, calls and errors of a SupabaseClient method"""
+    def decorator(method: Callable) -> Callable:
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = method(*args, **kwargs)
+                failed = isinstance(result, dict) and result.get("success") is False
+                return result
+            finally:
+                client_call_seconds.observe(time.perf_counter() - start, method=name, table=table)
+                client_calls_total.inc(method=name, table=table)
+                if failed:
+                    client_errors_total.inc(method=name, table=table)
+        return wrapper
+    return decorator
+
+
+def timed_page(page: str) -> Callable:
+    """Record how long a render_* page function takes, including st.rerun() exits"""
+    def decorator(render: Callable) -> Callable:
+        @functools.wraps(render)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return render(*args, **kwargs)
+            finally:
+                page_render_seconds.observe(time.perf_counter() - start, page=page)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on METRICS_HOST:METRICS_PORT from a daemon thread, once per process"""
+    global _server
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0") or 0)
+    # The endpoint has no authentication, so it listens on loopback unless told otherwise
+    host = host if host is not None else os.getenv("METRICS_HOST", "127.0.0.1")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
@@ -1,6 +1,269 @@
-def main():
-    print("Hello from streamline!")
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from aggregates import answer_text
+from history import keyset_filter
+from questions import HISTORY_COLUMNS, QUESTION_KEYS, QUESTIONS, YES_NO, validate_answers
+from scoring import DIMENSIONS, score_rows
+
+# Batch jobs for analysts and nightly cron. They read across all users, so they
+# authenticate with the service role key, never the anon key the app uses.
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
+
+EXPORT_COLUMNS = {
+    "responses": ",".join(("id", "user_id") + QUESTION_KEYS),
+    "response_history": ",".join(("id", "user_id", "response_id", "valid_to", "is_current") + QUESTION_KEYS),
+}
+
+
+def create_service_client():
+    """Supabase client authenticated with the service role key"""
+    import fake_supabase
+
+    if fake_supabase.is_enabled():
+        return fake_supabase.create_client()
+
+    from supabase import create_client
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set for batch jobs")
+    return create_client(url, key)
+
+
+def stream_by_id(client, table: str, columns: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Yield a table's rows in pages ordered by id, each page starting after the last id seen"""
+    last_id = None
+    while True:
+        query = client.table(table).select(columns)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(batch_size).execute().data
+        if page:
+            yield page
+        if len(page) < batch_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def stream_history(client, since: Optional[str], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Yield response_history pages ordered by (valid_to, id), optionally from a day onwards"""
+    cursor = None
+    while True:
+        query = client.table("response_history").select(HISTORY_COLUMNS)
+        if since:
+            query = query.gte("valid_to", since)
+        if cursor is not None:
+            query = query.or_(keyset_filter(cursor))
+        page = query.order("valid_to").order("id").limit(batch_size).execute().data
+        if page:
+            yield page
+        if len(page) < batch_size:
+            return
+        cursor = (page[-1]["valid_to"], page[-1]["id"])
+
+
+def write_batches(client, table: str, rows: List[Dict[str, Any]], batch_size: int, on_conflict: str) -> None:
+    for start in range(0, len(rows), batch_size):
+        client.table(table).upsert(rows[start:start + batch_size], on_conflict=on_conflict).execute()
+
+
+def rollup(args) -> int:
+    """Recompute daily answer counts and mean scores from response_history"""
+    client = create_service_client()
+    counts: Counter = Counter()
+    score_sums: Dict[str, np.ndarray] = defaultdict(lambda: np.zeros(len(DIMENSIONS)))
+    versions: Counter = Counter()
+    rows_read = 0
+    started = time.perf_counter()
+
+    for page in stream_history(client, args.since, args.batch_size):
+        days = [row["valid_to"][:10] for row in page]
+        for day, row in zip(days, page):
+            for key in QUESTION_KEYS:
+                if row.get(key) is not None:
+                    counts[(day, key, answer_text(row[key]))] += 1
+
+        # Score the whole page in one vectorized call, then sum per day
+        scores = score_rows(page)
+        unique_days, inverse = np.unique(days, return_inverse=True)
+        unique_days = unique_days.tolist()
+        for i, dimension in enumerate(DIMENSIONS):
+            sums = np.bincount(inverse, weights=scores[dimension], minlength=len(unique_days))
+            for day, total in zip(unique_days, sums):
+                score_sums[day][i] += total
+        for day, n in zip(unique_days, np.bincount(inverse)):
+            versions[day] += int(n)
+        rows_read += len(page)
+
+    rollup_rows = [
+        {"day": day, "question_key": key, "answer": answer, "responses": n}
+        for (day, key, answer), n in sorted(counts.items())
+    ]
+    daily_scores = [
+        {"day": day, "dimension": dimension, "versions": versions[day], "mean_score": float(sums[i] / versions[day])}
+        for day, sums in sorted(score_sums.items())
+        for i, dimension in enumerate(DIMENSIONS)
+    ]
+    write_batches(client, "response_daily_rollups", rollup_rows, args.batch_size, "day,question_key,answer")
+    write_batches(client, "response_daily_scores", daily_scores, args.batch_size, "day,dimension")
+    print(f"rollup: {rows_read} history rows, {len(versions)} days, "
+          f"{len(rollup_rows)} count rows and {len(daily_scores)} score rows written "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    if args.rebuild_population:
+        total = client.rpc("refresh_response_aggregates", {}).execute().data
+        print(f"rollup: population aggregates rebuilt from {total} responses")
+    elif not args.skip_population:
+        folded = client.rpc("fold_response_aggregates", {}).execute().data
+        print(f"rollup: {folded} pending population count changes folded in")
+    return 0
+
+
+def export(args) -> int:
+    """Stream a table to CSV or Parquet one page at a time"""
+    client = create_service_client()
+    columns = args.columns or EXPORT_COLUMNS[args.table]
+    fields = [c.strip() for c in columns.split(",")]
+    file_format = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    pages = stream_by_id(client, args.table, columns, args.batch_size)
+    started = time.perf_counter()
+    rows = 0
+
+    if file_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet export needs pyarrow: pip install pyarrow")
+        question_types = {q.key: pa.bool_() if q.options == YES_NO else pa.string() for q in QUESTIONS}
+        writer = None
+        try:
+            for page in pages:
+                table = pa.Table.from_pylist([{f: row.get(f) for f in fields} for row in page])
+                if writer is None:
+                    schema = pa.schema([
+                        pa.field(name, question_types.get(name, table.schema.field(name).type)) for name in fields
+                    ])
+                    writer = pq.ParquetWriter(args.output, schema)
+                writer.write_table(table.cast(writer.schema))
+                rows += len(page)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(args.output, "w", newline="") as output:
+            writer = csv.DictWriter(output, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            for page in pages:
+                writer.writerows(page)
+                rows += len(page)
+
+    print(f"export: {rows} {args.table} rows written to {args.output} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def _parse_answer(question, value: Any) -> Any:
+    """Turn a CSV cell back into the registry's option type"""
+    if question.options == YES_NO and isinstance(value, str):
+        return {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}.get(value.strip().lower(), value)
+    return value if value != "" else None
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from a .jsonl or .csv file without loading it whole"""
+    with open(path, newline="") as source:
+        if path.endswith(".jsonl"):
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(source)
+
+
+def import_responses(args) -> int:
+    """Bulk-load responses rows with multi-row inserts"""
+    client = create_service_client()
+    batch: List[Dict[str, Any]] = []
+    loaded = rejected = 0
+    started = time.perf_counter()
+
+    def flush():
+        nonlocal loaded
+        if not batch:
+            return
+        query = client.table("responses")
+        if args.upsert:
+            query.upsert(batch, on_conflict="user_id").execute()
+        else:
+            query.insert(batch).execute()
+        loaded += len(batch)
+        batch.clear()
+
+    for line, record in enumerate(read_records(args.input), start=1):
+        answers = {q.key: _parse_answer(q, record.get(q.key)) for q in QUESTIONS}
+        error = validate_answers(answers) or (None if record.get("user_id") else "Missing user_id")
+        if error:
+            rejected += 1
+            print(f"import: record {line} skipped: {error}", file=sys.stderr)
+            continue
+        batch.append({"user_id": record["user_id"], **answers})
+        if len(batch) >= args.batch_size:
+            flush()
+    flush()
+
+    print(f"import: {loaded} responses loaded, {rejected} rejected in {time.perf_counter() - started:.1f}s")
+    return 1 if rejected else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Wellness Tracker batch jobs")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    rollup_parser = subcommands.add_parser("rollup", help="recompute daily aggregates from response_history")
+    rollup_parser.add_argument("--since", help="only recompute days from this date (YYYY-MM-DD) onwards")
+    rollup_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    rollup_parser.add_argument("--skip-population", action="store_true",
+                               help="do not fold pending changes into the population aggregates afterwards")
+    rollup_parser.add_argument("--rebuild-population", action="store_true",
+                               help="repair: rebuild the population aggregates with a full scan of responses")
+    rollup_parser.set_defaults(handler=rollup)
+
+    export_parser = subcommands.add_parser("export", help="stream a table to CSV or Parquet")
+    export_parser.add_argument("table", choices=sorted(EXPORT_COLUMNS))
+    export_parser.add_argument("--output", "-o", required=True)
+    export_parser.add_argument("--format", choices=["csv", "parquet"], help="defaults to the output file extension")
+    export_parser.add_argument("--columns", help="comma-separated columns to export")
+    export_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    export_parser.set_defaults(handler=export)
+
+    import_parser = subcommands.add_parser("import", help="bulk-load responses from CSV or JSONL")
+    import_parser.add_argument("input", help=".csv or .jsonl file with user_id and one column per question")
+    import_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    import_parser.add_argument("--upsert", action="store_true",
+                               help="replace existing rows for the same user_id (needs migration 0007's unique user_id index)")
+    import_parser.set_defaults(handler=import_responses)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
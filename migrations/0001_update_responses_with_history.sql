@@ -0,0 +1,89 @@
+-- Atomic "snapshot then update" for SupabaseClient.update_responses.
+--
+-- Replaces three round trips from Python (select current row, insert into
+-- response_history, update responses) with a single RPC. The current row is
+-- locked with FOR UPDATE so concurrent saves for the same user serialize and
+-- every overwritten version lands in response_history exactly once.
+--
+-- Runs as SECURITY INVOKER, so the existing row-level security policies on
+-- responses and response_history still apply to the caller.
+
+create or replace function public.update_responses_with_history(
+    p_user_id uuid,
+    p_responses jsonb
+)
+returns setof public.responses
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+    current_row public.responses;
+    next_row public.responses;
+begin
+    select *
+      into current_row
+      from public.responses
+     where user_id = p_user_id
+       for update;
+
+    if not found then
+        return;
+    end if;
+
+    insert into public.response_history (
+        user_id,
+        response_id,
+        h1_sleep_7hrs,
+        h2_fruit_veg_2servings,
+        h3_moved_20mins,
+        h4_low_energy_frequency,
+        w1_saved_money,
+        w2_emergency_secure,
+        w3_regretful_spending,
+        p1_personal_time,
+        p2_social_connection,
+        p3_overwhelmed_frequency,
+        f_focus_area,
+        valid_to,
+        is_current
+    ) values (
+        current_row.user_id,
+        current_row.id,
+        current_row.h1_sleep_7hrs,
+        current_row.h2_fruit_veg_2servings,
+        current_row.h3_moved_20mins,
+        current_row.h4_low_energy_frequency,
+        current_row.w1_saved_money,
+        current_row.w2_emergency_secure,
+        current_row.w3_regretful_spending,
+        current_row.p1_personal_time,
+        current_row.p2_social_connection,
+        current_row.p3_overwhelmed_frequency,
+        current_row.f_focus_area,
+        now(),
+        false
+    );
+
+    -- Overlay only the keys the caller sent; identity columns are never updatable
+    next_row := jsonb_populate_record(current_row, p_responses - 'id' - 'user_id');
+
+    return query
+    update public.responses
+       set h1_sleep_7hrs = next_row.h1_sleep_7hrs,
+           h2_fruit_veg_2servings = next_row.h2_fruit_veg_2servings,
+           h3_moved_20mins = next_row.h3_moved_20mins,
+           h4_low_energy_frequency = next_row.h4_low_energy_frequency,
+           w1_saved_money = next_row.w1_saved_money,
+           w2_emergency_secure = next_row.w2_emergency_secure,
+           w3_regretful_spending = next_row.w3_regretful_spending,
+           p1_personal_time = next_row.p1_personal_time,
+           p2_social_connection = next_row.p2_social_connection,
+           p3_overwhelmed_frequency = next_row.p3_overwhelmed_frequency,
+           f_focus_area = next_row.f_focus_area
+     where id = current_row.id
+    returning *;
+end;
+$$;
+
+grant execute on function public.update_responses_with_history(uuid, jsonb) to authenticated;
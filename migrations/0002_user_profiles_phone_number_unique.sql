@@ -0,0 +1,16 @@
+-- Unique index backing the phone-number login lookup in SupabaseClient.sign_in_user.
+--
+-- The app now stores phone numbers normalized (no spaces, dashes or
+-- parentheses, see validators.normalize_phone) and looks them up the same way.
+-- Existing rows are normalized first so old and new formats collide here
+-- instead of silently resolving to different accounts at login.
+--
+-- If the index build fails with a duplicate key error, two profiles share a
+-- phone number; resolve those rows by hand and re-run this migration.
+
+update public.user_profiles
+set phone_number = regexp_replace(phone_number, '[-() ]', '', 'g')
+where phone_number ~ '[-() ]';
+
+create unique index if not exists user_profiles_phone_number_key
+    on public.user_profiles (phone_number);
@@ -0,0 +1,13 @@
+-- Index backing the keyset-paginated history reads in
+-- SupabaseClient.get_response_history_page:
+--
+--   where user_id = $1 and (valid_to, id) > ($2, $3)
+--   order by valid_to, id
+--   limit $4
+--
+-- With it every page is an index range scan that starts at the cursor, so
+-- fetching the newest rows costs the same for a user with ten versions as for
+-- one with years of daily edits.
+
+create index if not exists response_history_user_valid_to_id_idx
+    on public.response_history (user_id, valid_to, id);
@@ -0,0 +1,185 @@
+-- Population-wide answer counts for the dashboard's "compared with everyone" view.
+--
+-- Row-level security stops a user from reading other users' responses, and
+-- scanning responses on every dashboard view would not scale anyway. Instead
+-- response_aggregates keeps one counter per (question, answer), plus a
+-- '__responses__' row counting responses rows. A trigger on responses appends
+-- each insert, update and delete to response_aggregate_deltas, and
+-- fold_response_aggregates() (main.py rollup, or pg_cron) adds them to the
+-- counters. get_response_aggregates() returns counters plus pending deltas, a
+-- few dozen rows regardless of the user count. refresh_response_aggregates()
+-- rebuilds the counters from scratch as an explicit repair.
+--
+-- Keep response_aggregate_keys() in step with questions.py when questions are
+-- added.
+
+create table if not exists public.response_aggregates (
+    question_key text not null,
+    answer text not null,
+    responses bigint not null default 0,
+    primary key (question_key, answer)
+);
+
+-- No policies: only the security definer functions below read or write it
+alter table public.response_aggregates enable row level security;
+
+create or replace function public.response_aggregate_keys()
+returns text[]
+language sql
+immutable
+as $$
+    select array[
+        'h1_sleep_7hrs',
+        'h2_fruit_veg_2servings',
+        'h3_moved_20mins',
+        'h4_low_energy_frequency',
+        'w1_saved_money',
+        'w2_emergency_secure',
+        'w3_regretful_spending',
+        'p1_personal_time',
+        'p2_social_connection',
+        'p3_overwhelmed_frequency',
+        'f_focus_area'
+    ]
+$$;
+
+-- Saves never update response_aggregates themselves: the trigger appends to
+-- this log, which takes no lock another save waits on, and
+-- fold_response_aggregates() moves the log into the counters in one batch
+create table if not exists public.response_aggregate_deltas (
+    id bigint generated always as identity primary key,
+    question_key text not null,
+    answer text not null,
+    delta integer not null
+);
+
+alter table public.response_aggregate_deltas enable row level security;
+
+drop function if exists public.response_aggregates_apply(jsonb, integer);
+
+create or replace function public.response_aggregates_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    old_row jsonb := case when tg_op in ('UPDATE', 'DELETE') then to_jsonb(old) end;
+    new_row jsonb := case when tg_op in ('INSERT', 'UPDATE') then to_jsonb(new) end;
+begin
+    -- An update only moves the answers that changed; the number of rows stays the same
+    insert into response_aggregate_deltas (question_key, answer, delta)
+    select kv.key, kv.value, -1
+    from jsonb_each_text(old_row) as kv
+    where kv.key = any(response_aggregate_keys()) and kv.value is not null
+      and (new_row is null or new_row ->> kv.key is distinct from kv.value)
+    union all
+    select kv.key, kv.value, 1
+    from jsonb_each_text(new_row) as kv
+    where kv.key = any(response_aggregate_keys()) and kv.value is not null
+      and (old_row is null or old_row ->> kv.key is distinct from kv.value)
+    union all
+    select '__responses__', 'all', case when tg_op = 'INSERT' then 1 else -1 end
+    where tg_op <> 'UPDATE';
+    return null;
+end;
+$$;
+
+drop trigger if exists responses_aggregates on public.responses;
+create trigger responses_aggregates
+    after insert or update or delete on public.responses
+    for each row execute function public.response_aggregates_trigger();
+
+create or replace function public.get_response_aggregates()
+returns table (question_key text, answer text, responses bigint)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    -- Counters plus the deltas not folded in yet, so saves show up before the next fold
+    select counts.question_key, counts.answer, sum(counts.responses)::bigint
+    from (
+        select a.question_key, a.answer, a.responses from response_aggregates as a
+        union all
+        select d.question_key, d.answer, d.delta from response_aggregate_deltas as d
+    ) as counts
+    group by counts.question_key, counts.answer
+    having sum(counts.responses) > 0;
+$$;
+
+create or replace function public.fold_response_aggregates()
+returns bigint
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    folded bigint;
+begin
+    -- One fold at a time; a second caller returns at once instead of queueing
+    if not pg_try_advisory_xact_lock(hashtext('response_aggregates_fold')) then
+        return 0;
+    end if;
+
+    with moved as (
+        delete from response_aggregate_deltas
+        returning question_key, answer, delta
+    ), summed as (
+        select question_key, answer, sum(delta) as delta, count(*) as deltas
+        from moved
+        group by question_key, answer
+    ), applied as (
+        insert into response_aggregates (question_key, answer, responses)
+        select question_key, answer, delta
+        from summed
+        order by question_key, answer
+        on conflict (question_key, answer)
+        do update set responses = response_aggregates.responses + excluded.responses
+    )
+    select coalesce(sum(deltas), 0) into folded from summed;
+    return folded;
+end;
+$$;
+
+-- Repair for counters that drifted (e.g. rows changed with the trigger disabled).
+-- Not part of the nightly rollup: it scans all of responses. The scan goes into a
+-- staging table first, so saves keep appending deltas meanwhile and the counters
+-- are only touched by the short swap at the end. A save that commits while the
+-- repair runs can leave its counts off by one until the next repair.
+create or replace function public.refresh_response_aggregates()
+returns bigint
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    total bigint;
+    last_delta bigint;
+begin
+    perform pg_advisory_xact_lock(hashtext('response_aggregates_fold'));
+    select coalesce(max(id), 0) into last_delta from response_aggregate_deltas;
+
+    create temporary table response_aggregates_staging on commit drop as
+    select kv.key as question_key, kv.value as answer, count(*) as responses
+    from responses as r, jsonb_each_text(to_jsonb(r)) as kv
+    where kv.key = any(response_aggregate_keys()) and kv.value is not null
+    group by kv.key, kv.value;
+
+    select count(*) into total from responses;
+    insert into response_aggregates_staging (question_key, answer, responses)
+    values ('__responses__', 'all', total);
+
+    delete from response_aggregate_deltas where id <= last_delta;
+    delete from response_aggregates;
+    insert into response_aggregates (question_key, answer, responses)
+    select question_key, answer, responses
+    from response_aggregates_staging
+    order by question_key, answer;
+    return total;
+end;
+$$;
+
+revoke execute on function public.fold_response_aggregates() from public, anon, authenticated;
+revoke execute on function public.refresh_response_aggregates() from public, anon, authenticated;
+grant execute on function public.get_response_aggregates() to anon, authenticated;
@@ -0,0 +1,33 @@
+-- Daily rollup tables written by `python main.py rollup`.
+--
+-- response_daily_rollups counts the answers of every response version that
+-- was superseded on a given day (response_history.valid_to), and
+-- response_daily_scores holds the mean wellness score per dimension for the
+-- same versions (see scoring.py). The rollup job recomputes whole days and
+-- upserts them, so re-running it for a day replaces that day's rows.
+--
+-- Both tables are for analysts and batch jobs using the service role key;
+-- RLS is enabled without policies so app users cannot read them.
+
+create table if not exists public.response_daily_rollups (
+    day date not null,
+    question_key text not null,
+    answer text not null,
+    responses bigint not null,
+    primary key (day, question_key, answer)
+);
+
+create table if not exists public.response_daily_scores (
+    day date not null,
+    dimension text not null,
+    versions bigint not null,
+    mean_score double precision not null,
+    primary key (day, dimension)
+);
+
+alter table public.response_daily_rollups enable row level security;
+alter table public.response_daily_scores enable row level security;
+
+-- Keyset pagination over the whole history table by (valid_to, id)
+create index if not exists response_history_valid_to_id_idx
+    on public.response_history (valid_to, id);
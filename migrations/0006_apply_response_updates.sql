@@ -0,0 +1,35 @@
+-- Batched updates for the write-behind queue (write_behind.py).
+--
+-- The queue's worker collects questionnaire edits from many users and applies
+-- them in one round trip. Each element of p_updates is
+-- {"user_id": ..., "responses": {...}} and goes through
+-- update_responses_with_history (migration 0001) in array order, so every
+-- overwritten version still lands in response_history exactly once and two
+-- edits by the same user apply in the order they were made.
+--
+-- The worker writes for many users at once, so it uses the service role key;
+-- execute is granted to service_role only.
+
+create or replace function public.apply_response_updates(p_updates jsonb)
+returns setof public.responses
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+    item jsonb;
+begin
+    for item in select value from jsonb_array_elements(p_updates)
+    loop
+        return query
+        select *
+        from public.update_responses_with_history(
+            (item ->> 'user_id')::uuid,
+            item -> 'responses'
+        );
+    end loop;
+end;
+$$;
+
+revoke execute on function public.apply_response_updates(jsonb) from public, anon, authenticated;
+grant execute on function public.apply_response_updates(jsonb) to service_role;
@@ -0,0 +1,146 @@
+-- Idempotent questionnaire submissions.
+--
+-- Streamlit reruns, double clicks and write-behind replays can send the same
+-- submission twice. The app tags each form submission with a random
+-- idempotency key (a uuid) and keeps recent results in a local dedupe cache;
+-- this migration makes repeats a no-op in the database as well:
+--
+-- * responses gets a unique index on user_id, so save_responses can upsert
+--   with ON CONFLICT DO NOTHING and a repeated first save writes nothing.
+-- * response_history gets a submission_id column with a unique index, and
+--   update_responses_with_history takes an optional p_submission_id. The
+--   snapshot of the overwritten version is inserted with
+--   ON CONFLICT (submission_id) DO NOTHING; when the submission already ran,
+--   the current row is returned without a second history row or update.
+-- * apply_response_updates passes each item's submission_id through.
+--
+-- The function gains a parameter, so it is dropped and recreated rather than
+-- replaced (two overloads would make PostgREST calls ambiguous). Without a
+-- submission id the behaviour is exactly that of migration 0001.
+--
+-- If the index build on responses fails with a duplicate key error, some
+-- users have more than one responses row; resolve those rows by hand and
+-- re-run this migration.
+
+create unique index if not exists responses_user_id_key
+    on public.responses (user_id);
+
+alter table public.response_history
+    add column if not exists submission_id uuid;
+
+create unique index if not exists response_history_submission_id_key
+    on public.response_history (submission_id);
+
+drop function if exists public.update_responses_with_history(uuid, jsonb);
+
+create function public.update_responses_with_history(
+    p_user_id uuid,
+    p_responses jsonb,
+    p_submission_id uuid default null
+)
+returns setof public.responses
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+    current_row public.responses;
+    next_row public.responses;
+begin
+    select *
+      into current_row
+      from public.responses
+     where user_id = p_user_id
+       for update;
+
+    if not found then
+        return;
+    end if;
+
+    insert into public.response_history (
+        user_id,
+        response_id,
+        h1_sleep_7hrs,
+        h2_fruit_veg_2servings,
+        h3_moved_20mins,
+        h4_low_energy_frequency,
+        w1_saved_money,
+        w2_emergency_secure,
+        w3_regretful_spending,
+        p1_personal_time,
+        p2_social_connection,
+        p3_overwhelmed_frequency,
+        f_focus_area,
+        valid_to,
+        is_current,
+        submission_id
+    ) values (
+        current_row.user_id,
+        current_row.id,
+        current_row.h1_sleep_7hrs,
+        current_row.h2_fruit_veg_2servings,
+        current_row.h3_moved_20mins,
+        current_row.h4_low_energy_frequency,
+        current_row.w1_saved_money,
+        current_row.w2_emergency_secure,
+        current_row.w3_regretful_spending,
+        current_row.p1_personal_time,
+        current_row.p2_social_connection,
+        current_row.p3_overwhelmed_frequency,
+        current_row.f_focus_area,
+        now(),
+        false,
+        p_submission_id
+    )
+    on conflict (submission_id) do nothing;
+
+    if not found then
+        -- This submission already replaced a version: return the row unchanged
+        return next current_row;
+        return;
+    end if;
+
+    -- Overlay only the keys the caller sent; identity columns are never updatable
+    next_row := jsonb_populate_record(current_row, p_responses - 'id' - 'user_id');
+
+    return query
+    update public.responses
+       set h1_sleep_7hrs = next_row.h1_sleep_7hrs,
+           h2_fruit_veg_2servings = next_row.h2_fruit_veg_2servings,
+           h3_moved_20mins = next_row.h3_moved_20mins,
+           h4_low_energy_frequency = next_row.h4_low_energy_frequency,
+           w1_saved_money = next_row.w1_saved_money,
+           w2_emergency_secure = next_row.w2_emergency_secure,
+           w3_regretful_spending = next_row.w3_regretful_spending,
+           p1_personal_time = next_row.p1_personal_time,
+           p2_social_connection = next_row.p2_social_connection,
+           p3_overwhelmed_frequency = next_row.p3_overwhelmed_frequency,
+           f_focus_area = next_row.f_focus_area
+     where id = current_row.id
+    returning *;
+end;
+$$;
+
+grant execute on function public.update_responses_with_history(uuid, jsonb, uuid) to authenticated;
+
+create or replace function public.apply_response_updates(p_updates jsonb)
+returns setof public.responses
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+    item jsonb;
+begin
+    for item in select value from jsonb_array_elements(p_updates)
+    loop
+        return query
+        select *
+        from public.update_responses_with_history(
+            (item ->> 'user_id')::uuid,
+            item -> 'responses',
+            (item ->> 'submission_id')::uuid
+        );
+    end loop;
+end;
+$$;
@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+YES_NO = (True, False)
+FREQUENCY = ("Rarely", "Sometimes", "Often")
+FOCUS_AREAS = ("Health", "Wealth", "Happiness")
+
+
+@dataclass(frozen=True)
+class Question:
+    """One questionnaire item, stored in the responses column of the same name"""
+    key: str
+    label: str
+    metric: str
+    options: Tuple[Any, ...]
+    # Answers that count towards wellness in trends; empty for questions without a better answer
+    favourable: Tuple[Any, ...] = ()
+
+
+@dataclass(frozen=True)
+class Section:
+    """A group of questions rendered together; dashboard_columns=0 keeps it off the dashboard grid"""
+    title: str
+    questions: Tuple[Question, ...]
+    dashboard_columns: int = 3
+    # The f_focus_area answer that names this section's wellness dimension
+    focus: str = ""
+
+
+# Single source of truth for the questionnaire, the dashboard and what gets persisted.
+# Adding a question means adding it here and a column of the same name to responses
+# and response_history.
+SECTIONS = (
+    Section("🏥 Health", (
+        Question("h1_sleep_7hrs", "Did you sleep 7+ hours last night?", "Sleep 7+ Hours", YES_NO, (True,)),
+        Question("h2_fruit_veg_2servings", "Did you eat 2+ servings of fruit/vegetables yesterday?", "Fruit/Vegetables", YES_NO, (True,)),
+        Question("h3_moved_20mins", "Did you move for 20+ minutes yesterday?", "Exercise 20+ Minutes", YES_NO, (True,)),
+        Question("h4_low_energy_frequency", "How often do you feel low energy during the day?", "Low Energy Frequency", FREQUENCY, ("Rarely",)),
+    ), dashboard_columns=2, focus="Health"),
+    Section("💰 Wealth", (
+        Question("w1_saved_money", "Did you set aside any money last week?", "Saved Money", YES_NO, (True,)),
+        Question("w2_emergency_secure", "Would you feel secure if an emergency expense hit tomorrow?", "Emergency Secure", YES_NO, (True,)),
+        Question("w3_regretful_spending", "Did you spend on something you later regretted in the last month?", "Regretful Spending", YES_NO, (False,)),
+    ), focus="Wealth"),
+    Section("😊 Happiness", (
+        Question("p1_personal_time", "Did you do something just for yourself yesterday (read/walk/relax)?", "Personal Time", YES_NO, (True,)),
+        Question("p2_social_connection", "Did you connect with a close friend/family in the past week?", "Social Connection", YES_NO, (True,)),
+        Question("p3_overwhelmed_frequency", "How often do you feel overwhelmed by daily demands?", "Overwhelmed Frequency", FREQUENCY, ("Rarely",)),
+    ), focus="Happiness"),
+    # Shown in the dashboard greeting rather than as a metric
+    Section("🎯 Focus Area", (
+        Question("f_focus_area", "If you could feel more 'in control' in one area next week, which would it be?", "Focus Area", FOCUS_AREAS),
+    ), dashboard_columns=0),
+)
+
+QUESTIONS = tuple(question for section in SECTIONS for question in section.questions)
+QUESTIONS_BY_KEY = {question.key: question for question in QUESTIONS}
+QUESTION_KEYS = tuple(QUESTIONS_BY_KEY)
+
+# Column lists for PostgREST select(); reads fetch only what the app uses
+RESPONSE_COLUMNS = ",".join(("id",) + QUESTION_KEYS)
+HISTORY_COLUMNS = ",".join(("id", "valid_to") + QUESTION_KEYS)
+
+
+def format_answer(value: Any) -> Any:
+    """Show booleans as Yes/No"""
+    return ("Yes" if value else "No") if isinstance(value, bool) else value
+
+
+def answers(row: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The registered question columns of a row, in questionnaire order"""
+    row = row or {}
+    return {key: row.get(key) for key in QUESTION_KEYS}
+
+
+def pack_answers(responses: Dict[str, Any]) -> bytes:
+    """One byte per question in registry order: 0 for unanswered, else 1 + the answer's option index"""
+    return bytes(
+        question.options.index(responses[question.key]) + 1
+        if responses.get(question.key) in question.options else 0
+        for question in QUESTIONS
+    )
+
+
+def unpack_answers(packed: bytes) -> Dict[str, Any]:
+    """Answers dict from pack_answers output; missing bytes read as unanswered"""
+    return {
+        question.key: question.options[packed[i] - 1] if i < len(packed) and packed[i] else None
+        for i, question in enumerate(QUESTIONS)
+    }
+
+
+def validate_answers(responses: Dict[str, Any]) -> Optional[str]:
+    """Return an error message unless every question has one of its allowed answers"""
+    unknown = sorted(set(responses) - set(QUESTION_KEYS))
+    if unknown:
+        return f"Unknown questions: {', '.join(unknown)}"
+    for question in QUESTIONS:
+        value = responses.get(question.key)
+        if value is None:
+            return f"Missing answer for {question.key}"
+        if value not in question.options:
+            return f"Invalid answer for {question.key}: {value!r}"
+    return None
+
+
+def dashboard_columns(section: Section) -> List[List[Question]]:
+    """Split a section's questions into its dashboard columns, filling each column in turn"""
+    per_column = -(-len(section.questions) // section.dashboard_columns)
+    return [list(section.questions[i:i + per_column]) for i in range(0, len(section.questions), per_column)]
@@ -0,0 +1,212 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+# Seconds one SupabaseClient call may take, retries included; every HTTP request
+# made inside it gets the remaining budget as its timeout
+CALL_DEADLINE = float(os.getenv("SUPABASE_CALL_DEADLINE", "10"))
+
+# Idempotent reads are retried on transient errors with full-jitter exponential backoff
+READ_RETRIES = int(os.getenv("SUPABASE_READ_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("SUPABASE_RETRY_BASE_DELAY", "0.1"))
+RETRY_MAX_DELAY = float(os.getenv("SUPABASE_RETRY_MAX_DELAY", "1.0"))
+
+# An endpoint's breaker opens after this many consecutive transient failures and
+# lets one trial request through after BREAKER_RESET seconds
+BREAKER_FAILURES = int(os.getenv("SUPABASE_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("SUPABASE_BREAKER_RESET", "30"))
+
+# Oldest cached data (seconds past its TTL) served while an endpoint is failing
+MAX_STALENESS = float(os.getenv("SUPABASE_MAX_STALENESS", "86400"))
+
+T = TypeVar("T")
+
+_local = threading.local()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open"""
+
+    def __init__(self, endpoint: str):
+        super().__init__(f"Supabase {endpoint} is unavailable right now. Please try again shortly.")
+        self.endpoint = endpoint
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's deadline ran out before the request finished"""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current call's deadline, or None outside a call"""
+    deadline = getattr(_local, "deadline", None)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Give the enclosed requests a shared time budget; a nested budget can only shorten it"""
+    outer = getattr(_local, "deadline", None)
+    ends = time.monotonic() + seconds
+    _local.deadline = ends if outer is None else min(outer, ends)
+    try:
+        yield
+    finally:
+        _local.deadline = outer
+
+
+def httpx_deadline_hook(request) -> None:
+    """httpx event hook capping a request's timeouts at what is left of the call's deadline"""
+    left = remaining()
+    if left is not None:
+        left = max(left, 0.001)
+        request.extensions["timeout"] = {"connect": left, "read": left, "write": left, "pool": left}
+
+
+def is_transient(error: BaseException) -> bool:
+    """Timeouts, connection failures, 5xx and 429: worth retrying, and counted by the breakers"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__module__.split(".")[0] in ("httpx", "httpcore"):
+        import httpx
+        return isinstance(error, httpx.TransportError)
+    if type(error).__name__ == "AuthRetryableError":
+        return True  # supabase_auth's wrapper for network failures
+    # Auth errors carry the HTTP status; postgrest uses it as the code when the body isn't JSON (gateway errors)
+    status = getattr(error, "status", None)
+    code = getattr(error, "code", None)
+    for value in (status, code):
+        if isinstance(value, int) and (value >= 500 or value == 429):
+            return True
+    # PGRST000-PGRST003: PostgREST could not reach or get a connection to the database
+    return code in ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one endpoint: closed, open (fail fast), then one half-open trial"""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._trial else "open"
+
+    def allow(self) -> bool:
+        """Whether a request may go out now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial:
+                # The trial request failed too; stay open for another reset period
+                self._opened_at = time.monotonic()
+                self._trial = False
+            elif self._opened_at is None and self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self.opens += 1
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_counters = {"calls": 0, "retries": 0, "timeouts": 0, "fast_failures": 0, "stale_served": 0}
+_counters_lock = threading.Lock()
+
+
+def breaker(endpoint: str) -> CircuitBreaker:
+    """The circuit breaker for an endpoint (a table name, "rpc:<function>" or "auth")"""
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint, BREAKER_FAILURES, BREAKER_RESET)
+        return _breakers[endpoint]
+
+
+def _count(name: str) -> None:
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def note_stale() -> None:
+    """Count a read answered from cached data because its endpoint was failing"""
+    _count("stale_served")
+
+
+def call(endpoint: str, fn: Callable[[], T], retry: bool = False, budget: Optional[float] = None) -> T:
+    """Run one Supabase request under the endpoint's breaker and the call deadline.
+
+    Only pass retry=True for idempotent reads: a write that timed out may still
+    have been applied. Errors that are not transient (4xx, RLS, bad input) mean
+    the endpoint answered, so they neither retry nor count against the breaker.
+    """
+    circuit = breaker(endpoint)
+    _count("calls")
+    with deadline(CALL_DEADLINE if budget is None else budget):
+        attempt = 0
+        while True:
+            if not circuit.allow():
+                _count("fast_failures")
+                raise CircuitOpenError(endpoint)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_transient(e):
+                    circuit.record_success()
+                    raise
+                circuit.record_failure()
+                if isinstance(e, TimeoutError) or "Timeout" in type(e).__name__:
+                    _count("timeouts")
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+                left = remaining()
+                if not retry or attempt >= READ_RETRIES or left is None or left <= delay:
+                    raise
+                attempt += 1
+                _count("retries")
+                time.sleep(delay)
+                continue
+            circuit.record_success()
+            return result
+
+
+def breaker_states() -> Dict[str, int]:
+    """0 closed, 1 half-open, 2 open, per endpoint"""
+    with _breakers_lock:
+        circuits = list(_breakers.values())
+    return {c.name: {"closed": 0, "half_open": 1, "open": 2}[c.state] for c in circuits}
+
+
+def stats() -> Dict[str, Any]:
+    """Call, retry, timeout, fast-failure and stale-read counters, plus breaker openings"""
+    with _counters_lock:
+        totals = dict(_counters)
+    with _breakers_lock:
+        circuits = list(_breakers.values())
+    totals["breaker_opens"] = sum(c.opens for c in circuits)
+    totals["open_breakers"] = sum(c.state != "closed" for c in circuits)
+    return totals
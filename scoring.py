@@ -0,0 +1,116 @@
+import os
+import numpy as np
+from dataclasses import dataclass
+from questions import QUESTIONS, SECTIONS, YES_NO
+from typing import Any, Dict, Iterable, Optional
+
+# The dimension a user picked as f_focus_area counts this many times in the overall score
+FOCUS_WEIGHT = float(os.getenv("SCORING_FOCUS_WEIGHT", "2.0"))
+
+# Column layout of the packed representation, derived from the question registry:
+# yes/no questions become one bit each, every other question a small integer code
+BOOL_QUESTIONS = tuple(q for q in QUESTIONS if q.options == YES_NO)
+CODE_QUESTIONS = tuple(q for q in QUESTIONS if q.options != YES_NO)
+DIMENSIONS = tuple(section.focus for section in SECTIONS if section.focus)
+FOCUS_KEY = "f_focus_area"
+MISSING = 255
+
+
+@dataclass
+class PackedResponses:
+    """Columnar responses: yes/no answers as bits, other answers as uint8 option indexes"""
+    bits: np.ndarray   # (rows, ceil(len(BOOL_QUESTIONS) / 8)) uint8
+    codes: np.ndarray  # (rows, len(CODE_QUESTIONS)) uint8, MISSING where unanswered
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes + self.codes.nbytes
+
+
+def _option_points(question) -> np.ndarray:
+    """Points per option index: 1 for a favourable answer, falling linearly with distance from it"""
+    points = np.zeros(len(question.options), dtype=np.float32)
+    if question.favourable:
+        best = question.options.index(question.favourable[0])
+        span = max(len(question.options) - 1, 1)
+        for i in range(len(question.options)):
+            points[i] = 1.0 - abs(i - best) / span
+    return points
+
+
+def _build_tables():
+    # Yes/no questions score their bit, or its complement when "No" is the favourable answer
+    bool_flip = np.array([q.favourable == (False,) for q in BOOL_QUESTIONS], dtype=np.float32)
+
+    # Lookup table row per coded question; the last column scores unanswered (MISSING) codes
+    width = max(len(q.options) for q in CODE_QUESTIONS) + 1
+    code_points = np.zeros((len(CODE_QUESTIONS), width), dtype=np.float32)
+    for row, question in enumerate(CODE_QUESTIONS):
+        code_points[row, :len(question.options)] = _option_points(question)
+
+    # Question -> dimension membership, bool columns first then coded columns
+    scored = BOOL_QUESTIONS + CODE_QUESTIONS
+    membership = np.zeros((len(scored), len(DIMENSIONS)), dtype=np.float32)
+    for section in SECTIONS:
+        if section.focus:
+            for question in section.questions:
+                if question.favourable:
+                    membership[scored.index(question), DIMENSIONS.index(section.focus)] = 1.0
+
+    # Overall-score weights per focus answer, plus an unweighted row for MISSING
+    focus_options = next(q for q in CODE_QUESTIONS if q.key == FOCUS_KEY).options
+    focus_weights = np.ones((width, len(DIMENSIONS)), dtype=np.float32)
+    for i, option in enumerate(focus_options):
+        if option in DIMENSIONS:
+            focus_weights[i, DIMENSIONS.index(option)] = FOCUS_WEIGHT
+    return bool_flip, code_points, membership, focus_weights
+
+
+BOOL_FLIP, CODE_POINTS, MEMBERSHIP, FOCUS_WEIGHTS = _build_tables()
+_CODE_INDEX = [{option: i for i, option in enumerate(q.options)} for q in CODE_QUESTIONS]
+_FOCUS_COLUMN = next(i for i, q in enumerate(CODE_QUESTIONS) if q.key == FOCUS_KEY)
+
+
+def pack(rows: Iterable[Dict[str, Any]]) -> PackedResponses:
+    """Pack response rows into the columnar representation; unanswered yes/no questions pack as No"""
+    rows = list(rows)
+    flags = np.array([[row.get(q.key) is True for q in BOOL_QUESTIONS] for row in rows], dtype=np.uint8)
+    codes = np.array(
+        [[index.get(row.get(q.key), MISSING) for q, index in zip(CODE_QUESTIONS, _CODE_INDEX)] for row in rows],
+        dtype=np.uint8,
+    )
+    flags = flags.reshape(len(rows), len(BOOL_QUESTIONS))
+    codes = codes.reshape(len(rows), len(CODE_QUESTIONS))
+    return PackedResponses(bits=np.packbits(flags, axis=1), codes=codes)
+
+
+def score(packed: PackedResponses) -> Dict[str, np.ndarray]:
+    """0-100 score per dimension and a focus-weighted overall score for every packed row"""
+    bits = np.unpackbits(packed.bits, axis=1, count=len(BOOL_QUESTIONS)).astype(np.float32)
+    bool_points = np.abs(bits - BOOL_FLIP)
+
+    codes = np.minimum(packed.codes, CODE_POINTS.shape[1] - 1)
+    code_points = CODE_POINTS[np.arange(len(CODE_QUESTIONS)), codes]
+
+    points = np.concatenate([bool_points, code_points], axis=1)
+    dimensions = 100.0 * (points @ MEMBERSHIP) / MEMBERSHIP.sum(axis=0)
+
+    weights = FOCUS_WEIGHTS[codes[:, _FOCUS_COLUMN]]
+    overall = (dimensions * weights).sum(axis=1) / weights.sum(axis=1)
+
+    scores = {dimension: dimensions[:, i] for i, dimension in enumerate(DIMENSIONS)}
+    scores["Overall"] = overall
+    return scores
+
+
+def score_rows(rows: Iterable[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Pack and score response rows in one call"""
+    return score(pack(rows))
+
+
+def score_one(row: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Scores for a single responses row, as plain floats"""
+    return {name: float(values[0]) for name, values in score_rows([row or {}]).items()}
@@ -0,0 +1,42 @@
+from urllib.parse import urlsplit
+
+import streamlit as st
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from auth_session import END_ROUTE, RESUME_COOKIE, RESUME_COOKIE_SECURE, RESUME_ROUTE, claim_handoff, is_live, resume_store
+
+# Entry point: `streamlit run server.py` serves wellness_app.py plus the routes that set and
+# drop the HttpOnly resume cookie, which a Streamlit script cannot do itself
+
+
+def _same_origin(request: Request) -> bool:
+    """Reject cross-site posts, so another site cannot plant its own login in the browser"""
+    origin = request.headers.get("origin")
+    return origin is None or urlsplit(origin).netloc == request.headers.get("host")
+
+
+async def resume(request: Request) -> Response:
+    """Trade a one-time handoff code for the resume cookie"""
+    resume_id = claim_handoff((await request.body()).decode()) if _same_origin(request) else None
+    if resume_id is None:
+        return Response(status_code=403)
+    response = Response(status_code=204)
+    response.set_cookie(RESUME_COOKIE, resume_id, max_age=int(resume_store.ttl), httponly=True,
+                        secure=RESUME_COOKIE_SECURE, samesite="strict")
+    return response
+
+
+async def end(request: Request) -> Response:
+    """Drop the resume cookie once its login has ended; a cookie from a newer login is left alone"""
+    response = Response(status_code=204)
+    if _same_origin(request) and not is_live(request.cookies.get(RESUME_COOKIE)):
+        response.delete_cookie(RESUME_COOKIE, httponly=True, secure=RESUME_COOKIE_SECURE, samesite="strict")
+    return response
+
+
+app = st.App("wellness_app.py", routes=[
+    Route(RESUME_ROUTE, resume, methods=["POST"]),
+    Route(END_ROUTE, end, methods=["POST"]),
+])
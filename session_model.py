@@ -0,0 +1,127 @@
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class SessionUser:
+    """The two fields of the signed-in Supabase User the app uses, instead of the whole model"""
+
+    __slots__ = ("id", "email")
+
+    def __init__(self, id: str, email: Optional[str]):
+        self.id = id
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user) -> "SessionUser":
+        return user if isinstance(user, cls) else cls(str(user.id), user.email)
+
+    def to_user(self):
+        """A minimal supabase_auth User, for rebuilding an auth Session from stored tokens"""
+        from datetime import datetime, timezone
+        from supabase_auth.types import User
+
+        return User(id=self.id, email=self.email, aud="authenticated", app_metadata={}, user_metadata={},
+                    created_at=datetime.fromtimestamp(0, timezone.utc))
+
+
+class SessionTokens:
+    """Access and refresh token of one login plus the id that resumes it after a reload"""
+
+    __slots__ = ("access_token", "refresh_token", "expires_at", "resume_id", "user")
+
+    def __init__(self, access_token: str, refresh_token: str, expires_at: float, resume_id: str, user: SessionUser):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.resume_id = resume_id
+        self.user = user
+
+
+def deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate bytes held by obj and everything it references (containers, __dict__ and __slots__)"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_size(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += deep_size(getattr(obj, slot), seen)
+    return size
+
+
+def live_sessions() -> List[Tuple[str, Any, bool]]:
+    """(session id, session state, script running) for every session of the Streamlit server in this process"""
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.app_session import AppSessionState
+
+        if not Runtime.exists():
+            return []
+        infos = Runtime.instance()._session_mgr.list_sessions()
+        return [(info.session.id, info.session.session_state, info.session._state == AppSessionState.APP_IS_RUNNING)
+                for info in infos]
+    except Exception:
+        return []  # not under `streamlit run` (AppTest, batch jobs), or the runtime internals moved
+
+
+class SessionMonitor:
+    """Per-session memory report for the admin page; releasing idle sessions' clients is the client pool's job"""
+
+    def __init__(self, sessions: Callable[[], List[Tuple[str, Any, bool]]] = live_sessions):
+        self.sessions = sessions
+        self._lock = threading.Lock()
+        self._last_run: Dict[str, float] = {}
+
+    def touch(self, session_id: str) -> None:
+        """Record a script run in a session"""
+        with self._lock:
+            self._last_run[session_id] = time.monotonic()
+
+    def _forget_closed(self, open_ids: set) -> None:
+        with self._lock:
+            for session_id in [s for s in self._last_run if s not in open_ids]:
+                del self._last_run[session_id]
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Per-session state size, largest first; walks every session's state, so only call it on demand"""
+        now = time.monotonic()
+        live = self.sessions()
+        self._forget_closed({session_id for session_id, _, _ in live})
+        with self._lock:
+            last_run = dict(self._last_run)
+        rows = []
+        for session_id, state, running in live:
+            try:
+                values = dict(state.filtered_state)
+            except Exception:
+                continue
+            sizes = {key: deep_size(value) for key, value in values.items()}
+            largest = max(sizes, key=sizes.get) if sizes else None
+            rows.append({
+                "session": session_id[:8],
+                "idle_seconds": round(now - last_run.get(session_id, now)),
+                "running": running,
+                "keys": len(sizes),
+                "bytes": sum(sizes.values()),
+                "largest_key": largest,
+                "largest_bytes": sizes.get(largest, 0),
+            })
+        rows.sort(key=lambda row: row["bytes"], reverse=True)
+        return rows
+
+    def stats(self) -> Dict[str, float]:
+        """Open and running session counts; cheap enough for every scrape"""
+        live = self.sessions()
+        self._forget_closed({session_id for session_id, _, _ in live})
+        return {"sessions": len(live), "running": sum(1 for _, _, running in live if running)}
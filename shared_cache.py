@@ -0,0 +1,328 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from cache import TTLCache
+from resilience import MAX_STALENESS
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
+# SQLite file shared by every Streamlit worker on the host; unset keeps each cache inside its process
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+# Seconds of change log kept; a worker idle for longer drops its whole first tier when it catches up
+CHANGE_LOG_RETENTION = float(os.getenv("SHARED_CACHE_LOG_RETENTION", "600"))
+# Entries each worker keeps in process per cache; the default matches SUPABASE_POOL_MAX_SIZE, one per session
+LOCAL_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_LOCAL_MAX_ENTRIES", "500"))
+# Seconds between checks for other workers' writes; a lookup within this window trusts the first tier
+SYNC_INTERVAL = float(os.getenv("SHARED_CACHE_SYNC_INTERVAL", "0.05"))
+# Expired rows and old log entries are swept every this many writes
+SWEEP_EVERY = 500
+
+_MISSING = object()
+
+SCHEMA = """
+create table if not exists entries (
+    namespace text not null,
+    key text not null,
+    value text,
+    present integer not null,
+    version integer not null,
+    expires_at real not null,
+    primary key (namespace, key)
+) without rowid;
+create index if not exists entries_expires_at on entries (namespace, expires_at);
+create table if not exists changes (
+    seq integer primary key autoincrement,
+    namespace text not null,
+    key text not null,
+    at real not null
+);
+"""
+
+
+class SharedStore:
+    """Cache entries plus a change log in one SQLite file (WAL mode), shared by the worker processes on a host.
+
+    Every write appends to the change log, and the log sequence number is the
+    entry's version. A worker notices other processes' commits through
+    PRAGMA data_version (at most every SYNC_INTERVAL seconds), reads the log
+    entries it has not seen and drops first-tier copies older than them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.caches: Dict[str, "TieredCache"] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._data_version = 0
+        self._synced_at = 0.0
+        self._last_seq = 0
+        self._writes = 0
+        self.syncs = 0
+
+    def connection(self) -> sqlite3.Connection:
+        """The process's connection, opened on first use and again after a fork (lock held)"""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            conn.executescript(SCHEMA)
+            self._last_seq = conn.execute("select coalesce(max(seq), 0) from changes").fetchone()[0]
+            self._data_version = conn.execute("pragma data_version").fetchone()[0]
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def sync(self) -> None:
+        """Drop first-tier entries that other workers have written since the last check (lock held)"""
+        conn = self.connection()
+        now = time.monotonic()
+        if now - self._synced_at < SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        data_version = conn.execute("pragma data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        self.syncs += 1
+        rows = conn.execute("select seq, namespace, key from changes where seq > ? order by seq",
+                            (self._last_seq,)).fetchall()
+        if rows and rows[0][0] > self._last_seq + 1:
+            # The log was swept past what this worker last saw; it can't tell what changed
+            for cache in self.caches.values():
+                cache.local.clear()
+        for seq, namespace, key in rows:
+            cache = self.caches.get(namespace)
+            if cache is not None:
+                cache._drop_older(key, seq)
+        if rows:
+            self._last_seq = rows[-1][0]
+
+    def stamp(self, namespace: str, key: str) -> int:
+        """Log a write and return its version (lock held, inside a write transaction)"""
+        return self.connection().execute("insert into changes (namespace, key, at) values (?, ?, ?)",
+                                         (namespace, key, time.time())).lastrowid
+
+    def wrote(self) -> None:
+        """Count a write and periodically sweep expired rows and old log entries (lock held)"""
+        self._writes += 1
+        if self._writes % SWEEP_EVERY:
+            return
+        conn = self.connection()
+        now = time.time()
+        for cache in self.caches.values():
+            grace = MAX_STALENESS if cache.keep_stale else 0.0
+            conn.execute("delete from entries where namespace = ? and expires_at < ?", (cache.namespace, now - grace))
+            conn.execute("""
+                delete from entries where namespace = ? and key in (
+                    select key from entries where namespace = ? order by expires_at desc limit -1 offset ?
+                )""", (cache.namespace, cache.namespace, cache.max_entries))
+        conn.execute("delete from changes where at < ?", (now - CHANGE_LOG_RETENTION,))
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+class TieredCache:
+    """In-process TTLCache in front of a namespace of a SharedStore, with the same interface as TTLCache.
+
+    Values are stored in the shared tier as JSON, never pickled, so whoever
+    can write the file can corrupt entries but not run code in the workers.
+    encode and decode convert values that aren't plain JSON data.
+    """
+
+    def __init__(self, store: SharedStore, namespace: str, max_entries: int = 10000, ttl: float = 60.0,
+                 keep_stale: bool = False, encode: Callable[[Any], Any] = _identity,
+                 decode: Callable[[Any], Any] = _identity):
+        self.store = store
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.keep_stale = keep_stale
+        # key -> (value, version); only the keys this worker's sessions use, the shared tier holds the rest
+        self.local = TTLCache(min(max_entries, LOCAL_MAX_ENTRIES), ttl, keep_stale)
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        with store.lock:
+            store.caches[namespace] = self
+
+    def _read(self, key: str):
+        return self.store.connection().execute(
+            "select value, present, version, expires_at from entries where namespace = ? and key = ?",
+            (self.namespace, key)).fetchone()
+
+    def _load(self, row) -> Any:
+        """The row's value, or _MISSING if it isn't valid JSON (e.g. a pickle left by an older release)"""
+        try:
+            return self.decode(json.loads(row[0]))
+        except ValueError:
+            return _MISSING
+
+    def _drop_older(self, key: str, version: int) -> None:
+        if key == "*":
+            self.local.clear()
+            return
+        entry = self.local.get_stale(key)
+        if entry is not None and entry[1] < version:
+            self.local.invalidate(key)
+            self.invalidations += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value from this process, then from the shared tier, or default on a miss"""
+        key = repr(key)
+        with self.store.lock:
+            self.store.sync()
+            entry = self.local.get(key)
+            if entry is not None:
+                return entry[0]
+            row = self._read(key)
+        now = time.time()
+        value = self._load(row) if row is not None and row[1] and row[3] > now else _MISSING
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.local.set(key, (value, row[2]), ttl=row[3] - now)
+        self.shared_hits += 1
+        return value
+
+    def get_stale(self, key: Hashable, default: Any = None, max_stale: float = float("inf")) -> Any:
+        """Return a value even if expired, as long as it expired less than max_stale seconds ago"""
+        entry = self.local.get_stale(repr(key), max_stale=max_stale)
+        if entry is not None:
+            return entry[0]
+        with self.store.lock:
+            row = self._read(repr(key))
+        if row is None or not row[1] or time.time() - row[3] > max_stale:
+            return default
+        value = self._load(row)
+        return default if value is _MISSING else value
+
+    def version(self, key: Hashable) -> int:
+        """Version of the shared entry; pass it to set(if_version=) when filling from a read started now"""
+        with self.store.lock:
+            row = self._read(repr(key))
+        return row[2] if row else 0
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, if_version: Optional[int] = None) -> None:
+        """Store a value for every worker.
+
+        A write stamps a new version, so other workers drop their copies. A fill
+        (if_version given) keeps the version and is skipped when another write
+        happened since the version was read, so a slow read can't overwrite
+        newer data.
+        """
+        key = repr(key)
+        ttl = self.ttl if ttl is None else ttl
+        data = json.dumps(self.encode(value), separators=(",", ":"))
+        expires_at = time.time() + ttl
+        with self.store.lock:
+            conn = self.store.connection()
+            conn.execute("begin immediate")
+            try:
+                if if_version is None:
+                    version = self.store.stamp(self.namespace, key)
+                    conn.execute("""
+                        insert into entries values (?, ?, ?, 1, ?, ?)
+                        on conflict (namespace, key) do update set
+                            value = excluded.value, present = 1, version = excluded.version, expires_at = excluded.expires_at
+                    """, (self.namespace, key, data, version, expires_at))
+                else:
+                    version = if_version
+                    filled = conn.execute("""
+                        insert into entries values (?, ?, ?, 1, ?, ?)
+                        on conflict (namespace, key) do update set
+                            value = excluded.value, present = 1, expires_at = excluded.expires_at
+                        where entries.version = excluded.version
+                    """, (self.namespace, key, data, version, expires_at)).rowcount
+                    if not filled:
+                        conn.execute("rollback")
+                        return
+                self.store.wrote()
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+        self.local.set(key, (value, version), ttl=ttl)
+
+    def replace(self, key: Hashable, value: Any) -> None:
+        """Write a new value for an existing entry without extending its expiry"""
+        with self.store.lock:
+            row = self._read(repr(key))
+        remaining = row[3] - time.time() if row and row[1] else 0
+        if remaining > 0:
+            self.set(key, value, ttl=remaining)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop an entry in every worker"""
+        key = repr(key)
+        with self.store.lock:
+            conn = self.store.connection()
+            conn.execute("begin immediate")
+            try:
+                version = self.store.stamp(self.namespace, key)
+                # A tombstone rather than a delete, so a read that started before it can't fill the old value back in
+                conn.execute("""
+                    insert into entries values (?, ?, null, 0, ?, ?)
+                    on conflict (namespace, key) do update set
+                        value = null, present = 0, version = excluded.version, expires_at = excluded.expires_at
+                """, (self.namespace, key, version, time.time() + self.ttl))
+                self.store.wrote()
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+        self.local.invalidate(key)
+
+    def clear(self) -> None:
+        """Drop every entry of this namespace in every worker"""
+        with self.store.lock:
+            conn = self.store.connection()
+            conn.execute("begin immediate")
+            self.store.stamp(self.namespace, "*")
+            conn.execute("delete from entries where namespace = ?", (self.namespace,))
+            conn.execute("commit")
+        self.local.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for both tiers and their sizes"""
+        local = self.local.stats()
+        with self.store.lock:
+            shared_size = self.store.connection().execute(
+                "select count(*) from entries where namespace = ? and present = 1", (self.namespace,)).fetchone()[0]
+        hits = local["hits"] + self.shared_hits
+        lookups = hits + self.misses
+        return {
+            "size": local["size"],
+            "shared_size": shared_size,
+            "max_entries": self.max_entries,
+            "local_max_entries": self.local.max_entries,
+            "hits": hits,
+            "local_hits": local["hits"],
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": local["evictions"],
+            "invalidations": self.invalidations,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+_stores: Dict[str, SharedStore] = {}
+
+
+def tiered_cache(namespace: str, max_entries: int = 10000, ttl: float = 60.0, keep_stale: bool = False,
+                 encode: Callable[[Any], Any] = _identity,
+                 decode: Callable[[Any], Any] = _identity) -> Union[TTLCache, TieredCache]:
+    """A cache for namespace: shared between workers through SHARED_CACHE_PATH when it is set, else a plain TTLCache"""
+    if not SHARED_CACHE_PATH:
+        return TTLCache(max_entries, ttl, keep_stale)
+    store = _stores.get(SHARED_CACHE_PATH)
+    if store is None:
+        store = _stores[SHARED_CACHE_PATH] = SharedStore(SHARED_CACHE_PATH)
+    return TieredCache(store, namespace, max_entries, ttl, keep_stale, encode, decode)
@@ -1,23 +1,161 @@
 import os
-import streamlit as st
-from supabase import create_client, Client
-from typing import Optional, Dict, Any
+import threading
+import time
+import instrumentation
+import resilience
+from aggregates import population_cache, record_change
+from auth_session import jwt_claims, resume_store, token_expires_at
+from cache import TTLCache
+from shared_cache import tiered_cache
+from instrumentation import instrumented
+from resilience import CircuitOpenError, MAX_STALENESS, note_stale
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Dict, Any, Callable, Iterator
+from history import HISTORY_PAGE_SIZE, Cursor, keyset_filter, mark_stale, trend_cache
+from session_model import SessionMonitor, live_sessions
+from singleflight import SingleFlight
+from questions import HISTORY_COLUMNS, QUESTION_KEYS, RESPONSE_COLUMNS, validate_answers
+from validators import normalize_phone
+from write_behind import WRITE_BEHIND, WriteBehindQueue
+
+# supabase, httpx, streamlit and the in-memory backend are imported where they are
+# first needed, so importing this module stays cheap for Streamlit workers and batch jobs
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
+
+# Per-user cache of the current responses row, shared by every pooled client (and every worker with SHARED_CACHE_PATH)
+response_cache = tiered_cache(
+    "responses",
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+    keep_stale=True,
+)
+_MISSING = object()
+
+# Normalized phone number -> email for phone logins; None marks a number known not to exist
+phone_email_cache = tiered_cache(
+    "phone_email",
+    max_entries=int(os.getenv("PHONE_CACHE_MAX_ENTRIES", "50000")),
+    ttl=float(os.getenv("PHONE_CACHE_TTL", "3600")),
+    keep_stale=True,
+)
+PHONE_CACHE_NEGATIVE_TTL = float(os.getenv("PHONE_CACHE_NEGATIVE_TTL", "30"))
+
+# Concurrent identical reads across all pooled clients share one in-flight request
+read_flights = SingleFlight()
+
+# Results of recent form submissions by idempotency key, so a rerun or double submit replays the first result
+submission_cache = TTLCache(
+    max_entries=int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("IDEMPOTENCY_TTL", "600")),
+)
+submission_flights = SingleFlight()
+
+# Seconds each step of the async registration pipeline may take
+REGISTRATION_STEP_TIMEOUT = float(os.getenv("REGISTRATION_STEP_TIMEOUT", "10"))
+ASYNC_REGISTRATION = os.getenv("SUPABASE_ASYNC_REGISTRATION", "1") != "0"
+
+# Set when the project's Auth settings require the current password on password changes;
+# update_password then sends it with the update instead of verifying it with a separate sign-in
+SERVER_PASSWORD_CHECK = os.getenv("SUPABASE_SERVER_PASSWORD_CHECK", "0") == "1"
+CURRENT_PASSWORD_ERROR = "Current password is incorrect"
+
+
+def memory_backend() -> bool:
+    """Whether SUPABASE_BACKEND selects the in-memory backend (fake_supabase.is_enabled without the import)"""
+    return os.getenv("SUPABASE_BACKEND", "supabase").lower() == "memory"
+
+
+def _secret(name: str) -> Optional[str]:
+    """Read a setting from the environment, then from Streamlit secrets"""
+    value = os.getenv(name)
+    if value:
+        return value
+    import streamlit as st
+    try:
+        return st.secrets.get(name)
+    except Exception:
+        return None  # no secrets.toml outside a Streamlit app
+
+
+def _credentials(url: Optional[str] = None, key: Optional[str] = None):
+    """Supabase URL and anon key; stops the Streamlit script when they are missing"""
+    url = url or _secret("SUPABASE_URL")
+    key = key or _secret("SUPABASE_ANON_KEY")
+    if not url or not key:
+        import streamlit as st
+        st.error("Supabase credentials not found. Please check your environment variables or secrets.")
+        st.stop()
+    return url, key
+
 
 class SupabaseClient:
-    def __init__(self):
-        self.url = os.getenv("SUPABASE_URL") or st.secrets.get("SUPABASE_URL")
-        self.key = os.getenv("SUPABASE_ANON_KEY") or st.secrets.get("SUPABASE_ANON_KEY")
+    # Cleared process-wide the first time the server reports the RPC is missing
+    use_update_rpc = os.getenv("SUPABASE_USE_UPDATE_RPC", "1") != "0"
+    # Cleared the first time the server turns out not to have migration 0007
+    use_unique_responses = True
+    use_submission_ids = True
 
-        if not self.url or not self.key:
-            st.error("Supabase credentials not found. Please check your environment variables or secrets.")
-            st.stop()
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, http_client: Optional["httpx.Client"] = None,
+                 http_client_factory: Optional[Callable[[], "httpx.Client"]] = None):
+        if memory_backend():
+            # Offline in-memory backend (SUPABASE_BACKEND=memory), no credentials needed
+            self.url, self.key = url, key
+        else:
+            self.url, self.key = _credentials(url, key)
+        self.http_client = http_client
+        self.http_client_factory = http_client_factory
+        self._client: Optional["Client"] = None
 
-        self.client: Client = create_client(self.url, self.key)
+    @property
+    def client(self) -> "Client":
+        """The underlying supabase-py client, created on first use"""
+        if self._client is None:
+            if memory_backend():
+                import fake_supabase
+                self._client = fake_supabase.create_client()
+            else:
+                from supabase import create_client
+                from supabase.lib.client_options import SyncClientOptions
+
+                # Share the caller's keep-alive connection pool instead of opening one per client
+                http_client = self.http_client or (self.http_client_factory() if self.http_client_factory else None)
+                # auth_session.TokenManager owns the tokens: a refresh here would rotate the refresh token behind its back
+                options = SyncClientOptions(httpx_client=http_client, auto_refresh_token=False, persist_session=False)
+                self._client = create_client(self.url, self.key, options=options)
+        return self._client
+
+    def held_session(self):
+        """The session this client holds, read locally; auth.get_session() would refresh it near expiry"""
+        if self._client is None:
+            return None
+        return getattr(self.client.auth, "_in_memory_session", None)
+
+    def access_token(self) -> Optional[str]:
+        """Access token of the session this client holds, read locally"""
+        session = self.held_session()
+        return session.access_token if session else None
+
+    def _caller(self) -> Optional[str]:
+        """User id the client's requests run as (None for anon), so coalescing never crosses RLS boundaries"""
+        token = self.access_token()
+        return jwt_claims(token).get("sub") if token else None
+
+    def close(self) -> None:
+        """Drop the local auth session without touching the shared HTTP pool"""
+        if self._client is None:
+            return
+        try:
+            self.client.auth._remove_session()
+        except Exception:
+            pass
 
+    @instrumented("auth")
     def register_user(self, email: str, phone: str, password: str) -> Dict[str, Any]:
         """Register a new user with email, phone and password"""
         try:
-            response = self.client.auth.sign_up({
+            response = resilience.call("auth", lambda: self.client.auth.sign_up({
                 "email": email,
                 "password": password,
                 "options": {
@@ -25,41 +163,91 @@ class SupabaseClient:
                         "phone_number": phone
                     }
                 }
-            })
+            }))
 
-            # Sign in immediately after registration (since email confirmation is disabled)
-            if response.user:
-                sign_in_response = self.client.auth.sign_in_with_password({
+            # With email confirmation disabled sign_up already returns a session; only sign in if it didn't
+            if response.user and response.session is None:
+                sign_in_response = resilience.call("auth", lambda: self.client.auth.sign_in_with_password({
                     "email": email,
                     "password": password
-                })
+                }))
                 return {"success": True, "user": sign_in_response.user, "session": sign_in_response.session}
 
-            return {"success": True, "user": response.user}
+            return {"success": True, "user": response.user, "session": response.session}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    @instrumented("registration")
+    def register_user_with_responses(self, email: str, phone: str, password: str, responses: Dict[str, Any],
+                                     idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Register a new user, then create the profile and save responses concurrently"""
+        return self._once("registration", idempotency_key,
+                          lambda: self._register_user_with_responses(email, phone, password, responses))
+
+    def _register_user_with_responses(self, email: str, phone: str, password: str, responses: Dict[str, Any]) -> Dict[str, Any]:
+        error = validate_answers(responses)
+        if error:
+            return {"success": False, "step": None, "error": error}
+        from async_registration import register_and_submit_sync
+
+        phone = normalize_phone(phone)
+        # In write-behind mode the responses row is queued once the user exists instead of inserted inline
+        queue_responses = write_behind_queue is not None
+        result = register_and_submit_sync(
+            self.url, self.key, email, phone, password, None if queue_responses else responses,
+            step_timeout=REGISTRATION_STEP_TIMEOUT,
+            create=_async_client_factory(),
+        )
+        if result.get("session"):
+            self.adopt_session(result["session"])
+        if result.get("responses"):
+            response_cache.set(result["user"].id, result["responses"][0])
+            record_change(None, responses)
+        if result.get("user") and "create_user_profile" not in result.get("errors", {}):
+            phone_email_cache.set(phone, email)
+        if queue_responses and result.get("success"):
+            saved = self.save_responses(result["user"].id, responses)
+            if not saved["success"]:
+                result["errors"]["save_responses"] = saved["error"]
+                result.update(success=False, step="save_responses", error=saved["error"])
+        return result
+
+    def adopt_session(self, session) -> None:
+        """Install a session obtained elsewhere without another auth round trip"""
+        # set_session() would re-fetch the user over the network
+        self.client.auth._save_session(session)
+        self.client.auth._notify_all_subscribers("SIGNED_IN", session)
+
+    @instrumented("auth")
+    def refresh_session(self, refresh_token: str) -> Dict[str, Any]:
+        """Exchange a refresh token for a new session and install it on this client"""
+        try:
+            response = resilience.call("auth", lambda: self.client.auth.refresh_session(refresh_token))
+            return {"success": True, "user": response.user, "session": response.session}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    @instrumented("auth")
     def sign_in_user(self, email_or_phone: str, password: str) -> Dict[str, Any]:
         """Sign in existing user with email or phone"""
         try:
             # If it looks like an email, use it directly
             if "@" in email_or_phone:
-                response = self.client.auth.sign_in_with_password({
+                response = resilience.call("auth", lambda: self.client.auth.sign_in_with_password({
                     "email": email_or_phone,
                     "password": password
-                })
+                }))
                 return {"success": True, "user": response.user, "session": response.session}
             else:
                 # For phone number login, look up the email in user_profiles
                 try:
-                    phone_query = self.client.table("user_profiles").select("email").eq("phone_number", email_or_phone).execute()
+                    user_email = self.lookup_email_by_phone(email_or_phone)
 
-                    if phone_query.data and len(phone_query.data) > 0:
-                        user_email = phone_query.data[0]["email"]
-                        response = self.client.auth.sign_in_with_password({
+                    if user_email:
+                        response = resilience.call("auth", lambda: self.client.auth.sign_in_with_password({
                             "email": user_email,
                             "password": password
-                        })
+                        }))
                         return {"success": True, "user": response.user, "session": response.session}
                     else:
                         return {"success": False, "error": "Phone number not found. Please register as a new user or use your email address."}
@@ -70,85 +258,612 @@ class SupabaseClient:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def lookup_email_by_phone(self, phone: str) -> Optional[str]:
+        """Resolve a phone number to its account email, cached by normalized number"""
+        phone = normalize_phone(phone)
+        cached = phone_email_cache.get(phone, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        try:
+            return read_flights.do(("phone", self._caller(), phone), lambda: self._fetch_email_by_phone(phone))
+        except Exception as e:
+            if not (isinstance(e, CircuitOpenError) or resilience.is_transient(e)):
+                raise
+            # user_profiles is failing; a number that resolved before still signs in
+            stale = phone_email_cache.get_stale(phone, max_stale=MAX_STALENESS)
+            if stale is None:
+                raise
+            note_stale()
+            return stale
+
+    def _fetch_email_by_phone(self, phone: str) -> Optional[str]:
+        version = phone_email_cache.version(phone)
+        query = self.client.table("user_profiles").select("email").eq("phone_number", phone)
+        phone_query = resilience.call("user_profiles", query.execute, retry=True)
+        if phone_query.data:
+            email = phone_query.data[0]["email"]
+            phone_email_cache.set(phone, email, if_version=version)
+            return email
+
+        # Remember misses briefly so repeated attempts with an unknown number stay cheap
+        phone_email_cache.set(phone, None, ttl=PHONE_CACHE_NEGATIVE_TTL, if_version=version)
+        return None
+
+    @instrumented("auth")
     def sign_out(self) -> Dict[str, Any]:
         """Sign out current user"""
         try:
-            self.client.auth.sign_out()
+            resilience.call("auth", self.client.auth.sign_out)
             return {"success": True}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def update_password(self, new_password: str) -> Dict[str, Any]:
-        """Update current user's password"""
+    @instrumented("auth")
+    def update_password(self, new_password: str, current_password: Optional[str] = None) -> Dict[str, Any]:
+        """Update current user's password, checking current_password first when given"""
+        session = None
         try:
-            response = self.client.auth.update_user({
-                "password": new_password
-            })
-            return {"success": True, "user": response.user}
+            if current_password is not None and not SERVER_PASSWORD_CHECK:
+                # Verify with a password grant for the signed-in email; its fresh session replaces the old one
+                user = self.get_current_user()
+                try:
+                    verified = resilience.call("auth", lambda: self.client.auth.sign_in_with_password({
+                        "email": user.email if user else "",
+                        "password": current_password
+                    }))
+                except Exception as e:
+                    if isinstance(e, CircuitOpenError) or resilience.is_transient(e):
+                        raise  # auth is down, not a wrong password
+                    return {"success": False, "error": CURRENT_PASSWORD_ERROR}
+                session = verified.session
+
+            attributes = {"password": new_password}
+            if current_password is not None and SERVER_PASSWORD_CHECK:
+                # Supabase Auth checks it as part of the same request
+                attributes["current_password"] = current_password
+            response = resilience.call("auth", lambda: self.client.auth.update_user(attributes))
+            return {"success": True, "user": response.user, "session": session}
         except Exception as e:
+            if getattr(e, "code", None) in ("current_password_mismatch", "current_password_required"):
+                return {"success": False, "error": CURRENT_PASSWORD_ERROR}
             return {"success": False, "error": str(e)}
 
+    @instrumented("auth")
     def get_current_user(self) -> Optional[Dict[str, Any]]:
-        """Get currently authenticated user"""
+        """Get currently authenticated user, from the local session while its token is valid"""
+        if self._client is None:
+            return None
         try:
-            user = self.client.auth.get_user()
+            session = self.held_session()
+            if session is None:
+                return None
+            if token_expires_at(session.access_token) > time.time() and session.user:
+                return session.user
+            user = resilience.call("auth", self.client.auth.get_user, retry=True)
             return user.user if user.user else None
         except:
             return None
 
+    @instrumented("user_profiles")
     def create_user_profile(self, user_id: str, phone_number: str, email: str) -> Dict[str, Any]:
         """Create user profile record"""
         try:
-            response = self.client.table("user_profiles").insert({
+            phone_number = normalize_phone(phone_number)
+            response = resilience.call("user_profiles", self.client.table("user_profiles").insert({
                 "id": user_id,
                 "phone_number": phone_number,
                 "email": email
-            }).execute()
+            }).execute)
+            phone_email_cache.set(phone_number, email)
             return {"success": True, "data": response.data}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def save_responses(self, user_id: str, responses: Dict[str, Any]) -> Dict[str, Any]:
+    @instrumented("responses")
+    def save_responses(self, user_id: str, responses: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """Save user responses"""
+        return self._once("save_responses", idempotency_key, lambda: self._save_responses(user_id, responses, idempotency_key))
+
+    def _save_responses(self, user_id: str, responses: Dict[str, Any], submission_id: Optional[str]) -> Dict[str, Any]:
+        error = validate_answers(responses)
+        if error:
+            return {"success": False, "error": error}
+        # A read already in flight predates this write; later readers must not join it
+        read_flights.forget(("responses", self._caller(), user_id))
+        if write_behind_queue is not None and write_behind_queue.submit("save", user_id, responses, submission_id):
+            record_change(None, responses)
+            return {"success": True, "data": [{"user_id": user_id, **responses}], "queued": True}
+        from postgrest.exceptions import APIError
+
         try:
             response_data = {
                 "user_id": user_id,
                 **responses
             }
-            response = self.client.table("responses").insert(response_data).execute()
+            try:
+                # A repeat of a save that already landed hits the unique user_id index and writes nothing
+                query = self.client.table("responses")
+                if SupabaseClient.use_unique_responses:
+                    response = resilience.call("responses", query.upsert(response_data, on_conflict="user_id", ignore_duplicates=True).execute)
+                else:
+                    response = resilience.call("responses", query.insert(response_data).execute)
+            except APIError as e:
+                # 42P10: no unique index on responses.user_id yet (migration 0007), remember and insert
+                if e.code != "42P10":
+                    raise
+                SupabaseClient.use_unique_responses = False
+                response = resilience.call("responses", self.client.table("responses").insert(response_data).execute)
+            if response.data:
+                response_cache.set(user_id, response.data[0])
+                record_change(None, responses)
+            else:
+                response_cache.invalidate(user_id)
+                return {"success": True, "data": [], "duplicate": True}
             return {"success": True, "data": response.data}
         except Exception as e:
+            response_cache.invalidate(user_id)
             return {"success": False, "error": str(e)}
 
-    def get_user_responses(self, user_id: str) -> Dict[str, Any]:
+    @instrumented("responses")
+    def get_user_responses(self, user_id: str, use_cache: bool = True) -> Dict[str, Any]:
         """Get user's current responses"""
+        # Answers still waiting in the write-behind queue are newer than anything stored
+        pending = write_behind_queue.pending(user_id) if write_behind_queue is not None else None
+        if pending is not None:
+            return {"success": True, "data": {**(response_cache.get(user_id) or {"user_id": user_id}), **pending}}
+        if use_cache:
+            cached = response_cache.get(user_id, _MISSING)
+            if cached is not _MISSING:
+                return {"success": True, "data": cached}
         try:
-            response = self.client.table("responses").select("*").eq("user_id", user_id).execute()
-            return {"success": True, "data": response.data[0] if response.data else None}
+            # Identical reads already in flight (double clicks, quick reruns, other tabs) share one request
+            data = read_flights.do(("responses", self._caller(), user_id), lambda: self._fetch_responses(user_id))
+            return {"success": True, "data": data}
         except Exception as e:
+            if use_cache and (isinstance(e, CircuitOpenError) or resilience.is_transient(e)):
+                # Better the last answers we saw than an error page while responses is down
+                stale = response_cache.get_stale(user_id, _MISSING, max_stale=MAX_STALENESS)
+                if stale is not _MISSING:
+                    note_stale()
+                    return {"success": True, "data": stale, "stale": True}
             return {"success": False, "error": str(e)}
 
-    def update_responses(self, user_id: str, responses: Dict[str, Any]) -> Dict[str, Any]:
+    def _fetch_responses(self, user_id: str) -> Optional[Dict[str, Any]]:
+        # A save landing while this read is in flight wins over its result (in every worker with the shared tier)
+        version = response_cache.version(user_id)
+        query = self.client.table("responses").select(RESPONSE_COLUMNS).eq("user_id", user_id)
+        response = resilience.call("responses", query.execute, retry=True)
+        data = response.data[0] if response.data else None
+        response_cache.set(user_id, data, if_version=version)
+        return data
+
+    @instrumented("response_aggregates")
+    def get_response_aggregates(self) -> Dict[str, Any]:
+        """Get population-wide answer counts (migrations/0004_response_aggregates.sql)"""
+        try:
+            # The same for every caller (security definer), so no caller in the key
+            data = read_flights.do(("response_aggregates",), lambda: resilience.call(
+                "rpc:get_response_aggregates", self.client.rpc("get_response_aggregates", {}).execute, retry=True).data)
+            return {"success": True, "data": data}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    @instrumented("response_aggregates")
+    def refresh_response_aggregates(self) -> Dict[str, Any]:
+        """Repair: rebuild the population counts with a full scan of responses; needs a service role key"""
+        try:
+            response = resilience.call("rpc:refresh_response_aggregates", self.client.rpc("refresh_response_aggregates", {}).execute)
+            return {"success": True, "data": response.data}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    @instrumented("response_history")
+    def get_response_history_page(self, user_id: str, after: Optional[Cursor] = None,
+                                  limit: int = HISTORY_PAGE_SIZE) -> Dict[str, Any]:
+        """Get up to limit history rows ordered by (valid_to, id), starting after the given cursor"""
+        try:
+            query = self.client.table("response_history").select(HISTORY_COLUMNS).eq("user_id", user_id)
+            if after is not None:
+                query = query.or_(keyset_filter(after))
+            response = resilience.call("response_history", query.order("valid_to").order("id").limit(limit).execute, retry=True)
+            return {"success": True, "data": response.data}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def iter_response_history(self, user_id: str, after: Optional[Cursor] = None,
+                              page_size: int = HISTORY_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """Stream a user's history one keyset page at a time; stops after a failed or short page"""
+        while True:
+            page = self.get_response_history_page(user_id, after, page_size)
+            yield page
+            if not page["success"] or len(page["data"]) < page_size:
+                return
+            last = page["data"][-1]
+            after = (last["valid_to"], last["id"])
+
+    @instrumented("responses")
+    def update_responses(self, user_id: str, responses: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """Update user responses and create history record"""
+        return self._once("update_responses", idempotency_key, lambda: self._update_responses(user_id, responses, idempotency_key))
+
+    def _update_responses(self, user_id: str, responses: Dict[str, Any], submission_id: Optional[str]) -> Dict[str, Any]:
+        error = validate_answers(responses)
+        if error:
+            return {"success": False, "error": error}
+        read_flights.forget(("responses", self._caller(), user_id))
+        # Previous answers, if known locally, let the population stats move this user without a refetch
+        pending = write_behind_queue.pending(user_id) if write_behind_queue is not None else None
+        previous = pending or response_cache.get(user_id)
+        if write_behind_queue is not None:
+            if write_behind_queue.submit("update", user_id, responses, submission_id):
+                if previous:
+                    record_change(previous, responses)
+                return {"success": True, "data": [{**previous, **responses} if previous else {"user_id": user_id, **responses}], "queued": True}
+            if pending is not None:
+                # Writing now would land before the user's queued edit and be overwritten by it
+                return {"success": False, "error": "We're saving a lot of answers right now. Please try again in a moment."}
+        from postgrest.exceptions import APIError
+
+        if SupabaseClient.use_update_rpc:
+            try:
+                return self._update_responses_rpc(user_id, responses, previous, submission_id)
+            except APIError as e:
+                # PGRST202: the migration has not been applied, remember and fall back
+                if e.code != "PGRST202":
+                    response_cache.invalidate(user_id)
+                    return {"success": False, "error": str(e)}
+                SupabaseClient.use_update_rpc = False
+            except Exception as e:
+                response_cache.invalidate(user_id)
+                return {"success": False, "error": str(e)}
+        return self._update_responses_fallback(user_id, responses)
+
+    def _update_responses_rpc(self, user_id: str, responses: Dict[str, Any],
+                              previous: Optional[Dict[str, Any]] = None, submission_id: Optional[str] = None) -> Dict[str, Any]:
+        """Snapshot and update in one round trip (migrations/0001_update_responses_with_history.sql)"""
+        from postgrest.exceptions import APIError
+
+        params = {
+            "p_user_id": user_id,
+            "p_responses": responses
+        }
+        if submission_id is not None and SupabaseClient.use_submission_ids:
+            # Migration 0007: a submission that already ran returns the row without a second history entry
+            try:
+                response = resilience.call("rpc:update_responses_with_history", self.client.rpc(
+                    "update_responses_with_history", {**params, "p_submission_id": submission_id}).execute)
+            except APIError as e:
+                # PGRST202: only the two-argument form from migration 0001 exists, remember and retry with it
+                if e.code != "PGRST202":
+                    raise
+                SupabaseClient.use_submission_ids = False
+                response = resilience.call("rpc:update_responses_with_history", self.client.rpc("update_responses_with_history", params).execute)
+        else:
+            response = resilience.call("rpc:update_responses_with_history", self.client.rpc("update_responses_with_history", params).execute)
+        mark_stale(user_id)
+        if response.data:
+            response_cache.set(user_id, response.data[0])
+            if previous:
+                # The returned row, not the request: a repeated submission leaves the answers unchanged
+                record_change(previous, response.data[0])
+        else:
+            response_cache.invalidate(user_id)
+        return {"success": True, "data": response.data}
+
+    def _update_responses_fallback(self, user_id: str, responses: Dict[str, Any]) -> Dict[str, Any]:
+        """Update responses with three round trips when the RPC is unavailable"""
         try:
-            # First get current responses for history
-            current = self.get_user_responses(user_id)
+            # First get current responses for history (always from the database, it is the snapshot)
+            current = self.get_user_responses(user_id, use_cache=False)
             if current["success"] and current["data"]:
                 # Create history record
                 history_data = {
                     "user_id": user_id,
                     "response_id": current["data"]["id"],
-                    **{k: v for k, v in current["data"].items() if k.startswith(('h', 'w', 'p', 'f'))},
+                    **{key: current["data"][key] for key in QUESTION_KEYS},
                     "valid_to": "NOW()",
                     "is_current": False
                 }
-                self.client.table("response_history").insert(history_data).execute()
+                resilience.call("response_history", self.client.table("response_history").insert(history_data).execute)
+                mark_stale(user_id)
 
             # Update current responses
-            response = self.client.table("responses").update(responses).eq("user_id", user_id).execute()
+            response = resilience.call("responses", self.client.table("responses").update(responses).eq("user_id", user_id).execute)
+            if response.data:
+                response_cache.set(user_id, response.data[0])
+                if current["success"] and current["data"]:
+                    record_change(current["data"], responses)
+            else:
+                response_cache.invalidate(user_id)
             return {"success": True, "data": response.data}
         except Exception as e:
+            response_cache.invalidate(user_id)
             return {"success": False, "error": str(e)}
 
-# Global instance
-supabase_client = SupabaseClient()
\ No newline at end of file
+    def _once(self, operation: str, idempotency_key: Optional[str], write: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Run a write once per idempotency key: a repeat gets the first successful result back, marked duplicate"""
+        if idempotency_key is None:
+            return write()
+        key = (operation, idempotency_key)
+        done = submission_cache.get(key)
+        if done is not None:
+            return {**done, "duplicate": True}
+
+        def first() -> Dict[str, Any]:
+            result = write()
+            if result.get("success"):
+                submission_cache.set(key, result)
+            return result
+        # A double submit racing the first one waits for it instead of writing again
+        return submission_flights.do(key, first)
+
+def _async_client_factory():
+    """acreate_client for the async registration pipeline, from the selected backend"""
+    if memory_backend():
+        import fake_supabase
+        return fake_supabase.acreate_client
+    from supabase import acreate_client
+    return acreate_client
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no client could be leased before the acquire timeout"""
+
+
+class SupabaseClientPool:
+    """Bounded pool of per-session Supabase clients sharing one HTTP connection pool"""
+
+    def __init__(self, max_size: int = 500, idle_timeout: float = 1800.0, acquire_timeout: float = 10.0,
+                 max_connections: int = 100, max_keepalive_connections: int = 20, min_idle: float = 60.0,
+                 open_sessions: Optional[Callable[[], Optional[set]]] = None):
+        self.url, self.key = (None, None) if memory_backend() else _credentials()
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        # When full, the least recently used lease unused for this long is taken over instead of waiting
+        self.min_idle = min_idle
+        # Ids of the sessions still open, or None when that can't be told; leases of closed ones are reclaimed
+        self.open_sessions = open_sessions or _open_session_ids
+        self.acquire_timeout = acquire_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self._http_client: Optional["httpx.Client"] = None
+
+        # session_id -> (client, last_used), least recently used first
+        self._leases: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "evicted": 0,
+            "reclaimed": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def get_http_client(self) -> "httpx.Client":
+        """The keep-alive connection pool shared by every leased client, opened on first request"""
+        with self._lock:
+            if self._http_client is None:
+                import httpx
+
+                self._http_client = httpx.Client(
+                    http2=True,
+                    follow_redirects=True,
+                    # The deadline hook caps each request's timeouts at what is left of its call's budget
+                    timeout=resilience.CALL_DEADLINE,
+                    event_hooks={"request": [instrumentation.httpx_request_hook, resilience.httpx_deadline_hook]},
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                    ),
+                )
+            return self._http_client
+
+    def acquire(self, session_id: str) -> SupabaseClient:
+        """Return the client leased to a session, creating it lazily"""
+        start = time.monotonic()
+        waited = False
+        with self._lock:
+            while True:
+                lease = self._leases.get(session_id)
+                if lease is not None and lease[0] is not None:
+                    lease[1] = time.monotonic()
+                    self._leases.move_to_end(session_id)
+                    break
+
+                if lease is None:
+                    self._evict_idle()
+                    if len(self._leases) >= self.max_size:
+                        self._reclaim()
+                    if len(self._leases) < self.max_size:
+                        # Reserve the slot, then build the client outside the lock
+                        self._leases[session_id] = [None, time.monotonic()]
+                        break
+
+                remaining = self.acquire_timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolExhaustedError(f"No Supabase client available after {self.acquire_timeout:.1f}s")
+                waited = True
+                self._lock.wait(timeout=min(remaining, 1.0))
+
+            if waited:
+                elapsed = time.monotonic() - start
+                self._stats["waits"] += 1
+                self._stats["wait_seconds_total"] += elapsed
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], elapsed)
+
+            if lease is not None:
+                return lease[0]
+
+        try:
+            client = SupabaseClient(self.url, self.key, http_client_factory=self.get_http_client)
+        except BaseException:
+            with self._lock:
+                self._leases.pop(session_id, None)
+                self._lock.notify_all()
+            raise
+
+        with self._lock:
+            self._leases[session_id][0] = client
+            self._stats["created"] += 1
+            self._lock.notify_all()
+        return client
+
+    def release(self, session_id: str) -> None:
+        """Return a session's client to the pool and wake up any waiters"""
+        with self._lock:
+            lease = self._leases.pop(session_id, None)
+            if lease is not None and lease[0] is not None:
+                lease[0].close()
+            self._lock.notify_all()
+
+    def _evict_idle(self) -> None:
+        """Evict leases that have not been used within the idle timeout (lock held)"""
+        cutoff = time.monotonic() - self.idle_timeout
+        for session_id, lease in list(self._leases.items()):
+            if lease[1] > cutoff:
+                break
+            if lease[0] is None:
+                continue
+            del self._leases[session_id]
+            lease[0].close()
+            self._stats["evicted"] += 1
+            self._lock.notify_all()
+
+    def _reclaim(self) -> None:
+        """Free one slot of a full pool: a lease of a closed session, else the least recently used idle one (lock held)"""
+        open_ids = self.open_sessions()
+        if open_ids is not None:
+            for session_id, lease in list(self._leases.items()):
+                if lease[0] is not None and session_id not in open_ids:
+                    del self._leases[session_id]
+                    lease[0].close()
+                    self._stats["reclaimed"] += 1
+            if len(self._leases) < self.max_size:
+                return
+        cutoff = time.monotonic() - self.min_idle
+        for session_id, lease in self._leases.items():
+            if lease[1] > cutoff:
+                break  # the rest were used more recently and may be mid-run
+            if lease[0] is not None:
+                del self._leases[session_id]
+                lease[0].close()
+                self._stats["reclaimed"] += 1
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size and wait-time metrics"""
+        with self._lock:
+            self._evict_idle()
+            return {
+                "size": len(self._leases),
+                "max_size": self.max_size,
+                **self._stats,
+            }
+
+
+def _open_session_ids() -> Optional[set]:
+    """Ids of the Streamlit server's open sessions, or None outside `streamlit run`"""
+    sessions = live_sessions()
+    return {session_id for session_id, _, _ in sessions} if sessions else None
+
+
+def current_session_id() -> str:
+    """Identify the Streamlit session running this script"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "default"
+
+
+def get_session_client() -> SupabaseClient:
+    """Lease the Supabase client for the current Streamlit session"""
+    return get_client_pool().acquire(current_session_id())
+
+
+# Process-wide pool, built by the first get_client_pool() call
+_client_pool: Optional[SupabaseClientPool] = None
+_client_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> SupabaseClientPool:
+    """The process-wide client pool, created on first use"""
+    global _client_pool
+    if _client_pool is None:
+        with _client_pool_lock:
+            if _client_pool is None:
+                _client_pool = SupabaseClientPool(
+                    max_size=int(os.getenv("SUPABASE_POOL_MAX_SIZE", "500")),
+                    idle_timeout=float(os.getenv("SUPABASE_POOL_IDLE_TIMEOUT", "1800")),
+                    acquire_timeout=float(os.getenv("SUPABASE_POOL_ACQUIRE_TIMEOUT", "10")),
+                    min_idle=float(os.getenv("SUPABASE_POOL_MIN_IDLE", "60")),
+                )
+    return _client_pool
+
+
+def _client_pool_stats() -> Dict[str, Any]:
+    """Pool metrics for scrapes, without creating the pool just to report on it"""
+    return _client_pool.stats() if _client_pool is not None else {}
+
+
+# Session counts for scrapes and the per-session memory report; the pool alone releases clients
+session_monitor = SessionMonitor()
+
+
+def _write_behind_client():
+    """Client for the write-behind worker, which writes for many users and so uses the service role key"""
+    if memory_backend():
+        import fake_supabase
+        return fake_supabase.create_client()
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+
+    pool = get_client_pool()
+    return create_client(pool.url, _secret("SUPABASE_SERVICE_ROLE_KEY"), options=SyncClientOptions(httpx_client=pool.get_http_client()))
+
+
+def _on_write_behind_flushed(kind: str, row: Dict[str, Any]) -> None:
+    """Keep the per-user caches in step with rows the write-behind worker has written"""
+    response_cache.set(str(row["user_id"]), row)
+    if kind == "update":
+        mark_stale(str(row["user_id"]))
+
+
+write_behind_queue = WriteBehindQueue(
+    _write_behind_client,
+    max_size=int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "1000")),
+    batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100")),
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5")),
+    enqueue_timeout=float(os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT", "2")),
+    spool_path=os.getenv("WRITE_BEHIND_SPOOL", ".write_behind.jsonl"),
+    on_flushed=_on_write_behind_flushed,
+) if WRITE_BEHIND else None
+
+instrumentation.registry.gauge(
+    "wellness_client_pool", "Per-session client pool size and wait metrics", "stat", _client_pool_stats)
+instrumentation.registry.gauge(
+    "wellness_response_cache", "get_user_responses cache size and hit/miss counters", "stat", response_cache.stats)
+instrumentation.registry.gauge(
+    "wellness_phone_cache", "Phone-to-email lookup cache size and hit/miss counters", "stat", phone_email_cache.stats)
+instrumentation.registry.gauge(
+    "wellness_population_cache", "Population aggregate snapshot cache hit/miss counters", "stat", population_cache.stats)
+instrumentation.registry.gauge(
+    "wellness_read_coalescing", "Reads issued vs reads that shared an identical in-flight request", "stat", read_flights.stats)
+instrumentation.registry.gauge(
+    "wellness_idempotency", "Form submissions replayed from the dedupe cache (hits) vs written (misses)", "stat", submission_cache.stats)
+instrumentation.registry.gauge(
+    "wellness_auth_resume", "Resumable browser sessions (?sid) held for reloads", "stat", resume_store.stats)
+instrumentation.registry.gauge(
+    "wellness_trend_cache", "Per-user history trend cache size and hit/miss counters", "stat", trend_cache.stats)
+instrumentation.registry.gauge(
+    "wellness_sessions", "Open and running Streamlit sessions", "stat", session_monitor.stats)
+instrumentation.registry.gauge(
+    "wellness_resilience", "Supabase call retries, timeouts, fast failures and stale reads served", "stat", resilience.stats)
+instrumentation.registry.gauge(
+    "wellness_circuit_state", "Circuit breaker state per endpoint (0 closed, 1 half-open, 2 open)", "endpoint",
+    resilience.breaker_states)
+if write_behind_queue is not None:
+    instrumentation.registry.gauge(
+        "wellness_write_behind", "Write-behind queue depth and flush counters", "stat", write_behind_queue.stats)
\ No newline at end of file
@@ -0,0 +1,20 @@
+import re
+
+PHONE_PATTERN = r'^\+?1?[2-9]\d{2}[2-9]\d{2}\d{4}$'
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+def normalize_phone(phone):
+    """Strip the separators users type so every phone number has one stored form"""
+    return phone.replace('-', '').replace(' ', '').replace('(', '').replace(')', '')
+
+def validate_phone(phone):
+    """Basic phone number validation"""
+    return re.match(PHONE_PATTERN, normalize_phone(phone))
+
+def validate_email(email):
+    """Basic email validation"""
+    return re.match(EMAIL_PATTERN, email)
+
+def validate_password(password):
+    """Basic password validation"""
+    return len(password) >= 8
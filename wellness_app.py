@@ -1,6 +1,18 @@
+import hmac
+import json
+import uuid
 import streamlit as st
-from supabase_client import supabase_client
-import re
+import instrumentation
+import resilience
+from admission import Throttled, auth_admission, client_address, forwarding_misconfigured, submit_admission
+from instrumentation import timed_page
+from supabase_client import ASYNC_REGISTRATION, CURRENT_PASSWORD_ERROR, PoolExhaustedError, _secret, current_session_id, get_client_pool, get_session_client, read_flights, response_cache, session_monitor, write_behind_queue
+from aggregates import load_population
+from auth_session import END_KEY, END_ROUTE, RESUME_COOKIE, RESUME_ROUTE, TokenManager
+from history import load_trends
+from questions import QUESTION_KEYS, SECTIONS, answers, dashboard_columns, format_answer, pack_answers, unpack_answers
+from session_model import SessionUser
+from validators import normalize_phone, validate_email, validate_password, validate_phone
 
 # Configure Streamlit page
 st.set_page_config(
@@ -10,6 +22,15 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Each browser session leases its own client so auth state is never shared
+try:
+    supabase_client = get_session_client()
+except PoolExhaustedError:
+    st.error("We're busy right now. Please try again in a moment.")
+    st.stop()
+# Its access/refresh tokens live in session state so they outlive the pooled client
+auth_tokens = TokenManager(st.session_state)
+
 def initialize_session_state():
     """Initialize session state variables"""
     if "authenticated" not in st.session_state:
@@ -19,152 +40,133 @@ def initialize_session_state():
     if "page" not in st.session_state:
         st.session_state.page = "questionnaire"
     if "responses" not in st.session_state:
-        st.session_state.responses = {}
-
-def validate_phone(phone):
-    """Basic phone number validation"""
-    phone_pattern = r'^\+?1?[2-9]\d{2}[2-9]\d{2}\d{4}$'
-    return re.match(phone_pattern, phone.replace('-', '').replace(' ', '').replace('(', '').replace(')', ''))
-
-def validate_email(email):
-    """Basic email validation"""
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(email_pattern, email)
-
-def validate_password(password):
-    """Basic password validation"""
-    return len(password) >= 8
+        st.session_state.responses = b""
+    session_monitor.touch(current_session_id())
 
+    # Refresh tokens ahead of expiry, and hand them back to a client evicted from the pool while idle
+    if st.session_state.authenticated and not auth_tokens.ensure(supabase_client):
+        st.session_state.authenticated = False
+        st.session_state.user = None
+        if st.session_state.page in ("dashboard", "edit", "change_password"):
+            st.session_state.page = "auth"
+    elif not st.session_state.authenticated and not st.session_state.get("resume_checked"):
+        # A browser reload starts a new Streamlit session; pick the login back up from the resume cookie.
+        # Cookies are those of the session's first request, so this is only tried once.
+        st.session_state.resume_checked = True
+        resume_id = st.context.cookies.get(RESUME_COOKIE)
+        if resume_id and auth_tokens.restore(resume_id, supabase_client):
+            st.session_state.user = auth_tokens.tokens.user
+            st.session_state.authenticated = True
+            if st.session_state.page in ("questionnaire", "auth"):
+                st.session_state.page = "dashboard"
+    sync_resume_cookie()
+
+def sync_resume_cookie():
+    """Have the page trade a new login's handoff code for the HttpOnly resume cookie, or drop a dead cookie"""
+    code = auth_tokens.pending_handoff()
+    if code:
+        request = f"fetch({json.dumps(RESUME_ROUTE)}, {{method: 'POST', body: {json.dumps(code)}, credentials: 'same-origin'}})"
+    elif st.session_state.pop(END_KEY, False):
+        request = f"fetch({json.dumps(END_ROUTE)}, {{method: 'POST', credentials: 'same-origin'}})"
+    else:
+        return
+    st.html(f"<script>{request}</script>", unsafe_allow_javascript=True)
+
+def remember_login(result):
+    """Mark the session signed in and keep its tokens for refreshes and reloads"""
+    st.session_state.user = SessionUser.from_user(result["user"])
+    st.session_state.authenticated = True
+    if result.get("session"):
+        auth_tokens.store(result["session"], rotate=True)
+
+def load_edit_prefill():
+    """Copy the saved responses into the widget state once per visit to the edit page"""
+    if st.session_state.get("edit_prefilled") or not st.session_state.user:
+        return
+    current_responses = supabase_client.get_user_responses(st.session_state.user.id)
+    if current_responses["success"] and current_responses["data"]:
+        for key in QUESTION_KEYS:
+            if current_responses["data"].get(key) is not None:
+                st.session_state[key] = current_responses["data"][key]
+    st.session_state.edit_prefilled = True
+
+def submission_key(form, payload):
+    """Idempotency key for the current attempt at a form with this payload, reused by reruns and double clicks until it succeeds.
+
+    Changed answers give a different key, so an edited resubmission is written rather than dropped as a duplicate.
+    """
+    state_key = f"submission_{form}"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = uuid.uuid4()
+    return str(uuid.uuid5(st.session_state[state_key], json.dumps(payload, sort_keys=True, default=str)))
+
+def submission_done(form):
+    """Start a fresh idempotency key for the next submission of a form"""
+    st.session_state.pop(f"submission_{form}", None)
+
+def admitted(controller, account):
+    """Wait for an admission slot, showing the queue position; shows why and returns False when throttled"""
+    notice = st.empty()
+
+    def show_position(position, seconds_left):
+        notice.info(f"Lots of people are submitting right now. You're number {position} in line, "
+                    f"about {max(1, round(seconds_left))}s to go.")
+
+    try:
+        controller.admit(client_address(st.context.ip_address, st.context.headers.get("X-Forwarded-For")),
+                         account, on_wait=show_position)
+    except Throttled as e:
+        notice.error(str(e))
+        return False
+    notice.empty()
+    return True
+
+def section_complete(section):
+    """Whether every question in a section has an answer"""
+    return all(st.session_state.get(question.key) is not None for question in section.questions)
+
+@st.fragment
+def render_section(section):
+    """Render one questionnaire section; answering a question reruns only this fragment"""
+    st.header(section.title)
+    for question in section.questions:
+        st.radio(
+            question.label,
+            options=question.options,
+            format_func=format_answer,
+            key=question.key,
+            index=None
+        )
+
+    answered = sum(1 for question in section.questions if st.session_state.get(question.key) is not None)
+    st.caption(f"{answered}/{len(section.questions)} answered")
+
+    # The buttons and overall progress live outside the fragment; refresh them only
+    # when this section flips between complete and incomplete
+    if section_complete(section) != (section.title in st.session_state.completed_sections):
+        st.rerun(scope="app")
+
+@timed_page("questionnaire")
 def render_questionnaire(editing=False):
     """Render the wellness questionnaire"""
     st.title("🌟 Wellness Tracker")
 
     if editing:
         st.subheader("Update Your Responses")
-        # Load current responses if editing
-        if st.session_state.user:
-            current_responses = supabase_client.get_user_responses(st.session_state.user.id)
-            if current_responses["success"] and current_responses["data"]:
-                # Pre-populate form with current responses
-                for key, value in current_responses["data"].items():
-                    if key.startswith(('h', 'w', 'p', 'f')):
-                        st.session_state.responses[key] = value
+        load_edit_prefill()
     else:
         st.write("Track your wellness across Health, Wealth, and Happiness dimensions.")
 
-    # Health Section
-    st.header("🏥 Health")
-
-    h1 = st.radio(
-        "Did you sleep 7+ hours last night?",
-        options=[True, False],
-        format_func=lambda x: "Yes" if x else "No",
-        key="h1_sleep_7hrs",
-        index=None if not editing else (0 if st.session_state.responses.get("h1_sleep_7hrs", True) else 1)
-    )
-
-    h2 = st.radio(
-        "Did you eat 2+ servings of fruit/vegetables yesterday?",
-        options=[True, False],
-        format_func=lambda x: "Yes" if x else "No",
-        key="h2_fruit_veg_2servings",
-        index=None if not editing else (0 if st.session_state.responses.get("h2_fruit_veg_2servings", True) else 1)
-    )
-
-    h3 = st.radio(
-        "Did you move for 20+ minutes yesterday?",
-        options=[True, False],
-        format_func=lambda x: "Yes" if x else "No",
-        key="h3_moved_20mins",
-        index=None if not editing else (0 if st.session_state.responses.get("h3_moved_20mins", True) else 1)
-    )
-
-    h4 = st.radio(
-        "How often do you feel low energy during the day?",
-        options=["Rarely", "Sometimes", "Often"],
-        key="h4_low_energy_frequency",
-        index=None if not editing else ["Rarely", "Sometimes", "Often"].index(st.session_state.responses.get("h4_low_energy_frequency", "Rarely"))
-    )
-
-    # Wealth Section
-    st.header("💰 Wealth")
-
-    w1 = st.radio(
-        "Did you set aside any money last week?",
-        options=[True, False],
-        format_func=lambda x: "Yes" if x else "No",
-        key="w1_saved_money",
-        index=None if not editing else (0 if st.session_state.responses.get("w1_saved_money", True) else 1)
-    )
-
-    w2 = st.radio(
-        "Would you feel secure if an emergency expense hit tomorrow?",
-        options=[True, False],
-        format_func=lambda x: "Yes" if x else "No",
-        key="w2_emergency_secure",
-        index=None if not editing else (0 if st.session_state.responses.get("w2_emergency_secure", True) else 1)
-    )
-
-    w3 = st.radio(
-        "Did you spend on something you later regretted in the last month?",
-        options=[True, False],
-        format_func=lambda x: "Yes" if x else "No",
-        key="w3_regretful_spending",
-        index=None if not editing else (0 if st.session_state.responses.get("w3_regretful_spending", True) else 1)
-    )
-
-    # Happiness Section
-    st.header("😊 Happiness")
-
-    p1 = st.radio(
-        "Did you do something just for yourself yesterday (read/walk/relax)?",
-        options=[True, False],
-        format_func=lambda x: "Yes" if x else "No",
-        key="p1_personal_time",
-        index=None if not editing else (0 if st.session_state.responses.get("p1_personal_time", True) else 1)
-    )
-
-    p2 = st.radio(
-        "Did you connect with a close friend/family in the past week?",
-        options=[True, False],
-        format_func=lambda x: "Yes" if x else "No",
-        key="p2_social_connection",
-        index=None if not editing else (0 if st.session_state.responses.get("p2_social_connection", True) else 1)
-    )
-
-    p3 = st.radio(
-        "How often do you feel overwhelmed by daily demands?",
-        options=["Rarely", "Sometimes", "Often"],
-        key="p3_overwhelmed_frequency",
-        index=None if not editing else ["Rarely", "Sometimes", "Often"].index(st.session_state.responses.get("p3_overwhelmed_frequency", "Rarely"))
-    )
-
-    # Anchor Question
-    st.header("🎯 Focus Area")
-
-    f = st.radio(
-        "If you could feel more 'in control' in one area next week, which would it be?",
-        options=["Health", "Wealth", "Happiness"],
-        key="f_focus_area",
-        index=None if not editing else ["Health", "Wealth", "Happiness"].index(st.session_state.responses.get("f_focus_area", "Health"))
-    )
-
-    # Store responses
-    responses = {
-        "h1_sleep_7hrs": h1,
-        "h2_fruit_veg_2servings": h2,
-        "h3_moved_20mins": h3,
-        "h4_low_energy_frequency": h4,
-        "w1_saved_money": w1,
-        "w2_emergency_secure": w2,
-        "w3_regretful_spending": w3,
-        "p1_personal_time": p1,
-        "p2_social_connection": p2,
-        "p3_overwhelmed_frequency": p3,
-        "f_focus_area": f
+    st.session_state.completed_sections = {
+        section.title for section in SECTIONS if section_complete(section)
     }
+    for section in SECTIONS:
+        render_section(section)
 
-    st.session_state.responses = responses
+    # Store responses, packed one byte per question for the auth page
+    responses = answers(st.session_state)
+
+    st.session_state.responses = pack_answers(responses)
 
     # Check if all questions are answered
     all_answered = all(value is not None for value in responses.values())
@@ -177,9 +179,11 @@ def render_questionnaire(editing=False):
             if st.button("Save Changes", type="primary", use_container_width=True, disabled=not all_answered):
                 if not all_answered:
                     st.error("Please answer all questions before saving.")
-                else:
-                    result = supabase_client.update_responses(st.session_state.user.id, responses)
+                elif admitted(submit_admission, st.session_state.user.id):
+                    result = supabase_client.update_responses(st.session_state.user.id, responses,
+                                                              idempotency_key=submission_key("edit", responses))
                     if result["success"]:
+                        submission_done("edit")
                         st.success("Responses updated successfully!")
                         st.session_state.page = "dashboard"
                         st.rerun()
@@ -203,6 +207,7 @@ def render_questionnaire(editing=False):
     st.progress(answered_count / len(responses))
     st.caption(f"Questions answered: {answered_count}/{len(responses)}")
 
+@timed_page("auth")
 def render_auth():
     """Render authentication page"""
     st.title("📱 Submit Your Responses")
@@ -236,20 +241,45 @@ def render_auth():
                     st.error("Password must be at least 8 characters long")
                     return
 
+                if not admitted(auth_admission, email.strip().lower()):
+                    return
+
+                if ASYNC_REGISTRATION:
+                    # Sign up, then create the profile and save responses concurrently
+                    answers = unpack_answers(st.session_state.responses)
+                    result = supabase_client.register_user_with_responses(email, phone, password, answers,
+                                                                          idempotency_key=submission_key("register", [email, phone, answers]))
+                    if result["success"]:
+                        submission_done("register")
+                        remember_login(result)
+                        if result["errors"].get("create_user_profile"):
+                            st.warning("Your profile could not be saved, so phone login may not work. Please log in with your email address.")
+                        st.success("Registration successful! Redirecting to your dashboard...")
+                        st.session_state.page = "dashboard"
+                        st.rerun()
+                    elif result.get("user"):
+                        remember_login(result)
+                        st.error(f"Error saving responses: {result['error']}")
+                    else:
+                        st.error(f"Registration failed: {result['error']}")
+                    return
+
                 # Register new user
                 result = supabase_client.register_user(email, phone, password)
                 if result["success"]:
                     user = result["user"]
-                    st.session_state.user = user
-                    st.session_state.authenticated = True
+                    remember_login(result)
 
                     # Create user profile
                     profile_result = supabase_client.create_user_profile(user.id, phone, email)
 
                     # Save responses
-                    responses_result = supabase_client.save_responses(user.id, st.session_state.responses)
+                    answers = unpack_answers(st.session_state.responses)
+                    responses_result = supabase_client.save_responses(user.id, answers,
+                                                                      idempotency_key=submission_key("register", [email, phone, answers]))
 
                     if responses_result["success"]:
+                        submission_done("register")
                         st.success("Registration successful! Redirecting to your dashboard...")
                         st.session_state.page = "dashboard"
                         st.rerun()
@@ -271,17 +301,44 @@ def render_auth():
                     st.error("Password must be at least 8 characters long")
                     return
 
+                account = email_or_phone.strip().lower() if is_email else normalize_phone(email_or_phone)
+                if not admitted(auth_admission, account):
+                    return
+
                 # Login existing user
                 result = supabase_client.sign_in_user(email_or_phone, password)
                 if result["success"]:
-                    st.session_state.user = result["user"]
-                    st.session_state.authenticated = True
+                    remember_login(result)
                     st.success("Login successful! Redirecting to your dashboard...")
                     st.session_state.page = "dashboard"
                     st.rerun()
                 else:
                     st.error(f"Login failed: {result['error']}")
 
+def render_trends(responses):
+    """Monthly share of favourable answers per section across all saved versions"""
+    st.header("📈 Trends")
+    trends = load_trends(supabase_client, st.session_state.user.id, responses)
+    if not trends["success"]:
+        st.warning(f"Could not load your history: {trends['error']}")
+        return
+
+    data = trends["data"]
+    if trends.get("stale"):
+        st.caption("Your history is temporarily unavailable; showing what we loaded earlier.")
+    if data["versions"] < 2:
+        st.caption("Update your responses over time to see your trends here.")
+        return
+
+    st.line_chart(
+        {"Month": data["months"], **data["sections"]},
+        x="Month",
+        y=list(data["sections"]),
+        y_label="% favourable answers",
+    )
+    st.caption(f"{data['versions']} versions since {data['since'][:10]}")
+
+@timed_page("dashboard")
 def render_dashboard():
     """Render user dashboard with results"""
     if not st.session_state.authenticated or not st.session_state.user:
@@ -301,36 +358,41 @@ def render_dashboard():
     # Header
     st.title("🌟 Your Wellness Dashboard")
     st.write(f"Welcome back! Your focus area is: **{responses['f_focus_area']}**")
-
-    # Health Section
-    st.header("🏥 Health")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric("Sleep 7+ Hours", "Yes" if responses["h1_sleep_7hrs"] else "No")
-        st.metric("Fruit/Vegetables", "Yes" if responses["h2_fruit_veg_2servings"] else "No")
-    with col2:
-        st.metric("Exercise 20+ Minutes", "Yes" if responses["h3_moved_20mins"] else "No")
-        st.metric("Low Energy Frequency", responses["h4_low_energy_frequency"])
-
-    # Wealth Section
-    st.header("💰 Wealth")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Saved Money", "Yes" if responses["w1_saved_money"] else "No")
-    with col2:
-        st.metric("Emergency Secure", "Yes" if responses["w2_emergency_secure"] else "No")
-    with col3:
-        st.metric("Regretful Spending", "Yes" if responses["w3_regretful_spending"] else "No")
-
-    # Happiness Section
-    st.header("😊 Happiness")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Personal Time", "Yes" if responses["p1_personal_time"] else "No")
-    with col2:
-        st.metric("Social Connection", "Yes" if responses["p2_social_connection"] else "No")
-    with col3:
-        st.metric("Overwhelmed Frequency", responses["p3_overwhelmed_frequency"])
+    if responses_result.get("stale"):
+        st.info("We're having trouble reaching the database, so these are your last loaded answers.")
+
+    # Population comparison comes from a cached snapshot, never a scan of responses
+    population_result = load_population(supabase_client)
+    population = population_result["data"] if population_result["success"] else None
+    if population:
+        focus_shares = population.distribution("f_focus_area")
+        st.caption("Everyone's focus areas: " + " · ".join(
+            f"{area} {share}%" for area, share in focus_shares.items() if share is not None
+        ))
+
+    # Scores per dimension, with the focus area weighted more heavily in the overall score
+    from scoring import score_one  # numpy is only needed once someone reaches the dashboard
+
+    scores = score_one(responses)
+    for column, (name, value) in zip(st.columns(len(scores)), scores.items()):
+        with column:
+            st.metric(f"{name} Score", f"{value:.0f}/100")
+
+    # One block of metrics per questionnaire section
+    for section in SECTIONS:
+        if not section.dashboard_columns:
+            continue
+        st.header(section.title)
+        for column, questions in zip(st.columns(section.dashboard_columns), dashboard_columns(section)):
+            with column:
+                for question in questions:
+                    answer = responses[question.key]
+                    st.metric(question.metric, format_answer(answer))
+                    share = population.share(question.key, answer) if population else None
+                    if share is not None:
+                        st.caption(f"{share}% of users answered {format_answer(answer)}")
+
+    render_trends(responses)
 
     # Action buttons
     st.divider()
@@ -339,6 +401,7 @@ def render_dashboard():
     with col1:
         if st.button("Update My Responses", type="primary", use_container_width=True):
             st.session_state.page = "edit"
+            st.session_state.edit_prefilled = False
             st.rerun()
 
     with col2:
@@ -349,12 +412,14 @@ def render_dashboard():
     with col3:
         if st.button("Logout", use_container_width=True):
             supabase_client.sign_out()
+            auth_tokens.clear()
             st.session_state.authenticated = False
             st.session_state.user = None
             st.session_state.page = "questionnaire"
             st.success("Logged out successfully!")
             st.rerun()
 
+@timed_page("change_password")
 def render_change_password():
     """Render password change page"""
     if not st.session_state.authenticated or not st.session_state.user:
@@ -389,28 +454,109 @@ def render_change_password():
                 st.error("New password and confirmation do not match")
                 return
 
-            # Verify current password by attempting to sign in
-            user_email = st.session_state.user.email
-            verify_result = supabase_client.sign_in_user(user_email, current_password)
-
-            if not verify_result["success"]:
-                st.error("Current password is incorrect")
+            # Checking the current password is a sign-in, so it counts against the same limits as logging in
+            if not admitted(auth_admission, (st.session_state.user.email or st.session_state.user.id).lower()):
                 return
 
-            # Update password
-            result = supabase_client.update_password(new_password)
+            # Update password; the current one is checked as part of the same call
+            result = supabase_client.update_password(new_password, current_password=current_password)
 
             if result["success"]:
+                if result.get("session"):
+                    # A new resume id, so tabs and cookies holding the old one are signed out
+                    auth_tokens.store(result["session"], rotate=True)
                 st.success("Password updated successfully! Redirecting to dashboard...")
                 st.session_state.page = "dashboard"
                 st.rerun()
+            elif result["error"] == CURRENT_PASSWORD_ERROR:
+                st.error("Current password is incorrect")
             else:
                 st.error(f"Error updating password: {result['error']}")
 
+def is_admin_request():
+    """Check the hidden admin page token passed as ?admin=<ADMIN_TOKEN>"""
+    token = _secret("ADMIN_TOKEN")
+    supplied = st.query_params.get("admin")
+    return bool(token and supplied and hmac.compare_digest(token, supplied))
+
+@timed_page("admin")
+def render_admin():
+    """Render hidden operational metrics page"""
+    st.title("📈 Performance Metrics")
+
+    st.header("Client Pool")
+    st.json(get_client_pool().stats())
+
+    st.header("Response Cache")
+    st.json(response_cache.stats())
+
+    st.header("Read Coalescing")
+    st.json(read_flights.stats())
+
+    st.header("Sessions")
+    st.json(session_monitor.stats())
+    st.dataframe(session_monitor.report()[:50])
+
+    st.header("Admission Control")
+    if forwarding_misconfigured():
+        st.warning("Requests arrive through a proxy but ADMISSION_FORWARDED_HOPS is 0, "
+                   "so every user shares the proxy's per-client limit. Set it to the number of proxies in front of Streamlit.")
+    st.json({"auth": auth_admission.stats(), "submit": submit_admission.stats()})
+
+    st.header("Timeouts, Retries and Circuit Breakers")
+    st.json(resilience.stats())
+    st.json({endpoint: resilience.breaker(endpoint).state for endpoint in resilience.breaker_states()})
+
+    if write_behind_queue is not None:
+        st.header("Write-Behind Queue")
+        st.json(write_behind_queue.stats())
+
+    st.header("SupabaseClient Methods")
+    calls = instrumentation.client_calls_total.values
+    errors = instrumentation.client_errors_total.values
+    st.dataframe([
+        {
+            **dict(labels),
+            "calls": int(calls.get(labels, 0)),
+            "errors": int(errors.get(labels, 0)),
+            "mean ms": round(row["mean"] * 1000, 1),
+            "p95 ms ≤": row["p95"] * 1000,
+        }
+        for labels, row in sorted(instrumentation.client_call_seconds.summary().items())
+    ], use_container_width=True)
+
+    st.header("Page Renders")
+    st.dataframe([
+        {**dict(labels), "renders": row["count"], "mean ms": round(row["mean"] * 1000, 1), "p95 ms ≤": row["p95"] * 1000}
+        for labels, row in sorted(instrumentation.page_render_seconds.summary().items())
+    ], use_container_width=True)
+
+    st.header("Reruns")
+    for labels, row in instrumentation.rerun_round_trips.summary().items():
+        st.write(f"{row['count']} reruns, {row['mean']:.2f} round trips per rerun on average (p95 ≤ {row['p95']:g})")
+
+    st.header("Prometheus")
+    exposition = instrumentation.registry.render_prometheus()
+    st.download_button("Download metrics", exposition, file_name="metrics.txt", mime="text/plain")
+    st.code(exposition, language="text")
+
 def main():
     """Main application function"""
+    instrumentation.start_metrics_server()
+    instrumentation.begin_rerun()
+    try:
+        route()
+    finally:
+        instrumentation.end_rerun()
+
+def route():
+    """Initialize state and render the current page"""
     initialize_session_state()
 
+    if is_admin_request():
+        render_admin()
+        return
+
     # Page routing
     if st.session_state.page == "questionnaire":
         render_questionnaire()
@@ -0,0 +1,300 @@
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Optional write-behind mode: questionnaire saves are confirmed as soon as they
+# are spooled, and a background worker writes them to Supabase in batches.
+WRITE_BEHIND = os.getenv("SUPABASE_WRITE_BEHIND", "0") == "1"
+
+# Seconds between attempts to start the worker after its client could not be built
+START_RETRY_INTERVAL = 30.0
+
+
+class WriteBehindQueue:
+    """Bounded queue of response writes, spooled to disk and flushed as multi-row requests"""
+
+    def __init__(self, client_factory: Callable[[], Any], max_size: int = 1000, batch_size: int = 100,
+                 flush_interval: float = 0.5, enqueue_timeout: float = 2.0, max_attempts: int = 5,
+                 spool_path: str = ".write_behind.jsonl",
+                 on_flushed: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self.spool_path = spool_path
+        self.on_flushed = on_flushed
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        # user_id -> [(seq, responses)] not yet written, oldest first
+        self._overlay: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        self._seq = 0
+        self._inflight = 0
+        self._spool = None
+        self._client = None
+        self._worker: Optional[threading.Thread] = None
+        self._next_start = 0.0
+        self._stopping = threading.Event()
+        self._use_batch_rpc = True
+        self._use_upsert = True
+        self.submitted = 0
+        self.flushed = 0
+        self.batches = 0
+        self.retries = 0
+        self.rejected = 0
+        self.dead_letters = 0
+        self.start_failures = 0
+        self.worker_errors = 0
+
+    def alive(self) -> bool:
+        """Whether the worker thread is running"""
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self) -> None:
+        """Build the worker's client, claim the spool, replay anything a previous process left unwritten, and start the worker.
+
+        Raises when the client can't be built, so callers can write synchronously instead.
+        A worker that died is restarted without replaying the spool again.
+        """
+        with self._lock:
+            if self.alive():
+                return
+            self._client = self.client_factory()
+            first_start = self._spool is None
+            pending = []
+            if first_start:
+                self._spool = open(self.spool_path, "a+")
+                try:
+                    fcntl.flock(self._spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    self._spool.close()
+                    self._spool = None
+                    raise RuntimeError(f"{self.spool_path} is in use by another process; give each worker its own WRITE_BEHIND_SPOOL")
+                pending = self._read_spool()
+                self._rewrite_spool(pending)
+                for entry in pending:
+                    self._seq = max(self._seq, entry["seq"])
+                    self._overlay.setdefault(entry["user_id"], []).append((entry["seq"], entry["responses"]))
+            self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._worker.start()
+        for entry in pending:
+            self._queue.put(entry)
+        if first_start:
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Drain the queue and stop the worker; anything left stays in the spool for the next start"""
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def submit(self, kind: str, user_id: str, responses: Dict[str, Any], submission_id: Optional[str] = None) -> bool:
+        """Queue a "save" (insert) or "update" for user_id; False when the queue stayed full or the worker can't run"""
+        if not self.alive():
+            if time.monotonic() < self._next_start:
+                return False
+            try:
+                self.start()
+            except Exception:
+                with self._lock:
+                    self.start_failures += 1
+                    self._next_start = time.monotonic() + START_RETRY_INTERVAL
+                return False
+        with self._lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "kind": kind, "user_id": user_id, "responses": responses,
+                     "submission_id": submission_id, "queued_at": time.time()}
+            self._overlay.setdefault(user_id, []).append((entry["seq"], responses))
+            self._append_spool({"op": "put", **entry})
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._drop_overlay(user_id, [entry["seq"]])
+                self._append_spool({"op": "done", "seqs": [entry["seq"]]})
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def pending(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """The newest answers queued for user_id but not yet written, if any"""
+        with self._lock:
+            entries = self._overlay.get(user_id)
+            return dict(entries[-1][1]) if entries else None
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth and flush counters"""
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "inflight": self._inflight,
+                "submitted": self.submitted,
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "dead_letters": self.dead_letters,
+                "start_failures": self.start_failures,
+                "worker_errors": self.worker_errors,
+                "worker_alive": int(self.alive()),
+            }
+
+    # Spool: an append-only log of "put" entries and "done" acknowledgements
+
+    def _append_spool(self, record: Dict[str, Any]) -> None:
+        self._spool.write(json.dumps(record, default=str) + "\n")
+        self._spool.flush()
+        os.fsync(self._spool.fileno())
+
+    def _read_spool(self) -> List[Dict[str, Any]]:
+        self._spool.seek(0)
+        puts: Dict[int, Dict[str, Any]] = {}
+        for line in self._spool:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn final line from a crash mid-write
+            if record.get("op") == "put":
+                puts[record["seq"]] = {k: v for k, v in record.items() if k != "op"}
+            elif record.get("op") == "done":
+                for seq in record["seqs"]:
+                    puts.pop(seq, None)
+        return [puts[seq] for seq in sorted(puts)]
+
+    def _rewrite_spool(self, pending: List[Dict[str, Any]]) -> None:
+        self._spool.seek(0)
+        self._spool.truncate()
+        for entry in pending:
+            self._append_spool({"op": "put", **entry})
+
+    def _drop_overlay(self, user_id: str, seqs: List[int]) -> None:
+        entries = [e for e in self._overlay.get(user_id, []) if e[0] not in seqs]
+        if entries:
+            self._overlay[user_id] = entries
+        else:
+            self._overlay.pop(user_id, None)
+
+    # Worker
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            try:
+                if batch:
+                    self._flush(self._client, batch)
+                elif self._stopping.is_set():
+                    return
+            except Exception:
+                # Keep draining; entries of the failed batch stay in the spool and are replayed on the next start
+                with self._lock:
+                    self._inflight = 0
+                    self.worker_errors += 1
+                time.sleep(self.flush_interval)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            self._inflight = len(batch)
+        return batch
+
+    def _flush(self, client, batch: List[Dict[str, Any]]) -> None:
+        # A user's insert always precedes their updates, so saves go first
+        saves = [entry for entry in batch if entry["kind"] == "save"]
+        updates = [entry for entry in batch if entry["kind"] == "update"]
+        for kind, entries in (("save", saves), ("update", updates)):
+            if entries:
+                self._write_with_retry(client, kind, entries)
+
+        with self._lock:
+            self._inflight = 0
+            self.batches += 1
+            if not self._overlay:
+                # Everything spooled has been written; start the log afresh
+                self._rewrite_spool([])
+
+    def _write_with_retry(self, client, kind: str, entries: List[Dict[str, Any]]) -> None:
+        for attempt in range(self.max_attempts):
+            try:
+                rows = self._write(client, kind, entries)
+                self._acknowledge(kind, entries, rows)
+                return
+            except Exception:
+                with self._lock:
+                    self.retries += 1
+                time.sleep(min(0.5 * 2 ** attempt, 10.0))
+
+        # The batch keeps failing; write entries one by one so a single bad row can't block the rest
+        for entry in entries:
+            try:
+                self._acknowledge(kind, [entry], self._write(client, kind, [entry]))
+            except Exception as e:
+                self._dead_letter(entry, str(e))
+
+    def _write(self, client, kind: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        from postgrest.exceptions import APIError
+
+        if kind == "save":
+            payload = [{"user_id": entry["user_id"], **entry["responses"]} for entry in entries]
+            if self._use_upsert:
+                try:
+                    # Saves replayed after a crash hit the unique user_id index (migration 0007) and are skipped
+                    return client.table("responses").upsert(payload, on_conflict="user_id", ignore_duplicates=True).execute().data
+                except APIError as e:
+                    if e.code != "42P10":
+                        raise
+                    self._use_upsert = False
+            return client.table("responses").insert(payload).execute().data
+
+        if self._use_batch_rpc:
+            try:
+                # submission_id makes replayed edits a no-op once migration 0007 is applied; 0006 ignores it
+                return client.rpc("apply_response_updates", {
+                    "p_updates": [{"user_id": e["user_id"], "responses": e["responses"], "submission_id": e.get("submission_id")}
+                                  for e in entries]
+                }).execute().data
+            except APIError as e:
+                # PGRST202: migration 0006 has not been applied, update one user at a time
+                if e.code != "PGRST202":
+                    raise
+                self._use_batch_rpc = False
+        rows = []
+        for entry in entries:
+            rows.extend(client.rpc("update_responses_with_history", {
+                "p_user_id": entry["user_id"],
+                "p_responses": entry["responses"]
+            }).execute().data)
+        return rows
+
+    def _acknowledge(self, kind: str, entries: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> None:
+        if self.on_flushed:
+            for row in rows or []:
+                self.on_flushed(kind, row)
+        with self._lock:
+            for entry in entries:
+                self._drop_overlay(entry["user_id"], [entry["seq"]])
+            self._append_spool({"op": "done", "seqs": [entry["seq"] for entry in entries]})
+            self.flushed += len(entries)
+
+    def _dead_letter(self, entry: Dict[str, Any], error: str) -> None:
+        with open(self.spool_path + ".failed", "a") as failed:
+            failed.write(json.dumps({**entry, "error": error}, default=str) + "\n")
+        with self._lock:
+            self._drop_overlay(entry["user_id"], [entry["seq"]])
+            self._append_spool({"op": "done", "seqs": [entry["seq"]]})
+            self.dead_letters += 1